@@ -0,0 +1,92 @@
+"""Benchmark online backups against database size.
+
+Builds scratch databases with each ``--rows`` count of transactions. For
+each one it times a page-stepped backup with ``finance_engine.backup``, then
+a gzip snapshot of the result. It also times a writer committing on another
+connection while the backup runs, to show that writers are not blocked.
+
+    python benchmarks/bench_backup.py [--rows 10000 100000 1000000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from finance_engine import backup, db, schema  # noqa: E402
+
+CATEGORIES = ['Salary', 'Bills & Utilities', 'Shopping', 'Education', 'Healthcare', 'Entertainment', 'Transportation']
+
+
+def build_database(path, rows, seed=0):
+    pool = db.ConnectionPool(path, size=2)
+    rng = random.Random(seed)
+    with pool.transaction() as conn:
+        schema.migrate(conn)
+        conn.executemany('''
+            INSERT INTO transactions (date, description, amount, category, type, user_id)
+            VALUES (?, ?, ?, ?, 'Expense', 1)
+        ''', ((f"{rng.randint(2015, 2024):04d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+               f"Synthetic {i}", round(rng.uniform(10_000, 2_000_000), 2), rng.choice(CATEGORIES))
+              for i in range(rows)))
+    return pool
+
+
+def concurrent_writes(path, stop, latencies):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    while not stop.is_set():
+        start = time.perf_counter()
+        conn.execute("INSERT INTO tags (name, user_id) VALUES (?, 1)", (f"t{time.perf_counter_ns()}",))
+        conn.commit()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.005)
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--pages', type=int, default=backup.PAGES_PER_STEP)
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>10} {'db MB':>7} {'backup s':>9} {'MB/s':>7} {'gzip s':>7} {'gz MB':>7} {'write p99 ms':>13} {'restarts':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            source_path = os.path.join(tmp, f'source_{rows}.db')
+            pool = build_database(source_path, rows)
+            with pool.connection() as conn:
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            size_mb = os.path.getsize(source_path) / 1e6
+
+            stop, latencies = threading.Event(), []
+            writer = threading.Thread(target=concurrent_writes, args=(source_path, stop, latencies))
+            writer.start()
+            target = os.path.join(tmp, f'backup_{rows}.db')
+            start = time.perf_counter()
+            with pool.connection() as conn:
+                restarts = backup.backup_to(target, source=conn, pages=args.pages)
+            backup_s = time.perf_counter() - start
+            stop.set()
+            writer.join()
+
+            start = time.perf_counter()
+            with open(target, 'rb') as f:
+                snapshot = backup.save_snapshot(f, os.path.join(tmp, 'snapshots'), retention=1)
+            gzip_s = time.perf_counter() - start
+            gz_mb = os.path.getsize(snapshot) / 1e6
+            p99 = statistics.quantiles(latencies, n=100)[-1] * 1000 if len(latencies) >= 2 else float('nan')
+            pool.close_all()
+            print(f"{rows:>10} {size_mb:>7.1f} {backup_s:>9.2f} {size_mb / backup_s:>7.0f} "
+                  f"{gzip_s:>7.2f} {gz_mb:>7.1f} {p99:>13.2f} {restarts:>9}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Benchmark bulk CSV import throughput.
+
+Writes synthetic bank exports of each ``--rows`` size and imports them into
+scratch databases with ``finance_engine.importer``, reporting rows/sec. The
+old path (one connection, INSERT and commit per row) is timed on a smaller
+sample for comparison.
+
+    python benchmarks/bench_import.py [--rows 10000 100000 1000000]
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from finance_engine import db, importer, schema  # noqa: E402
+
+CATEGORIES = ['Salary', 'Bills & Utilities', 'Shopping', 'Education', 'Healthcare', 'Entertainment', 'Transportation']
+HEADER = ['date', 'description', 'amount', 'category', 'type', 'account', 'notes']
+
+
+def write_csv(path, rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(rows):
+            category = rng.choice(CATEGORIES)
+            writer.writerow([
+                f"{rng.randint(2015, 2024):04d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                f"Synthetic {i}",
+                round(rng.uniform(10_000, 2_000_000), 2),
+                category,
+                'Income' if category == 'Salary' else 'Expense',
+                'Cash',
+                '',
+            ])
+
+
+def scratch_pool(path):
+    pool = db.ConnectionPool(path, size=1)
+    with pool.connection() as conn:
+        schema.migrate(conn)
+    return pool
+
+
+def bench_bulk(tmp, rows, chunk_size):
+    csv_path = os.path.join(tmp, f'import_{rows}.csv')
+    write_csv(csv_path, rows)
+    pool = scratch_pool(os.path.join(tmp, f'bulk_{rows}.db'))
+    with pool.transaction() as conn:
+        result = importer.import_csv(csv_path, user_id=1, chunk_size=chunk_size, conn=conn)
+    pool.close_all()
+    return result.imported, result.elapsed
+
+
+def bench_per_row(tmp, rows):
+    """The pre-bulk import: a fresh connection and a commit for every row."""
+    csv_path = os.path.join(tmp, f'per_row_{rows}.csv')
+    write_csv(csv_path, rows)
+    path = os.path.join(tmp, f'per_row_{rows}.db')
+    scratch_pool(path).close_all()
+    with open(csv_path, newline='') as f:
+        records = list(csv.DictReader(f))
+    start = time.perf_counter()
+    for row in records:
+        pool = db.ConnectionPool(path, size=1)
+        with pool.transaction() as conn:
+            conn.execute('''
+                INSERT INTO transactions (date, description, amount, category, type, account, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (row['date'], row['description'], float(row['amount']), row['category'], row['type'], row['account'], 1))
+        pool.close_all()
+    return len(records), time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--chunk-size', type=int, default=importer.CHUNK_SIZE)
+    parser.add_argument('--per-row-sample', type=int, default=2_000,
+                        help="rows to import the old way for comparison (0 to skip)")
+    args = parser.parse_args(argv)
+
+    print(f"{'method':>8} {'rows':>10} {'seconds':>9} {'rows/sec':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.per_row_sample:
+            rows, elapsed = bench_per_row(tmp, args.per_row_sample)
+            print(f"{'per-row':>8} {rows:>10} {elapsed:>9.2f} {rows / elapsed:>11,.0f}")
+        for size in args.rows:
+            rows, elapsed = bench_bulk(tmp, size, args.chunk_size)
+            print(f"{'bulk':>8} {rows:>10} {elapsed:>9.2f} {rows / elapsed:>11,.0f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
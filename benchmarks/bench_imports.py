@@ -0,0 +1,114 @@
+"""Measure the cold-start import cost of the app script.
+
+Runs the module-level imports of ``main.py`` in fresh interpreters, as a
+new Streamlit worker does on its first rerun, and records for each run the
+wall time, the peak resident memory and the slowest modules reported by
+``python -X importtime``. The libraries in ``LAZY`` serve only a few pages
+(market data, currency rates, forecasting, charts of the trend
+decomposition, editable grids) and must not be loaded at startup.
+
+    python benchmarks/bench_imports.py [--repeat 5] [--output imports.json]
+
+Exits with status 1 if a ``LAZY`` library is imported at startup or, with
+``--compare baseline.json``, if the median import time is more than
+``--max-slowdown`` times the baseline's.
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import default_output, metadata, write_results  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MAIN = os.path.join(ROOT, 'main.py')
+LAZY = ('yfinance', 'forex_python', 'matplotlib', 'sklearn', 'statsmodels', 'st_aggrid')
+
+_PROBE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+{imports}
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{'import_ms': elapsed, 'max_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  'modules': len(sys.modules), 'lazy_loaded': [m for m in {lazy!r} if m in sys.modules]}}))
+'''
+
+
+def startup_imports(path=MAIN):
+    """Return the source of the module-level import statements of ``path``."""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    return '\n'.join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def parse_importtime(stderr, limit):
+    """Return the ``limit`` modules with the highest cumulative import time, in ms."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append({'module': name.strip(), 'self_ms': int(self_us) / 1000, 'cumulative_ms': int(cumulative_us) / 1000})
+    modules.sort(key=lambda m: m['cumulative_ms'], reverse=True)
+    return modules[:limit]
+
+
+def run_once(imports, limit):
+    """Import ``imports`` in a fresh interpreter; return its measurements."""
+    probe = _PROBE.format(imports=imports, lazy=LAZY)
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], capture_output=True, text=True,
+                               cwd=ROOT, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['slowest'] = parse_importtime(completed.stderr, limit)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="slowest modules to report")
+    parser.add_argument('--output', help="JSON results file (default: benchmarks/results/imports-<timestamp>.json)")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON results of an earlier run")
+    parser.add_argument('--max-slowdown', type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    imports = startup_imports()
+    runs = [run_once(imports, args.top) for _ in range(args.repeat)]
+    times = [run['import_ms'] for run in runs]
+    summary = {
+        'median_ms': round(statistics.median(times), 3),
+        'min_ms': round(min(times), 3),
+        'max_rss_kib': max(run['max_rss_kib'] for run in runs),
+        'modules': runs[-1]['modules'],
+        'lazy_loaded': runs[-1]['lazy_loaded'],
+    }
+
+    print(f"startup imports: median {summary['median_ms']:.1f} ms, min {summary['min_ms']:.1f} ms, "
+          f"peak RSS {summary['max_rss_kib'] / 1024:.1f} MiB, {summary['modules']} modules")
+    print(f"{'module':<40} {'cumulative ms':>14} {'self ms':>10}")
+    for module in runs[-1]['slowest']:
+        print(f"{module['module']:<40} {module['cumulative_ms']:>14.1f} {module['self_ms']:>10.1f}")
+
+    output = args.output or default_output('imports')
+    write_results(output, metadata(repeat=args.repeat), [summary], slowest=runs[-1]['slowest'])
+
+    failed = False
+    if summary['lazy_loaded']:
+        print(f"LAZY IMPORT REGRESSION: {', '.join(summary['lazy_loaded'])} loaded at startup")
+        failed = True
+    if args.compare:
+        with open(args.compare) as f:
+            before = json.load(f)['results'][0]
+        if summary['median_ms'] > before['median_ms'] * args.max_slowdown:
+            print(f"REGRESSION startup imports: {before['median_ms']:.1f} ms -> {summary['median_ms']:.1f} ms")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Benchmark the yearly summary query as transaction history grows.
+
+Fills scratch databases with ``--rows-per-year`` transactions for an
+increasing number of years and times the summary for the latest year, using
+both the catalogued query and the old ``strftime('%Y', date) = ?`` form.
+The amount of data in the queried year stays constant, so the indexed query
+should stay flat while the old one grows with the history.
+
+    python benchmarks/bench_monthly_summary.py [--rows-per-year 20000]
+
+Exits with status 1 if the catalogued query scales worse than
+``--max-exponent`` (fitted on a log-log scale).
+"""
+import argparse
+import math
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from finance_engine import queries, schema  # noqa: E402
+
+LEGACY_SQL = '''
+    SELECT
+        strftime('%m', date) as month,
+        SUM(CASE WHEN type = "Income" THEN amount ELSE 0 END) as income,
+        SUM(CASE WHEN type = "Expense" THEN amount ELSE 0 END) as expense
+    FROM transactions
+    WHERE strftime('%Y', date) = ? AND (user_id = ? OR ? IS NULL)
+    GROUP BY month ORDER BY month
+'''
+
+CATEGORIES = ['Salary', 'Bills & Utilities', 'Shopping', 'Education', 'Healthcare', 'Entertainment', 'Transportation']
+
+
+def build_database(path, years, rows_per_year, last_year, user_id=1):
+    conn = sqlite3.connect(path)
+    schema.migrate(conn)
+    rng = random.Random(years)
+    rows = []
+    for year in range(last_year - years + 1, last_year + 1):
+        for _ in range(rows_per_year):
+            category = rng.choice(CATEGORIES)
+            rows.append((
+                f"{year:04d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                'Synthetic',
+                round(rng.uniform(10_000, 2_000_000), 2),
+                category,
+                'Income' if category == 'Salary' else 'Expense',
+                user_id,
+            ))
+    conn.executemany('''
+        INSERT INTO transactions (date, description, amount, category, type, user_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.execute('ANALYZE')
+    return conn
+
+
+def time_query(conn, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def growth_exponent(sizes, timings):
+    """Slope of log(time) against log(size) between the first and last point."""
+    return math.log(timings[-1] / timings[0]) / math.log(sizes[-1] / sizes[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows-per-year', type=int, default=20_000)
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--repeat', type=int, default=15)
+    parser.add_argument('--max-exponent', type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    last_year = 2024
+    params = {'user_id': 1, **queries.year_bounds(last_year)}
+    sizes, indexed, legacy = [], [], []
+
+    print(f"{'rows':>10} {'indexed ms':>12} {'strftime ms':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for years in args.years:
+            conn = build_database(os.path.join(tmp, f'bench_{years}.db'), years, args.rows_per_year, last_year)
+            sql = queries.QueryRegistry(conn).sql('monthly_summary', user_id=1)
+            sizes.append(years * args.rows_per_year)
+            indexed.append(time_query(conn, sql, params, args.repeat))
+            legacy.append(time_query(conn, LEGACY_SQL, (str(last_year), 1, 1), args.repeat))
+            conn.close()
+            print(f"{sizes[-1]:>10} {indexed[-1] * 1000:>12.2f} {legacy[-1] * 1000:>12.2f}")
+
+    indexed_exp = growth_exponent(sizes, indexed)
+    legacy_exp = growth_exponent(sizes, legacy)
+    print(f"growth exponent: indexed {indexed_exp:.2f}, strftime {legacy_exp:.2f} (1.0 = linear)")
+
+    if indexed_exp >= args.max_exponent:
+        print(f"FAIL: yearly summary grows faster than n^{args.max_exponent}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
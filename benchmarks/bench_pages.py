@@ -0,0 +1,233 @@
+"""Measure page render and interaction rerun cost with Streamlit's AppTest.
+
+Generates a database with ``generate_data.generate`` (or reuses
+``--database``), logs user 1 in through the login form and drives
+``main.py`` through every page of the sidebar, then through the tabs,
+period selectors and date inputs each page offers. Every step is a full script
+rerun, measured three times:
+
+- cold: the query cache is cleared first, as for a user's first visit;
+- warm: the same rerun again, as for any later click;
+- memory: cold again under tracemalloc, for the peak Python allocation
+  (tracemalloc slows the rerun down, so its time is not reported).
+
+Each measurement records wall time and the number of SQL statements run on
+pooled connections. yfinance and forex-python are replaced by offline stubs,
+so the numbers do not depend on the network. Results are written as JSON.
+
+    python benchmarks/bench_pages.py [--transactions 100000] [--output pages.json] 2>/dev/null
+
+Exits with status 1 if any step raised, so a page that crashes is noticed.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from finance_engine import cache, db, scheduler, schema  # noqa: E402
+from generate_data import generate  # noqa: E402
+from suite import default_output, metadata, write_results  # noqa: E402
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'main.py')
+USER_ID = 1
+
+# page -> interactions: (widget kind, key or label, new value)
+PAGES = {
+    'Dashboard': [('selectbox', 'dashboard_period', 'This Year'), ('selectbox', 'dashboard_period', 'Last Year')],
+    'Transactions': [('selectbox', 'transactions_period', 'This Year'), ('selectbox', 'transactions_period', 'Last Year'),
+                     ('radio', 'transactions_section', 'Recurring Transactions'),
+                     ('radio', 'transactions_section', 'Transaction Analysis')],
+    'Budgets': [('selectbox', 'Select Month/Year', 1)],
+    'Savings Goals': [],
+    'Accounts': [],
+    'Investments': [('radio', 'investments_section', 'Add Investment'),
+                    ('radio', 'investments_section', 'Investment Analysis'),
+                    ('date_input', 'perf_start_date', date.today() - timedelta(days=3 * 365))],
+    'Reports': [('selectbox', 'spending_period', 'This Year'), ('radio', 'reports_section', 'Income Analysis'),
+                ('selectbox', 'income_period', 'This Year'), ('radio', 'reports_section', 'Custom Reports')],
+    'Data Management': [('radio', 'data_management_section', 'Export Data'), ('selectbox', 'export_period', 'All'),
+                        ('radio', 'data_management_section', 'Backup/Restore')],
+}
+
+
+class _StubTicker:
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    def history(self, start=None, end=None):
+        dates = pd.bdate_range(start, end, inclusive='left', name='Date')
+        rng = random.Random(self.symbol)
+        price, closes = rng.uniform(50, 500), []
+        for _ in dates:
+            price *= 1 + rng.gauss(0, 0.01)
+            closes.append(price)
+        return pd.DataFrame({'Close': closes}, index=dates)
+
+
+class _StubRates:
+    RATES = {'IDR': 1.0, 'USD': 16_000.0, 'EUR': 17_500.0, 'SGD': 12_000.0, 'JPY': 105.0}
+
+    def get_rate(self, from_currency, to_currency):
+        return self.RATES[from_currency] / self.RATES[to_currency]
+
+
+def install_stubs():
+    """Replace yfinance and forex-python with offline stand-ins."""
+    yfinance = types.ModuleType('yfinance')
+    yfinance.Ticker = _StubTicker
+    forex = types.ModuleType('forex_python')
+    converter = types.ModuleType('forex_python.converter')
+    converter.CurrencyRates = _StubRates
+    forex.converter = converter
+    sys.modules.update({'yfinance': yfinance, 'forex_python': forex, 'forex_python.converter': converter})
+
+
+class StatementCounter:
+    """Count SQL statements on every connection the pool opens from now on."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        connect = db.ConnectionPool._connect
+
+        def traced_connect(pool):
+            conn = connect(pool)
+            conn.set_trace_callback(self._trace)
+            return conn
+
+        db.ConnectionPool._connect = traced_connect
+
+    def _trace(self, statement):
+        with self._lock:
+            self.count += 1
+
+
+def find_widget(at, kind, key_or_label):
+    for widget in getattr(at, kind):
+        if key_or_label in (widget.key, widget.label):
+            return widget
+    raise LookupError(f"no {kind} {key_or_label!r} on this page")
+
+
+def wait_for_scheduler(user_id, timeout=600):
+    deadline = time.monotonic() + timeout
+    while scheduler.pending(user_id) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def rerun(at, counter, memory=False):
+    """Rerun the script; return ``(wall ms, SQL statements, peak KiB or None)``."""
+    if memory:
+        tracemalloc.start()
+    statements = counter.count
+    start = time.perf_counter()
+    at.run()
+    elapsed = round((time.perf_counter() - start) * 1000, 3)
+    peak = None
+    if memory:
+        peak = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return elapsed, counter.count - statements, peak
+
+
+def measure(at, counter, page, step, apply):
+    """Apply a widget change, then measure the cold, warm and memory reruns."""
+    result = {'page': page, 'step': step, 'cold_ms': None, 'cold_sql': None, 'warm_ms': None, 'warm_sql': None,
+              'peak_kib': None, 'errors': [], 'error': None}
+    try:
+        apply()
+        cache.invalidate()
+        result['cold_ms'], result['cold_sql'], _ = rerun(at, counter)
+        result['warm_ms'], result['warm_sql'], _ = rerun(at, counter)
+        cache.invalidate()
+        _, _, result['peak_kib'] = rerun(at, counter, memory=True)
+        result['errors'] = [e.value for e in at.error]
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+
+    if result['error']:
+        print(f"{page:<16} {step:<44} {result['error']}")
+    else:
+        print(f"{page:<16} {step:<44} {result['cold_ms']:>9.1f} {result['cold_sql']:>6} "
+              f"{result['warm_ms']:>9.1f} {result['warm_sql']:>6} {result['peak_kib'] / 1024:>8.1f}")
+    return result
+
+
+def login(at, username, password):
+    at.run()
+    at.text_input(key='login_username').input(username)
+    at.text_input(key='login_password').input(password)
+    start = time.perf_counter()
+    find_widget(at, 'button', 'Login').click().run()
+    if not at.session_state['authenticated']:
+        raise RuntimeError(f"could not log in as {username}")
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def run_pages(at, counter, pages):
+    results = []
+    for page in pages:
+        nav = find_widget(at.sidebar, 'radio', 'Go to')
+        results.append(measure(at, counter, page, 'open', lambda: nav.set_value(page)))
+        for kind, name, value in PAGES[page]:
+            def apply(kind=kind, name=name, value=value):
+                widget = find_widget(at, kind, name)
+                widget.set_value(widget.options[value] if isinstance(value, int) else value)
+
+            step = f'{name} = {value}'
+            results.append(measure(at, counter, page, step, apply))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help="existing generated database to use instead of a new one")
+    parser.add_argument('--transactions', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--pages', nargs='+', choices=list(PAGES), default=list(PAGES))
+    parser.add_argument('--timeout', type=float, default=600, help="seconds a single rerun may take")
+    parser.add_argument('--output', help="JSON results file (default: benchmarks/results/pages-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output or default_output('pages'))
+    install_stubs()
+    counter = StatementCounter()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.abspath(args.database) if args.database else os.path.join(tmp, 'finance.db')
+        if not args.database:
+            generate(path, args.users, args.transactions)
+        db.use(path)
+        schema.reset()
+        # main.py writes backups and reports relative to the working directory
+        os.chdir(tmp)
+
+        at = AppTest.from_file(MAIN, default_timeout=args.timeout)
+        login_ms = login(at, f'user{USER_ID}', 'password')
+        wait_for_scheduler(USER_ID)
+        print(f"login {login_ms:.1f} ms (includes the page's one-second pause)")
+
+        print(f"{'page':<16} {'step':<44} {'cold ms':>9} {'sql':>6} {'warm ms':>9} {'sql':>6} {'peak MiB':>8}")
+        results = run_pages(at, counter, args.pages)
+        db.close_all()
+
+    meta = metadata(database=args.database, transactions=args.transactions, users=args.users, login_ms=login_ms)
+    write_results(output, meta, results)
+    return 1 if any(result['error'] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""Fill a scratch database with realistic synthetic finance data.
+
+Creates ``--users`` users, each with a few accounts, their own categories,
+recurring salary and bill rules, budgets for the last months, savings goals
+and investments, and spreads ``--transactions`` transactions over the last
+``--years`` years ending today. The same seed always produces the same
+database.
+
+Transactions are inserted in date order and in chunks, with the rollup
+triggers dropped during the load; the rollups are rebuilt and ANALYZE is
+run at the end. Loading 10M rows therefore takes minutes rather than hours.
+
+    python benchmarks/generate_data.py scratch.db --users 10 --transactions 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from finance_engine import queries, recurring, rollups, schema, users  # noqa: E402
+
+CHUNK_SIZE = 50_000
+
+# category -> (type, relative frequency, amount range in IDR, merchants)
+CATEGORIES = {
+    'Salary': ('Income', 2, (8_000_000, 25_000_000), ['Payroll', 'Monthly salary']),
+    'Freelance': ('Income', 3, (500_000, 5_000_000), ['Client invoice', 'Consulting']),
+    'Bills & Utilities': ('Expense', 10, (100_000, 1_500_000), ['PLN electricity', 'PDAM water', 'Indihome', 'Telkomsel']),
+    'Shopping': ('Expense', 25, (50_000, 2_000_000), ['Tokopedia', 'Shopee', 'Indomaret', 'Alfamart', 'Uniqlo']),
+    'Food & Dining': ('Expense', 30, (15_000, 400_000), ['GoFood', 'GrabFood', 'Warung', 'Starbucks', 'Kopi Kenangan']),
+    'Education': ('Expense', 3, (200_000, 5_000_000), ['Tuition', 'Books', 'Online course']),
+    'Healthcare': ('Expense', 4, (50_000, 3_000_000), ['Pharmacy', 'Clinic', 'Hospital']),
+    'Entertainment': ('Expense', 8, (30_000, 800_000), ['Netflix', 'Cinema XXI', 'Spotify', 'Concert']),
+    'Transportation': ('Expense', 15, (10_000, 500_000), ['Gojek', 'Grab', 'KRL', 'Pertamina']),
+}
+ACCOUNTS = [('Cash', 'Cash', 2_000_000), ('Savings', 'Bank', 40_000_000),
+            ('Checking', 'Bank', 10_000_000), ('Credit Card', 'Credit Card', -3_000_000)]
+INSTITUTIONS = ['BCA', 'Mandiri', 'BNI', 'BRI', 'CIMB Niaga']
+TAGS = ['work', 'family', 'travel', 'subscription', 'reimbursable']
+INVESTMENTS = [('Bank Central Asia', 'BBCA.JK', 'Stocks'), ('Telkom Indonesia', 'TLKM.JK', 'Stocks'),
+               ('Vanguard S&P 500', 'VOO', 'ETF'), ('Bitcoin', 'BTC-USD', 'Crypto'), ('Government bond', None, 'Bonds')]
+
+
+def account_names(user_id):
+    """The user's account names; account names are unique across users."""
+    return [f"{name} #{user_id}" for name, _, _ in ACCOUNTS]
+
+
+def _populate_users(conn, rng, user_count, today):
+    for user_id in range(1, user_count + 1):
+        conn.execute('INSERT INTO users (id, username, password_hash, email) VALUES (?, ?, ?, ?)',
+                     (user_id, f'user{user_id}', users.hash_password('password'), f'user{user_id}@example.com'))
+        institution = rng.choice(INSTITUTIONS)
+        conn.executemany('''
+            INSERT INTO accounts (name, type, balance, currency, institution, account_number, user_id)
+            VALUES (?, ?, ?, 'IDR', ?, ?, ?)
+        ''', [(name, kind, balance, institution, f'{rng.randrange(10**9, 10**10)}', user_id)
+              for name, (_, kind, balance) in zip(account_names(user_id), ACCOUNTS)])
+        conn.executemany('INSERT INTO categories (name, type, user_id) VALUES (?, ?, ?)',
+                         [(name, spec[0], user_id) for name, spec in CATEGORIES.items()])
+        conn.executemany('INSERT INTO tags (name, user_id) VALUES (?, ?)',
+                         [(f'{tag}-{user_id}', user_id) for tag in TAGS])
+
+        month = today.replace(day=1)
+        budgets = []
+        for _ in range(12):
+            budgets += [(category, round(rng.uniform(*spec[2]) * 8, -3), month.strftime('%Y-%m'), user_id)
+                        for category, spec in CATEGORIES.items() if spec[0] == 'Expense']
+            month = (month - timedelta(days=1)).replace(day=1)
+        conn.executemany('INSERT INTO budgets (category, amount, month_year, user_id) VALUES (?, ?, ?, ?)', budgets)
+
+        conn.executemany('''
+            INSERT INTO savings_goals (name, target_amount, current_amount, target_date, priority, user_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(goal, target, round(target * rng.random(), -3), (today + timedelta(days=rng.randint(90, 1500))).isoformat(),
+               rng.randint(1, 5), user_id)
+              for goal, target in [('Emergency fund', 60_000_000), ('Vacation', 20_000_000), ('New laptop', 25_000_000)]])
+
+        holdings = []
+        for name, symbol, kind in rng.sample(INVESTMENTS, 3):
+            quantity = rng.randint(1, 500)
+            price = rng.uniform(1_000, 100_000)
+            holdings.append((name, symbol, kind, round(quantity * price, 2),
+                             (today - timedelta(days=rng.randint(30, 1500))).isoformat(),
+                             round(quantity * price * rng.uniform(0.7, 1.6), 2), quantity, round(price, 2), user_id))
+        conn.executemany('''
+            INSERT INTO investment_portfolio (name, symbol, type, amount, purchase_date, current_value, quantity, purchase_price, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', holdings)
+
+
+def _recurring_sources(rng, user_count, start):
+    """Monthly salary and bills plus a weekly commute for every user, anchored near ``start``."""
+    rows = []
+    for user_id in range(1, user_count + 1):
+        accounts = account_names(user_id)
+        day = start + timedelta(days=rng.randint(0, 27))
+        rows += [
+            (day.isoformat(), 'Monthly salary', round(rng.uniform(8_000_000, 25_000_000), -3), 'Salary', 'Income',
+             accounts[1], 1, 'Monthly', user_id),
+            ((day + timedelta(days=3)).isoformat(), 'Internet subscription', 350_000.0, 'Bills & Utilities', 'Expense',
+             accounts[2], 1, 'Monthly', user_id),
+            ((day + timedelta(days=1)).isoformat(), 'Commuter pass', 150_000.0, 'Transportation', 'Expense',
+             accounts[0], 1, 'Weekly', user_id),
+        ]
+    return rows
+
+
+def _transaction_rows(rng, user_count, count, start, days):
+    names = list(CATEGORIES)
+    weights = [spec[1] for spec in CATEGORIES.values()]
+    accounts = {user_id: account_names(user_id) for user_id in range(1, user_count + 1)}
+    per_day, extra = divmod(count, days)
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).isoformat()
+        for _ in range(per_day + (offset < extra)):
+            category = rng.choices(names, weights)[0]
+            trans_type, _, (low, high), merchants = CATEGORIES[category]
+            user_id = rng.randint(1, user_count)
+            yield (day, rng.choice(merchants), round(rng.uniform(low, high), -2), category, trans_type,
+                   rng.choice(accounts[user_id]), f'{rng.choice(TAGS)}-{user_id}' if rng.random() < 0.1 else None,
+                   user_id)
+
+
+def generate(path, user_count=10, transaction_count=100_000, years=5, seed=0, today=None, progress=None):
+    """Create the database at ``path``; return counts per table.
+
+    ``progress(inserted, total)`` is called after every chunk of transactions.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    rng = random.Random(seed)
+    today = today or date.today()
+    days = max(1, years * 365)
+    start = today - timedelta(days=days - 1)
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        schema.migrate(conn)
+        # the recurring engine looks its queries up in the registry
+        queries.build(conn)
+        with conn:
+            _populate_users(conn, rng, user_count, today)
+            for name in rollups.TRIGGERS:
+                conn.execute(f'DROP TRIGGER {name}')
+
+            insert = '''
+                INSERT INTO transactions (date, description, amount, category, type, account, tags, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            '''
+            rows, inserted = _transaction_rows(rng, user_count, transaction_count, start, days), 0
+            while True:
+                chunk = [row for _, row in zip(range(CHUNK_SIZE), rows)]
+                if not chunk:
+                    break
+                conn.executemany(insert, chunk)
+                inserted += len(chunk)
+                if progress is not None:
+                    progress(inserted, transaction_count)
+
+            conn.executemany('''
+                INSERT INTO transactions (date, description, amount, category, type, account, recurring, recurring_frequency, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', _recurring_sources(rng, user_count, start))
+            recurring.run_due(today, conn=conn)
+
+            rollups.create(conn)
+            rollups.rebuild(conn)
+        conn.execute('ANALYZE')
+        tables = ['users', 'accounts', 'categories', 'budgets', 'savings_goals', 'investment_portfolio',
+                  'recurring_rules', 'transactions', 'daily_rollups']
+        return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in tables}
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help="database file to create; must not exist")
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--transactions', type=int, default=100_000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+
+    def show_progress(inserted, total):
+        elapsed = time.perf_counter() - started
+        print(f"\r{inserted:,} / {total:,} transactions ({inserted / elapsed:,.0f} rows/sec)", end='', flush=True)
+
+    counts = generate(args.path, args.users, args.transactions, args.years, args.seed, progress=show_progress)
+    print(f"\nWrote {args.path} in {time.perf_counter() - started:.1f}s")
+    for table, count in counts.items():
+        print(f"{table:>22} {count:>12,}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
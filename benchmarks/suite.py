@@ -0,0 +1,242 @@
+"""Time the app's data functions against synthetic databases of growing size.
+
+For each ``--scales`` transaction count, builds a database with
+``generate_data.generate`` (or reuses one from ``--data-dir``) and times
+the engine functions behind the app's pages for user 1: fetching
+transactions, the financial, monthly and category summaries, budget vs
+actual, CSV import, the CSV/Parquet/Excel exports, the balance forecast
+and the trend decomposition.
+
+Reads are timed cold (cache invalidated before every call) and, for the
+cached ones, warm. The import runs inside a transaction that is rolled back,
+so a reused database stays unchanged. Results are written as JSON.
+
+    python benchmarks/suite.py [--scales 10000 100000 1000000] [--output results.json]
+
+Exits with status 1 if any benchmark raised, or, with ``--compare
+baseline.json``, if any benchmark's cold median is more than
+``--max-slowdown`` times the baseline's. With
+``--trace-queries MS``, statements are traced by ``finance_engine.querylog``.
+Their latency histograms are saved per scale, and statements slower than MS
+go to a slow-query log next to the results.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from finance_engine import analytics, budgets, cache, db, exports, importer, querylog, schema, transactions  # noqa: E402
+from generate_data import CATEGORIES, account_names, generate  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+USER_ID = 1
+
+
+def write_import_csv(path, rows):
+    names = list(CATEGORIES)
+    account = account_names(USER_ID)[0]
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['date', 'description', 'amount', 'category', 'type', 'account'])
+        for i in range(rows):
+            category = names[i % len(names)]
+            writer.writerow([(date.today() - timedelta(days=i % 365)).isoformat(), f'Imported {i}',
+                             1000 + i % 997, category, CATEGORIES[category][0], account])
+
+
+def import_rolled_back(path):
+    with db.connection() as conn:
+        try:
+            return importer.import_csv(path, USER_ID, conn=conn).imported
+        finally:
+            conn.rollback()
+
+
+def export_csv(path):
+    with open(path, 'wb') as f:
+        return exports.write_csv(f, user_id=USER_ID)
+
+
+def benchmarks(tmp, import_rows):
+    """Return ``(name, function, cached)`` for each benchmark."""
+    today = date.today()
+    last_year = ((today - timedelta(days=364)).isoformat(), today.isoformat())
+    this_month = (today.replace(day=1).isoformat(), today.isoformat())
+    import_path = os.path.join(tmp, 'import.csv')
+    write_import_csv(import_path, import_rows)
+
+    def expenses(date_range=last_year):
+        frame = transactions.fetch(date_range, USER_ID)
+        return frame[frame['type'] == 'Expense']
+
+    return [
+        ('get_transactions', lambda: transactions.fetch(last_year, USER_ID), True),
+        ('get_transactions_all', lambda: transactions.fetch(None, USER_ID), True),
+        ('get_financial_summary', lambda: analytics.financial_summary(this_month, USER_ID), True),
+        ('get_monthly_summary', lambda: analytics.monthly_summary(today.year, USER_ID), True),
+        ('get_category_spending', lambda: analytics.category_spending(last_year, USER_ID), True),
+        ('get_budget_vs_actual', lambda: budgets.vs_actual(user_id=USER_ID), False),
+        ('export_csv', lambda: export_csv(os.path.join(tmp, 'export.csv')), False),
+        ('export_parquet', lambda: exports.write_parquet(os.path.join(tmp, 'export.parquet'), user_id=USER_ID), False),
+        ('export_excel', lambda: exports.write_excel(os.path.join(tmp, 'export.xlsx'), user_id=USER_ID), False),
+        ('forecast_future_balances', lambda: analytics.forecast_balances(expenses()), False),
+        # the decomposition needs two full years of months
+        ('analyze_spending_trends', lambda: analytics.spending_trends(expenses(None)).trend, False),
+        ('import_transactions_from_csv', lambda: import_rolled_back(import_path), False),
+    ]
+
+
+def row_count(value):
+    """Rows in a benchmark's result: its length, or the count an export or import returned."""
+    if isinstance(value, int):
+        return value
+    return len(value) if hasattr(value, '__len__') else None
+
+
+def measure(func, repeat, warm):
+    """Time ``func`` ``repeat`` times; return ``(rows, timings in ms)``."""
+    timings = []
+    value = None
+    for _ in range(repeat):
+        if not warm:
+            cache.invalidate()
+        start = time.perf_counter()
+        value = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return row_count(value), timings
+
+
+def summarize(timings):
+    return {'median': round(statistics.median(timings), 3), 'min': round(min(timings), 3)}
+
+
+def run_scale(path, scale, args, tmp):
+    db.use(path)
+    schema.reset()
+    schema.ensure_schema()
+    results = []
+    for name, func, cached in benchmarks(tmp, args.import_rows):
+        if name in args.skip:
+            continue
+        result = {'scale': scale, 'benchmark': name, 'rows': None, 'cold_ms': None, 'warm_ms': None, 'error': None}
+        try:
+            result['rows'], cold = measure(func, args.repeat, warm=False)
+            result['cold_ms'] = summarize(cold)
+            if cached:
+                func()
+                result['warm_ms'] = summarize(measure(func, args.repeat, warm=True)[1])
+        except Exception as e:
+            result['error'] = f'{type(e).__name__}: {e}'
+        results.append(result)
+
+        cold = result['cold_ms']['median'] if result['cold_ms'] else float('nan')
+        warm = f"{result['warm_ms']['median']:>10.2f}" if result['warm_ms'] else f"{'':>10}"
+        print(f"{scale:>10} {name:<30} {cold:>10.2f} {warm} {result['error'] or ''}")
+    db.close_all()
+    return results
+
+
+def metadata(**settings):
+    """Describe the environment a run happened in, plus the run's ``settings``."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        **settings,
+    }
+
+
+def default_output(prefix):
+    return os.path.join(RESULTS_DIR, f"{prefix}-{datetime.now():%Y%m%d-%H%M%S}.json")
+
+
+def write_results(path, meta, results, **extra):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'results': results, **extra}, f, indent=2)
+    print(f"Wrote {path}")
+
+
+def compare(results, baseline_path, max_slowdown, min_ms):
+    """Print benchmarks slower than the baseline; return True if any regressed."""
+    with open(baseline_path) as f:
+        baseline = {(r['scale'], r['benchmark']): r for r in json.load(f)['results']}
+    regressed = False
+    for result in results:
+        before = baseline.get((result['scale'], result['benchmark']))
+        if not before or not before['cold_ms'] or not result['cold_ms']:
+            continue
+        old, new = before['cold_ms']['median'], result['cold_ms']['median']
+        if new > max(old, min_ms) * max_slowdown:
+            print(f"REGRESSION {result['benchmark']} at {result['scale']}: {old:.2f} ms -> {new:.2f} ms")
+            regressed = True
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help="transaction counts to test; 10000000 works but takes a while to generate")
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--import-rows', type=int, default=10_000)
+    parser.add_argument('--skip', nargs='*', default=[], help="benchmark names to leave out")
+    parser.add_argument('--data-dir', help="keep generated databases here and reuse them on later runs")
+    parser.add_argument('--output', help="JSON results file (default: benchmarks/results/suite-<timestamp>.json)")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON results of an earlier run")
+    parser.add_argument('--max-slowdown', type=float, default=1.5)
+    parser.add_argument('--min-ms', type=float, default=1.0, help="ignore slowdowns of benchmarks faster than this")
+    parser.add_argument('--trace-queries', type=float, metavar='MS',
+                        help="record per-statement latencies and log statements slower than MS")
+    args = parser.parse_args(argv)
+
+    output = args.output or default_output('suite')
+    if args.trace_queries is not None:
+        querylog.enable(args.trace_queries, os.path.splitext(output)[0] + '-slow.jsonl')
+    results, statements = [], {}
+    print(f"{'scale':>10} {'benchmark':<30} {'cold ms':>10} {'warm ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        for scale in args.scales:
+            path = os.path.join(data_dir, f'finance-{args.users}u-{scale}.db')
+            if not os.path.exists(path):
+                generate(path, args.users, scale, args.years)
+            querylog.reset()
+            results += run_scale(path, scale, args, tmp)
+            if querylog.enabled():
+                statements[scale] = querylog.stats()
+
+    meta = metadata(users=args.users, years=args.years, repeat=args.repeat, import_rows=args.import_rows,
+                    trace_queries=args.trace_queries)
+    write_results(output, meta, results, statements=statements)
+
+    failed = [f"{result['benchmark']} at {result['scale']}" for result in results if result['error']]
+    if failed:
+        print(f"FAILED {', '.join(failed)}")
+    if args.compare and compare(results, args.compare, args.max_slowdown, args.min_ms):
+        return 1
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
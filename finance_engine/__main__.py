@@ -0,0 +1,5 @@
+import sys
+
+from finance_engine import cli
+
+sys.exit(cli.main())
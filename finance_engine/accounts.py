@@ -0,0 +1,55 @@
+"""Money accounts, their balances and currency conversion."""
+from finance_engine import cache, db
+from finance_engine.errors import ServiceError, storage_errors
+from finance_engine.frames import read_frame
+
+
+def fetch(user_id=None):
+    """Return the user's accounts."""
+    return read_frame('accounts', user_id=user_id)
+
+
+@storage_errors
+def add(name, account_type, balance, currency='IDR', institution=None, account_number=None, user_id=None):
+    """Add an account; return its id."""
+    with db.transaction() as conn:
+        account_id = conn.execute('''
+            INSERT INTO accounts (name, type, balance, currency, institution, account_number, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (name, account_type, balance, currency, institution, account_number, user_id)).lastrowid
+    cache.invalidate(user_id)
+    return account_id
+
+
+@storage_errors
+def adjust_balance(account_name, amount, is_debit=False, user_id=None):
+    """Add ``amount`` to an account's balance, or subtract it for a debit; return the rows changed."""
+    with db.transaction() as conn:
+        changed = conn.execute('''
+            UPDATE accounts
+            SET balance = balance + ?
+            WHERE name = ? AND (user_id = ? OR ? IS NULL)
+        ''', (-amount if is_debit else amount, account_name, user_id, user_id)).rowcount
+    cache.invalidate(user_id)
+    return changed
+
+
+def balances(user_id=None):
+    """Return each account's name, balance and currency."""
+    return fetch(user_id).reindex(columns=['name', 'balance', 'currency'])
+
+
+def net_worth(user_id=None):
+    """Return the sum of the user's account balances."""
+    accounts = fetch(user_id)
+    return accounts['balance'].sum() if not accounts.empty else 0
+
+
+def convert_currency(amount, from_currency, to_currency):
+    """Convert ``amount`` at the current exchange rate; raise ``ServiceError`` if no rate is available."""
+    from forex_python.converter import CurrencyRates
+
+    try:
+        return amount * CurrencyRates().get_rate(from_currency, to_currency)
+    except Exception as e:
+        raise ServiceError(str(e)) from e
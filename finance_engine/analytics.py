@@ -0,0 +1,103 @@
+"""Summaries, spending breakdowns and forecasts.
+
+Summaries read the catalogued queries, most of them served from the daily
+rollups. Forecasts and trend decomposition work on a transactions
+DataFrame the caller supplies and never modify it. scikit-learn and
+statsmodels are imported only when those run.
+"""
+import calendar
+
+import numpy as np
+import pandas as pd
+
+from finance_engine import queries
+from finance_engine.errors import AnalysisError
+from finance_engine.frames import read_frame
+
+
+class FinancialSummary:
+    """Income, expense and their difference over a period."""
+
+    def __init__(self, income=0, expense=0):
+        self.income = income
+        self.expense = expense
+        self.balance = income - expense
+
+
+def _has_range(date_range):
+    return bool(date_range and date_range[0] and date_range[1])
+
+
+def financial_summary(date_range, user_id=None):
+    """Return a ``FinancialSummary`` for the inclusive ``date_range``."""
+    if not _has_range(date_range):
+        return FinancialSummary()
+    totals_df = read_frame('financial_summary', queries.date_bounds(date_range[0], date_range[1]), user_id)
+    totals = dict(zip(totals_df['type'], totals_df['total']))
+    return FinancialSummary(totals.get('Income') or 0, totals.get('Expense') or 0)
+
+
+def monthly_summary(year, user_id=None):
+    """Return monthly income and expense for ``year``, one row per month."""
+    df = read_frame('monthly_summary', queries.year_bounds(year), user_id)
+    months = [f"{i:02d}" for i in range(1, 13)]
+    df = df.set_index('month').reindex(months, fill_value=0).reset_index()
+    df['month'] = df['month'].apply(lambda x: calendar.month_abbr[int(x)])
+    return df
+
+
+def category_spending(date_range, user_id=None):
+    """Return expenses per category for the inclusive ``date_range``."""
+    if not _has_range(date_range):
+        return pd.DataFrame()
+    return read_frame('category_spending', queries.date_bounds(date_range[0], date_range[1]), user_id)
+
+
+def daily_spending(date_range, user_id=None):
+    """Return total expenses per day for the inclusive ``date_range``."""
+    if not _has_range(date_range):
+        return pd.DataFrame()
+    return read_frame('daily_spending', queries.date_bounds(date_range[0], date_range[1]), user_id,
+                      parse_dates=['date'])
+
+
+def _monthly_amounts(transactions):
+    frame = transactions.assign(date=pd.to_datetime(transactions['date'])).set_index('date')
+    return frame.resample('ME')['amount'].sum()
+
+
+def forecast_balances(transactions, months=6):
+    """Fit a linear trend to monthly totals and project it ``months`` ahead.
+
+    Returns a DataFrame of ``date`` and ``amount``. Raises ``AnalysisError``
+    when the data cannot be fitted.
+    """
+    from sklearn.linear_model import LinearRegression
+
+    try:
+        monthly = _monthly_amounts(transactions)
+        X = np.arange(len(monthly)).reshape(-1, 1)
+        model = LinearRegression()
+        model.fit(X, monthly.values)
+
+        future_X = np.arange(len(monthly), len(monthly) + months).reshape(-1, 1)
+        future_dates = pd.date_range(start=monthly.index[-1] + pd.offsets.MonthBegin(1), periods=months, freq='ME')
+        return pd.DataFrame({'date': future_dates, 'amount': model.predict(future_X)})
+    except (ValueError, KeyError, IndexError) as e:
+        raise AnalysisError(str(e)) from e
+
+
+def spending_trends(transactions):
+    """Decompose monthly totals into trend, seasonal and residual parts.
+
+    Raises ``AnalysisError`` when there are too few months to decompose.
+    """
+    from statsmodels.tsa.seasonal import seasonal_decompose
+
+    try:
+        monthly = _monthly_amounts(transactions)
+        all_months = pd.date_range(start=monthly.index.min(), end=monthly.index.max(), freq='ME')
+        monthly = monthly.reindex(all_months, fill_value=0)
+        return seasonal_decompose(monthly, model='additive', period=12)
+    except (ValueError, KeyError, IndexError) as e:
+        raise AnalysisError(str(e)) from e
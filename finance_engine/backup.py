@@ -0,0 +1,125 @@
+"""Online database backups.
+
+Backups use SQLite's backup API and copy the live database a batch of pages
+at a time. A backup sees a consistent snapshot, and in WAL mode it never
+blocks writers. If another connection writes between two steps, SQLite
+restarts the copy, so the result is still a consistent database. After
+``MAX_RESTARTS`` restarts the backup finishes in a single step instead; in
+WAL mode that step holds only a read snapshot. The backup file is switched to rollback-journal mode so that it opens as a
+single self-contained file.
+
+Local snapshots are gzip-compressed, timestamped copies in ``BACKUP_DIR``.
+Only the newest ``SNAPSHOT_RETENTION`` are kept.
+"""
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+from finance_engine import db
+
+BACKUP_DIR = os.environ.get('FINANCE_BACKUP_DIR', 'backups')
+SNAPSHOT_RETENTION = int(os.environ.get('FINANCE_BACKUP_RETENTION', '7'))
+PAGES_PER_STEP = 1024
+MAX_RESTARTS = 3
+SNAPSHOT_PREFIX = 'finance-'
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _copy(source, target, pages, progress):
+    """Run the backup; return how many times concurrent writes restarted it."""
+    state = {'copied': 0, 'restarts': 0}
+
+    def report(status, remaining, total):
+        copied = total - remaining
+        if copied < state['copied']:
+            state['restarts'] += 1
+            if state['restarts'] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state['copied'] = copied
+        if progress is not None:
+            progress(copied, total)
+
+    try:
+        source.backup(target, pages=pages, progress=report)
+    except _TooManyRestarts:
+        source.backup(target, pages=-1)
+        if progress is not None:
+            progress(1, 1)
+    return state['restarts']
+
+
+def backup_to(path, source=None, pages=PAGES_PER_STEP, progress=None):
+    """Copy the database into the file at ``path``; return the number of restarts.
+
+    ``source`` defaults to a pooled connection to the app database.
+    ``progress(copied, total)`` is called with page counts after every step.
+    """
+    target = sqlite3.connect(path)
+    try:
+        if source is None:
+            with db.connection() as conn:
+                restarts = _copy(conn, target, pages, progress)
+        else:
+            restarts = _copy(source, target, pages, progress)
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+    return restarts
+
+
+@contextmanager
+def temporary_backup(progress=None):
+    """Back up into a temp file and yield it opened for reading; the file is removed afterwards."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        backup_to(path, progress=progress)
+        with open(path, 'rb') as f:
+            yield f
+    finally:
+        os.remove(path)
+
+
+def list_snapshots(directory=BACKUP_DIR):
+    """Return snapshot paths in ``directory``, newest first."""
+    pattern = os.path.join(directory, f'{SNAPSHOT_PREFIX}*.db.gz')
+    return sorted(glob.glob(pattern), reverse=True)
+
+
+def prune_snapshots(directory=BACKUP_DIR, retention=SNAPSHOT_RETENTION):
+    """Delete all but the newest ``retention`` snapshots; return the removed paths."""
+    removed = list_snapshots(directory)[retention:]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def save_snapshot(backup_file, directory=BACKUP_DIR, retention=SNAPSHOT_RETENTION):
+    """Compress an open backup file into a timestamped snapshot and apply retention; return its path."""
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    path = os.path.join(directory, f'{SNAPSHOT_PREFIX}{stamp}.db.gz')
+    partial = path + '.part'
+    try:
+        with gzip.open(partial, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(backup_file, dst, 1 << 20)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    prune_snapshots(directory, retention)
+    return path
+
+
+def write_snapshot(directory=BACKUP_DIR, retention=SNAPSHOT_RETENTION, progress=None):
+    """Back up the database straight into a new snapshot; return its path."""
+    with temporary_backup(progress) as backup_file:
+        return save_snapshot(backup_file, directory, retention)
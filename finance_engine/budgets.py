@@ -0,0 +1,120 @@
+"""Monthly category budgets and savings goals."""
+import calendar
+from datetime import datetime
+
+import pandas as pd
+
+from finance_engine import analytics, cache, db
+from finance_engine.errors import storage_errors
+from finance_engine.frames import read_frame
+
+
+def current_month():
+    """Return this month as ``YYYY-MM``."""
+    return datetime.today().strftime('%Y-%m')
+
+
+def fetch(month_year=None, user_id=None):
+    """Return the budgets for ``month_year`` (``YYYY-MM``, default this month)."""
+    return read_frame('budgets', {'month_year': month_year or current_month()}, user_id)
+
+
+@storage_errors
+def add(category, amount, month_year=None, notifications=True, user_id=None):
+    """Add a budget; return its id."""
+    with db.transaction() as conn:
+        budget_id = conn.execute('''
+            INSERT INTO budgets (category, amount, month_year, notifications, user_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (category, amount, month_year or current_month(), int(notifications), user_id)).lastrowid
+    cache.invalidate(user_id)
+    return budget_id
+
+
+@storage_errors
+def update(budget_id, category, amount, month_year, notifications, user_id=None):
+    """Update a budget; return the number of rows changed."""
+    with db.transaction() as conn:
+        changed = conn.execute('''
+            UPDATE budgets
+            SET category = ?, amount = ?, month_year = ?, notifications = ?
+            WHERE id = ? AND (user_id = ? OR ? IS NULL)
+        ''', (category, amount, month_year, int(notifications), budget_id, user_id, user_id)).rowcount
+    cache.invalidate(user_id)
+    return changed
+
+
+@storage_errors
+def delete(budget_id, user_id=None):
+    """Delete a budget; return the number of rows deleted."""
+    with db.transaction() as conn:
+        deleted = conn.execute('''
+            DELETE FROM budgets
+            WHERE id = ? AND (user_id = ? OR ? IS NULL)
+        ''', (budget_id, user_id, user_id)).rowcount
+    cache.invalidate(user_id)
+    return deleted
+
+
+def vs_actual(month_year=None, user_id=None):
+    """Compare each budget of the month with the actual spending in its category."""
+    month_year = month_year or current_month()
+    budgets = fetch(month_year, user_id)
+    if budgets.empty:
+        return pd.DataFrame()
+
+    start_date = datetime.strptime(f"{month_year}-01", '%Y-%m-%d')
+    end_date = start_date.replace(day=calendar.monthrange(start_date.year, start_date.month)[1])
+    actual_spending = analytics.category_spending((start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')), user_id)
+    if not actual_spending.empty:
+        actual_spending.columns = ['category', 'actual']
+    else:
+        actual_spending = pd.DataFrame(columns=['category', 'actual'])
+
+    comparison = pd.merge(budgets, actual_spending, on='category', how='left')
+    comparison['actual'] = comparison['actual'].fillna(0)
+    comparison['difference'] = comparison['amount'] - comparison['actual']
+    comparison['percentage'] = (comparison['actual'] / comparison['amount']) * 100
+    return comparison
+
+
+def goals(user_id=None):
+    """Return the user's savings goals."""
+    return read_frame('savings_goals', user_id=user_id, parse_dates=['target_date'])
+
+
+@storage_errors
+def add_goal(name, target_amount, current_amount=0, target_date=None, notes=None, priority=3, user_id=None):
+    """Add a savings goal; return its id."""
+    with db.transaction() as conn:
+        goal_id = conn.execute('''
+            INSERT INTO savings_goals (name, target_amount, current_amount, target_date, notes, priority, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (name, target_amount, current_amount, target_date, notes, priority, user_id)).lastrowid
+    cache.invalidate(user_id)
+    return goal_id
+
+
+@storage_errors
+def update_goal(goal_id, name, target_amount, current_amount, target_date, notes, priority, user_id=None):
+    """Update a savings goal; return the number of rows changed."""
+    with db.transaction() as conn:
+        changed = conn.execute('''
+            UPDATE savings_goals
+            SET name = ?, target_amount = ?, current_amount = ?, target_date = ?, notes = ?, priority = ?
+            WHERE id = ? AND (user_id = ? OR ? IS NULL)
+        ''', (name, target_amount, current_amount, target_date, notes, priority, goal_id, user_id, user_id)).rowcount
+    cache.invalidate(user_id)
+    return changed
+
+
+@storage_errors
+def delete_goal(goal_id, user_id=None):
+    """Delete a savings goal; return the number of rows deleted."""
+    with db.transaction() as conn:
+        deleted = conn.execute('''
+            DELETE FROM savings_goals
+            WHERE id = ? AND (user_id = ? OR ? IS NULL)
+        ''', (goal_id, user_id, user_id)).rowcount
+    cache.invalidate(user_id)
+    return deleted
@@ -0,0 +1,255 @@
+"""Process-wide cache for read queries, invalidated by writes.
+
+Entries are keyed by ``(user_id, function, arguments)`` and remember the
+user's generation counter at the time they were computed. Every write bumps
+the generation of the user it touched, which makes that user's entries stale
+at once without touching anyone else's. Entries also expire after a TTL, and
+the least recently used ones are evicted beyond ``max_entries``.
+
+Cached values are copied on the way out, so callers can mutate the
+DataFrames they get back.
+
+``request_scope()`` adds a second, shorter-lived layer: inside it, functions
+decorated with ``per_request`` run once per distinct call and repeat calls
+are answered from the scope, unless a write bumped the user's generation in
+between. The app opens one scope per script run.
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from finance_engine import profiling
+
+MAX_ENTRIES = int(os.environ.get('FINANCE_CACHE_MAX_ENTRIES', '512'))
+TTL_SECONDS = float(os.environ.get('FINANCE_CACHE_TTL', '300'))
+
+
+def _copy(value):
+    copy = getattr(value, 'copy', None)
+    return copy() if callable(copy) else value
+
+
+def _freeze(value):
+    """Turn dicts and lists into hashable equivalents for use in a key."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class QueryCache:
+    """An LRU + TTL cache with per-user generation counters."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = defaultdict(int)
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _generation(self, user_id):
+        return (self._epoch, self._generations[user_id])
+
+    def generation(self, user_id):
+        """Return a token that changes whenever ``user_id``'s data is written."""
+        with self._lock:
+            return self._generation(user_id)
+
+    def get_or_compute(self, user_id, name, args, compute):
+        """Return the cached value for the key, or compute and store it."""
+        key = (user_id, name, args)
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generation(user_id)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                profiling.cache_hit()
+                return _copy(entry[2])
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            # A write may have landed while computing; then the entry is born stale
+            self._entries[key] = (generation, now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return _copy(value)
+
+    def invalidate(self, user_id=None):
+        """Mark a user's entries stale, or everybody's when ``user_id`` is None."""
+        with self._lock:
+            if user_id is None:
+                self._epoch += 1
+                self._entries.clear()
+                return
+            self._generations[user_id] += 1
+            # Unscoped (user_id=None) reads include this user's rows too
+            self._generations[None] += 1
+            for key in [k for k in self._entries if k[0] in (user_id, None)]:
+                del self._entries[key]
+
+    def footprint(self):
+        """Return the deep size in bytes of the cached DataFrames, per user."""
+        with self._lock:
+            values = [(key[0], entry[2]) for key, entry in self._entries.items()]
+        sizes = defaultdict(int)
+        for user_id, value in values:
+            sizes[user_id] += profiling.frame_footprint([value])
+        return dict(sizes)
+
+    def stats(self):
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+            }
+
+
+_cache = QueryCache()
+
+
+def get_cache():
+    """Return the process-wide query cache."""
+    return _cache
+
+
+def invalidate(user_id=None):
+    """Invalidate cached reads for ``user_id`` (or for everyone)."""
+    _cache.invalidate(user_id)
+
+
+def stats():
+    """Return the process-wide cache statistics."""
+    return _cache.stats()
+
+
+def footprint():
+    """Return the bytes held by cached DataFrames, per user."""
+    return _cache.footprint()
+
+
+def _call_key(signature, args, kwargs):
+    """Split a call into ``(user_id, hashable key)``; the key is None if unhashable."""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    user_id = arguments.pop('user_id', None)
+    key = _freeze(arguments)
+    try:
+        hash(key)
+    except TypeError:
+        return user_id, None
+    return user_id, key
+
+
+def cached(func):
+    """Cache ``func``'s results per user and arguments.
+
+    ``func`` must take a ``user_id`` argument. Exceptions are not cached.
+    Calls whose arguments cannot be hashed bypass the cache.
+    """
+    signature = inspect.signature(func)
+    name = f'{func.__module__}.{func.__qualname__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        user_id, key = _call_key(signature, args, kwargs)
+        if key is None:
+            return func(*args, **kwargs)
+        return _cache.get_or_compute(user_id, name, key, lambda: func(*args, **kwargs))
+
+    return wrapper
+
+
+class RequestScope:
+    """Results of the calls made during one script run."""
+
+    def __init__(self):
+        self.values = {}
+        self.calls = 0
+        self.avoided = 0
+
+
+_scope = contextvars.ContextVar('finance_request_scope', default=None)
+_request_totals = {'scopes': 0, 'calls': 0, 'avoided': 0}
+_request_totals_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def request_scope():
+    """Deduplicate ``per_request`` calls made inside the block."""
+    scope = RequestScope()
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+        with _request_totals_lock:
+            _request_totals['scopes'] += 1
+            _request_totals['calls'] += scope.calls
+            _request_totals['avoided'] += scope.avoided
+
+
+def request_stats():
+    """Return per-request memo counters, summed over finished scopes."""
+    scope = _scope.get()
+    with _request_totals_lock:
+        totals = dict(_request_totals)
+    if scope is not None:
+        totals['current_calls'] = scope.calls
+        totals['current_avoided'] = scope.avoided
+    return totals
+
+
+def per_request(func):
+    """Run ``func`` once per distinct call within the current ``request_scope()``.
+
+    Outside a scope, and for unhashable arguments, calls go straight through.
+    A write to the user in between makes the next call run again.
+    """
+    signature = inspect.signature(func)
+    name = f'{func.__module__}.{func.__qualname__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        scope = _scope.get()
+        if scope is None:
+            return func(*args, **kwargs)
+        user_id, key = _call_key(signature, args, kwargs)
+        if key is None:
+            return func(*args, **kwargs)
+        key = (user_id, name, key)
+        generation = _cache.generation(user_id)
+        scope.calls += 1
+        entry = scope.values.get(key)
+        if entry is not None and entry[0] == generation:
+            scope.avoided += 1
+            profiling.cache_hit()
+            return _copy(entry[1])
+        value = func(*args, **kwargs)
+        scope.values[key] = (generation, value)
+        return _copy(value)
+
+    return wrapper
@@ -0,0 +1,202 @@
+"""Headless maintenance commands.
+
+Usage::
+
+    python -m finance_engine recurring [--user ID ...] [--date YYYY-MM-DD] [--force] [--workers N]
+    python -m finance_engine rebuild-rollups [--user ID ...] [--workers N]
+    python -m finance_engine backup [--dir DIR] [--retention N]
+    python -m finance_engine import FILE [FILE ...] --user ID
+    python -m finance_engine report [--user ID ...] [--format csv|excel|parquet] [--out DIR]
+                                    [--start YYYY-MM-DD --end YYYY-MM-DD] [--workers N]
+    python -m finance_engine check-plans [DATABASE]
+
+Commands work on the database named by ``FINANCE_DB_PATH`` (default
+``finance.db``) and never import Streamlit, so they can run from cron.
+Per-user commands cover every user unless ``--user`` is given, and
+``--workers`` runs users in parallel threads. SQLite still admits one
+writer at a time, so workers mainly overlap reads and file output. The
+exit status is 1 if any user's job failed. A running app's read cache
+(``cache.TTL_SECONDS``) picks up changes made here once its entries expire.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from finance_engine import backup, db, exports, importer, plans, rollups, scheduler, schema
+
+REPORT_FORMATS = {'csv': '.csv', 'excel': '.xlsx', 'parquet': '.parquet'}
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {value!r}")
+
+
+def _user_ids(selected):
+    if selected:
+        return selected
+    with db.connection() as conn:
+        return [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+
+
+def for_users(user_ids, job, workers=1):
+    """Run ``job(user_id)`` for each user; return ``(user_id, result, error)`` in input order."""
+    def run(user_id):
+        try:
+            return user_id, job(user_id), None
+        except Exception as e:
+            return user_id, None, e
+
+    if workers <= 1:
+        return [run(user_id) for user_id in user_ids]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, user_ids))
+
+
+def _report_outcomes(outcomes, describe):
+    failures = 0
+    for user_id, result, error in outcomes:
+        if error is not None:
+            print(f"user {user_id}: failed: {error}", file=sys.stderr)
+            failures += 1
+        else:
+            print(f"user {user_id}: {describe(result)}")
+    return 1 if failures else 0
+
+
+def cmd_recurring(args):
+    def job(user_id):
+        return scheduler.run_user(user_id, args.date, force=args.force)
+
+    def describe(result):
+        if result is None:
+            return "already processed today"
+        return f"{result.processed} due rules, {result.generated} transactions generated"
+
+    return _report_outcomes(for_users(_user_ids(args.user), job, args.workers), describe)
+
+
+def cmd_rebuild_rollups(args):
+    if not args.user:
+        with db.transaction() as conn:
+            rows = rollups.rebuild(conn)
+        print(f"Rebuilt {rows} rollup rows")
+        return 0
+
+    def job(user_id):
+        with db.transaction() as conn:
+            return rollups.rebuild(conn, user_id)
+
+    return _report_outcomes(for_users(args.user, job, args.workers), lambda rows: f"{rows} rollup rows")
+
+
+def cmd_backup(args):
+    started = time.perf_counter()
+    path = backup.write_snapshot(args.dir, args.retention)
+    print(f"Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB) in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+def cmd_import(args):
+    failures = 0
+    imported = False
+    for path in args.files:
+        try:
+            result = importer.import_csv(path, args.user)
+        except Exception as e:
+            print(f"{path}: failed, nothing was imported: {e}", file=sys.stderr)
+            failures += 1
+            continue
+        print(f"{path}: imported {result.imported} of {result.read} rows, skipped {result.skipped} "
+              f"({result.rows_per_second:,.0f} rows/sec)")
+        imported = True
+    if imported:
+        # Imported rows may include recurring sources
+        try:
+            scheduler.run_user(args.user, force=True)
+        except Exception as e:
+            print(f"recurring processing failed after the import: {e}", file=sys.stderr)
+            failures += 1
+    return 1 if failures else 0
+
+
+def cmd_report(args):
+    if (args.start is None) != (args.end is None):
+        print("--start and --end must be given together", file=sys.stderr)
+        return 2
+    date_range = (args.start, args.end) if args.start else None
+    os.makedirs(args.out, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    def job(user_id):
+        path = os.path.join(args.out, f"transactions_user{user_id}_{stamp}{REPORT_FORMATS[args.format]}")
+        if args.format == 'csv':
+            with open(path, 'wb') as f:
+                rows = exports.write_csv(f, date_range, user_id)
+        elif args.format == 'excel':
+            rows = exports.write_excel(path, date_range, user_id, sheet_per_year=args.sheet_per_year)
+        else:
+            rows = exports.write_parquet(path, date_range, user_id)
+        return path, rows
+
+    return _report_outcomes(for_users(_user_ids(args.user), job, args.workers),
+                            lambda result: f"{result[1]} rows -> {result[0]}")
+
+
+def cmd_check_plans(args):
+    return plans.main([args.database] if args.database else [])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m finance_engine', description="Finance tracker maintenance commands.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def per_user(command, help):
+        sub = commands.add_parser(command, help=help)
+        sub.add_argument('--user', type=int, action='append', metavar='ID',
+                         help="only this user; repeat for several (default: every user)")
+        sub.add_argument('--workers', type=int, default=1, help="users to process in parallel")
+        return sub
+
+    sub = per_user('recurring', "generate due recurring transactions")
+    sub.add_argument('--date', type=_date, help="process as of this date (default: today)")
+    sub.add_argument('--force', action='store_true', help="run even if the day was already processed")
+    sub.set_defaults(func=cmd_recurring)
+
+    sub = per_user('rebuild-rollups', "recompute the daily rollups")
+    sub.set_defaults(func=cmd_rebuild_rollups)
+
+    sub = commands.add_parser('backup', help="write a compressed snapshot")
+    sub.add_argument('--dir', default=backup.BACKUP_DIR, help="snapshot directory")
+    sub.add_argument('--retention', type=int, default=backup.SNAPSHOT_RETENTION, help="snapshots to keep")
+    sub.set_defaults(func=cmd_backup)
+
+    sub = commands.add_parser('import', help="import transaction CSV files for one user")
+    sub.add_argument('files', nargs='+', metavar='FILE')
+    sub.add_argument('--user', type=int, required=True, metavar='ID')
+    sub.set_defaults(func=cmd_import)
+
+    sub = per_user('report', "export each user's transactions with a rollup summary")
+    sub.add_argument('--format', choices=sorted(REPORT_FORMATS), default='excel')
+    sub.add_argument('--out', default='reports', help="output directory")
+    sub.add_argument('--start', type=_date)
+    sub.add_argument('--end', type=_date)
+    sub.add_argument('--sheet-per-year', action='store_true', help="Excel only: one sheet per year")
+    sub.set_defaults(func=cmd_report)
+
+    sub = commands.add_parser('check-plans', help="check that catalogued queries use indexes")
+    sub.add_argument('database', nargs='?', help="an existing database, opened read-only")
+    sub.set_defaults(func=cmd_check_plans)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.func is not cmd_check_plans:
+        schema.ensure_schema()
+    return args.func(args)
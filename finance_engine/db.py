@@ -0,0 +1,174 @@
+"""SQLite connection management for the finance tracker.
+
+Streamlit re-executes ``main.py`` on every interaction but keeps imported
+modules alive, so the pool defined here is created once per process and its
+connections are reused by every rerun and every session.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from finance_engine import profiling, querylog
+
+DB_PATH = os.environ.get('FINANCE_DB_PATH', 'finance.db')
+POOL_SIZE = int(os.environ.get('FINANCE_DB_POOL_SIZE', '8'))
+BUSY_TIMEOUT_MS = 5000
+
+# Applied to every new connection; WAL lets readers run alongside a writer.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class ConnectionPool:
+    """A bounded pool of reusable SQLite connections."""
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._generation = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            factory=querylog.connection_factory(),
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._open < self.size
+            if can_open:
+                self._open += 1
+                generation = self._generation
+
+        if can_open:
+            try:
+                return generation, self._connect()
+            except sqlite3.Error:
+                with self._lock:
+                    self._open -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=BUSY_TIMEOUT_MS / 1000)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a pooled database connection")
+
+    def _release(self, generation, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            generation = None
+
+        with self._lock:
+            reusable = generation == self._generation
+            if not reusable:
+                self._open -= 1
+
+        if reusable:
+            self._idle.put((generation, conn))
+        else:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the block.
+
+        Inside a profiling session, the statements it runs are counted
+        (traced connections count them themselves).
+        """
+        generation, conn = self._acquire()
+        traced = profiling.active() and not querylog.is_traced(conn)
+        if traced:
+            conn.set_trace_callback(profiling.count_statement)
+        try:
+            yield conn
+        finally:
+            if traced:
+                conn.set_trace_callback(None)
+            self._release(generation, conn)
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection and commit on success or roll back on error."""
+        with self.connection() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def close_all(self):
+        """Close idle connections and retire the ones currently borrowed."""
+        with self._lock:
+            self._generation += 1
+        while True:
+            try:
+                _, conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._open -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def use(path):
+    """Point the process-wide pool at another database file, e.g. in benchmarks and tools."""
+    global DB_PATH, _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        DB_PATH = path
+        _pool = ConnectionPool(path)
+
+
+def connection():
+    """Borrow a pooled connection: ``with db.connection() as conn: ...``"""
+    return get_pool().connection()
+
+
+def transaction():
+    """Borrow a pooled connection inside a transaction."""
+    return get_pool().transaction()
+
+
+def close_all():
+    """Close every pooled connection, e.g. before the database file is replaced."""
+    if _pool is not None:
+        _pool.close_all()
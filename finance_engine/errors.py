@@ -0,0 +1,40 @@
+"""Exceptions raised by the data engine.
+
+Engine functions never talk to the UI: they return values and raise these,
+and the caller decides how to report them. Each error's message is the
+underlying cause, so the app can keep prefixing it with what it was doing.
+"""
+import functools
+import sqlite3
+
+
+class FinanceError(Exception):
+    """Base class for errors raised by the data engine."""
+
+
+class StorageError(FinanceError):
+    """The database could not complete the operation."""
+
+
+class NotFoundError(FinanceError, LookupError):
+    """The row does not exist or belongs to another user."""
+
+
+class ServiceError(FinanceError):
+    """An external market-data or exchange-rate service failed."""
+
+
+class AnalysisError(FinanceError):
+    """The data cannot support the requested analysis."""
+
+
+def storage_errors(func):
+    """Re-raise ``sqlite3.Error`` from ``func`` as ``StorageError``."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+
+    return wrapper
@@ -0,0 +1,241 @@
+"""Streaming transaction exports.
+
+Exports page through ``transactions`` with keyset pagination on
+``(date, id)``. Each page starts where the last one ended, so the whole
+export costs one index seek per page, and no page needs ``OFFSET``. Only one
+page of rows is in memory at a time. All pages are read inside a single read
+transaction, which in WAL mode gives a consistent snapshot without blocking
+writers.
+
+CSV is produced as a stream of encoded chunks. Parquet is written one row
+group per page, with typed columns and zstd compression. Excel workbooks are
+written in xlsxwriter's constant-memory mode, which flushes every row to disk
+once the next one starts, and their Summary sheet comes from the daily
+rollups rather than from the exported rows.
+"""
+import csv
+import io
+from datetime import datetime
+
+from finance_engine import db, queries
+
+PAGE_SIZE = 5000
+EXCEL_MAX_ROWS = 1048576  # per worksheet, header included
+
+COLUMNS = ['id', 'date', 'description', 'amount', 'category', 'type', 'account', 'recurring',
+           'recurring_frequency', 'recurring_end_date', 'notes', 'tags']
+
+
+def _bounds(date_range):
+    if date_range and date_range[0] and date_range[1]:
+        return queries.date_bounds(date_range[0], date_range[1])
+    return queries.open_bounds()
+
+
+def iter_pages(date_range=None, user_id=None, page_size=PAGE_SIZE):
+    """Yield lists of transaction rows (tuples in ``COLUMNS`` order), oldest first."""
+    sql = queries.sql('transactions_export_page', user_id)
+    params = {'user_id': user_id, 'limit': page_size, 'after_date': '', 'after_id': 0, **_bounds(date_range)}
+    with db.connection() as conn:
+        conn.execute('BEGIN')
+        try:
+            while True:
+                rows = conn.execute(sql, params).fetchall()
+                if not rows:
+                    return
+                yield rows
+                if len(rows) < page_size:
+                    return
+                params['after_id'], params['after_date'] = rows[-1][0], rows[-1][1]
+        finally:
+            conn.rollback()
+
+
+def _csv_chunks(date_range, user_id, page_size, encoding):
+    """Yield ``(encoded chunk, rows in it)``: the header, then one chunk per page."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(COLUMNS)
+    yield buffer.getvalue().encode(encoding), 0
+    for rows in iter_pages(date_range, user_id, page_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode(encoding), len(rows)
+
+
+def iter_csv(date_range=None, user_id=None, page_size=PAGE_SIZE, encoding='utf-8'):
+    """Yield the CSV export as encoded chunks: the header, then one chunk per page."""
+    for chunk, _ in _csv_chunks(date_range, user_id, page_size, encoding):
+        yield chunk
+
+
+def write_csv(output, date_range=None, user_id=None, page_size=PAGE_SIZE, encoding='utf-8'):
+    """Stream the CSV export into a binary file object; return the number of rows."""
+    count = 0
+    for chunk, rows in _csv_chunks(date_range, user_id, page_size, encoding):
+        output.write(chunk)
+        count += rows
+    return count
+
+
+def parquet_schema():
+    """Arrow schema of the Parquet export."""
+    import pyarrow as pa
+
+    return pa.schema([
+        ('id', pa.int64()),
+        ('date', pa.date32()),
+        ('description', pa.string()),
+        ('amount', pa.float64()),
+        ('category', pa.string()),
+        ('type', pa.string()),
+        ('account', pa.string()),
+        ('recurring', pa.bool_()),
+        ('recurring_frequency', pa.string()),
+        ('recurring_end_date', pa.date32()),
+        ('notes', pa.string()),
+        ('tags', pa.string()),
+    ])
+
+
+def _date_array(values):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # Stored dates are text; anything that is not YYYY-MM-DD becomes null
+    text = pc.utf8_slice_codeunits(pa.array(values, type=pa.string()), 0, 10)
+    return pc.strptime(text, format='%Y-%m-%d', unit='s', error_is_null=True).cast(pa.date32())
+
+
+def _record_batch(rows, schema):
+    import pyarrow as pa
+
+    columns = list(zip(*rows))
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_date32(field.type):
+            arrays.append(_date_array(values))
+        elif pa.types.is_boolean(field.type):
+            arrays.append(pa.array([None if v is None else bool(v) for v in values], type=field.type))
+        elif pa.types.is_string(field.type):
+            arrays.append(pa.array([None if v is None else str(v) for v in values], type=field.type))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_parquet(output, date_range=None, user_id=None, page_size=PAGE_SIZE, compression='zstd'):
+    """Write the Parquet export to a path or binary file object; return the number of rows."""
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    count = 0
+    with pq.ParquetWriter(output, schema, compression=compression) as writer:
+        for rows in iter_pages(date_range, user_id, page_size):
+            writer.write_batch(_record_batch(rows, schema))
+            count += len(rows)
+    return count
+
+
+def summary_rows(date_range=None, user_id=None):
+    """Return ``(type, category, account, total)`` rows for the range, from the rollups."""
+    params = {'user_id': user_id, **_bounds(date_range)}
+    with db.connection() as conn:
+        return conn.execute(queries.sql('export_summary', user_id), params).fetchall()
+
+
+def _excel_date(value):
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+class _SheetWriter:
+    """Appends rows to a sequence of worksheets, starting a new one when one fills up."""
+
+    def __init__(self, workbook, max_rows):
+        self.workbook = workbook
+        self.max_rows = max_rows
+        self.date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+        self.header_format = workbook.add_format({'bold': True})
+        self.sheet = None
+        self.name = None
+        self.titles = set()
+        self.row = 0
+
+    def start(self, name):
+        self.name = name
+        self._new_sheet()
+
+    def _new_sheet(self):
+        title, part = self.name, 1
+        while title in self.titles:
+            part += 1
+            title = f"{self.name} ({part})"
+        self.titles.add(title)
+        self.sheet = self.workbook.add_worksheet(title)
+        self.sheet.write_row(0, 0, COLUMNS, self.header_format)
+        self.row = 1
+
+    def write(self, record):
+        if self.row >= self.max_rows:
+            self._new_sheet()
+        for col, value in enumerate(record):
+            if value is None:
+                continue
+            if COLUMNS[col] in ('date', 'recurring_end_date'):
+                date = _excel_date(value)
+                if date is not None:
+                    self.sheet.write_datetime(self.row, col, date, self.date_format)
+                    continue
+            self.sheet.write(self.row, col, value)
+        self.row += 1
+
+
+def _write_summary(workbook, rows):
+    """Pivot ``(type, category, account, total)`` into one row per type/category, one column per account."""
+    accounts = sorted({account for _, _, account, _ in rows})
+    pivot = {}
+    for trans_type, category, account, total in rows:
+        pivot.setdefault((trans_type, category), {})[account] = total
+
+    sheet = workbook.add_worksheet('Summary')
+    bold = workbook.add_format({'bold': True})
+    sheet.write_row(0, 0, ['type', 'category'] + accounts, bold)
+    for row, ((trans_type, category), totals) in enumerate(sorted(pivot.items()), start=1):
+        sheet.write_row(row, 0, [trans_type, category] + [totals.get(account, 0) for account in accounts])
+
+
+def write_excel(output, date_range=None, user_id=None, page_size=PAGE_SIZE, sheet_per_year=False,
+                max_rows=EXCEL_MAX_ROWS):
+    """Write the Excel export to a path or binary file object; return the number of rows.
+
+    Transactions go to one sheet (or one per year with ``sheet_per_year``);
+    a sheet that reaches ``max_rows`` continues on a numbered sibling.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    sheets = _SheetWriter(workbook, max_rows)
+    count = 0
+    try:
+        if not sheet_per_year:
+            sheets.start('Transactions')
+        for rows in iter_pages(date_range, user_id, page_size):
+            for record in rows:
+                if sheet_per_year:
+                    year = str(record[1])[:4]
+                    if not year.isdigit():
+                        year = 'Other'
+                    if year != sheets.name:
+                        sheets.start(year)
+                sheets.write(record)
+            count += len(rows)
+        if sheets.sheet is None:
+            sheets.start('Transactions')
+        _write_summary(workbook, summary_rows(date_range, user_id))
+    finally:
+        workbook.close()
+    return count
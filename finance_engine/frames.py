@@ -0,0 +1,17 @@
+"""Cached DataFrame reads of catalogued queries."""
+import sqlite3
+
+import pandas as pd
+
+from finance_engine import cache, db, errors, queries
+
+
+@cache.cached
+def read_frame(name, params=None, user_id=None, parse_dates=None):
+    """Run a catalogued query and return the result as a DataFrame (cached until the user's next write)."""
+    try:
+        with db.connection() as conn:
+            return pd.read_sql(queries.sql(name, user_id), conn, params={**(params or {}), 'user_id': user_id},
+                               parse_dates=parse_dates)
+    except (pd.errors.DatabaseError, sqlite3.Error) as e:
+        raise errors.StorageError(str(e)) from e
@@ -0,0 +1,166 @@
+"""Bulk CSV import of transactions.
+
+The file is read in chunks. Each chunk is normalized with vectorized pandas
+operations and written with one ``executemany`` call. All chunks share a
+single database transaction, so an import either lands completely or not at
+all, and the whole file costs one commit instead of one per row.
+
+Rows whose date or amount cannot be parsed, or that have no description or
+type, are skipped and counted. They do not abort the import.
+"""
+import time
+import warnings
+
+import pandas as pd
+
+from finance_engine import cache, db
+
+REQUIRED_COLUMNS = ['date', 'description', 'amount', 'category', 'type']
+CHUNK_SIZE = 10000
+
+INSERT_SQL = '''
+    INSERT INTO transactions (date, description, amount, category, type, account, recurring, recurring_frequency, recurring_end_date, notes, tags, user_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+COLUMNS = ['date', 'description', 'amount', 'category', 'type', 'account', 'recurring',
+           'recurring_frequency', 'recurring_end_date', 'notes', 'tags', 'user_id']
+
+_TRUE_STRINGS = {'1', 'true', 'yes', 'y', 't'}
+
+
+class ImportFormatError(ValueError):
+    """The CSV file does not have the columns an import needs."""
+
+
+class ImportResult:
+    """Counters for a finished (or in-progress) import."""
+
+    def __init__(self, total_rows=None):
+        self.total_rows = total_rows
+        self.read = 0
+        self.imported = 0
+        self.skipped = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def fraction(self):
+        """Share of the file processed so far, when the row count is known."""
+        if not self.total_rows:
+            return None
+        return min(self.read / self.total_rows, 1.0)
+
+
+def _dates(series):
+    # ISO dates parse in one vectorized pass; only the rest go through dateutil
+    parsed = pd.to_datetime(series, errors='coerce', format='ISO8601')
+    retry = parsed.isna() & series.notna()
+    if retry.any():
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            parsed[retry] = pd.to_datetime(series[retry].astype(str), errors='coerce')
+    return parsed.dt.strftime('%Y-%m-%d')
+
+
+def _text(chunk, column, default=None):
+    if column not in chunk:
+        return pd.Series(default, index=chunk.index, dtype=object)
+    series = chunk[column].astype(object).where(chunk[column].notna(), None)
+    if default is not None:
+        series = series.where(series.astype(str).str.strip() != '', None).fillna(default)
+    return series
+
+
+def _flags(chunk, column):
+    if column not in chunk:
+        return pd.Series(0, index=chunk.index)
+    values = chunk[column]
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        return values.fillna(0).astype(bool).astype(int)
+    return values.astype(str).str.strip().str.lower().isin(_TRUE_STRINGS).astype(int)
+
+
+def normalize(chunk, user_id=None):
+    """Return the insertable rows of ``chunk`` as a DataFrame in ``COLUMNS`` order."""
+    rows = pd.DataFrame({
+        'date': _dates(chunk['date']),
+        'description': _text(chunk, 'description'),
+        'amount': pd.to_numeric(chunk['amount'], errors='coerce'),
+        'category': _text(chunk, 'category', 'Other'),
+        'type': _text(chunk, 'type'),
+        'account': _text(chunk, 'account', 'Cash'),
+        'recurring': _flags(chunk, 'recurring'),
+        'recurring_frequency': _text(chunk, 'recurring_frequency'),
+        'recurring_end_date': _dates(chunk['recurring_end_date']) if 'recurring_end_date' in chunk else None,
+        'notes': _text(chunk, 'notes'),
+        'tags': _text(chunk, 'tags'),
+        'user_id': user_id,
+    }, index=chunk.index)
+    valid = rows['date'].notna() & rows['amount'].notna() & rows['description'].notna() & rows['type'].notna()
+    return rows.loc[valid, COLUMNS]
+
+
+def _records(rows):
+    """Yield plain Python tuples (NaN becomes None) for ``executemany``."""
+    frame = rows.astype(object).where(rows.notna(), None)
+    return frame.itertuples(index=False, name=None)
+
+
+def count_rows(source):
+    """Count data rows in a seekable binary file without parsing it, or return None."""
+    try:
+        position = source.tell()
+    except (AttributeError, OSError):
+        return None
+    lines = 0
+    last = b'\n'
+    for block in iter(lambda: source.read(1 << 20), b''):
+        if isinstance(block, str):
+            block = block.encode()
+        lines += block.count(b'\n')
+        last = block[-1:]
+    source.seek(position)
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def import_csv(source, user_id=None, chunk_size=CHUNK_SIZE, progress=None, conn=None):
+    """Import transactions from a CSV path or file object.
+
+    ``progress(result)`` is called after every chunk. Raises
+    ``ImportFormatError`` if required columns are missing. Any database
+    error rolls the whole import back and propagates. Pass ``conn`` to run
+    inside the caller's transaction instead of a new one.
+    """
+    if hasattr(source, 'read'):
+        result = ImportResult(count_rows(source))
+    else:
+        result = ImportResult()
+    started = time.perf_counter()
+
+    def run(conn):
+        for chunk in pd.read_csv(source, chunksize=chunk_size):
+            missing = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+            if missing:
+                raise ImportFormatError(f"CSV file must contain these columns: {', '.join(REQUIRED_COLUMNS)}")
+            rows = normalize(chunk, user_id)
+            conn.executemany(INSERT_SQL, _records(rows))
+            result.read += len(chunk)
+            result.imported += len(rows)
+            result.skipped += len(chunk) - len(rows)
+            result.elapsed = time.perf_counter() - started
+            if progress is not None:
+                progress(result)
+
+    if conn is not None:
+        run(conn)
+    else:
+        with db.transaction() as conn:
+            run(conn)
+    cache.invalidate(user_id)
+    result.elapsed = time.perf_counter() - started
+    return result
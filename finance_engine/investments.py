@@ -0,0 +1,66 @@
+"""Investment portfolio holdings and their market performance."""
+from finance_engine import cache, db
+from finance_engine.errors import ServiceError, storage_errors
+from finance_engine.frames import read_frame
+
+
+def fetch(user_id=None):
+    """Return the user's investments."""
+    return read_frame('investments', user_id=user_id, parse_dates=['purchase_date'])
+
+
+@storage_errors
+def add(name, investment_type, amount, purchase_date=None, current_value=None, symbol=None, quantity=None,
+        purchase_price=None, notes=None, user_id=None):
+    """Add an investment to the portfolio; return its id."""
+    with db.transaction() as conn:
+        investment_id = conn.execute('''
+            INSERT INTO investment_portfolio (name, type, amount, purchase_date, current_value, symbol, quantity, purchase_price, notes, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (name, investment_type, amount, purchase_date, current_value, symbol, quantity, purchase_price, notes,
+              user_id)).lastrowid
+    cache.invalidate(user_id)
+    return investment_id
+
+
+@storage_errors
+def update(investment_id, name, investment_type, amount, purchase_date, current_value, symbol, quantity,
+           purchase_price, notes, user_id=None):
+    """Update an investment; return the number of rows changed."""
+    with db.transaction() as conn:
+        changed = conn.execute('''
+            UPDATE investment_portfolio
+            SET name = ?, type = ?, amount = ?, purchase_date = ?, current_value = ?, symbol = ?, quantity = ?, purchase_price = ?, notes = ?
+            WHERE id = ? AND (user_id = ? OR ? IS NULL)
+        ''', (name, investment_type, amount, purchase_date, current_value, symbol, quantity, purchase_price, notes,
+              investment_id, user_id, user_id)).rowcount
+    cache.invalidate(user_id)
+    return changed
+
+
+@storage_errors
+def delete(investment_id, user_id=None):
+    """Delete an investment; return the number of rows deleted."""
+    with db.transaction() as conn:
+        deleted = conn.execute('''
+            DELETE FROM investment_portfolio
+            WHERE id = ? AND (user_id = ? OR ? IS NULL)
+        ''', (investment_id, user_id, user_id)).rowcount
+    cache.invalidate(user_id)
+    return deleted
+
+
+def performance(symbol, start_date, end_date):
+    """Return daily closing prices for ``symbol`` from Yahoo Finance, or None if there are none.
+
+    Raises ``ServiceError`` when the lookup fails.
+    """
+    import yfinance as yf
+
+    try:
+        data = yf.Ticker(symbol).history(start=start_date, end=end_date)
+    except Exception as e:
+        raise ServiceError(str(e)) from e
+    if data.empty:
+        return None
+    return data['Close'].reset_index()
@@ -0,0 +1,71 @@
+"""Check that every catalogued query can be served by an index.
+
+Usage::
+
+    python -m finance_engine.plans              # fresh in-memory schema
+    python -m finance_engine.plans finance.db   # an existing database, read-only
+
+Prints EXPLAIN QUERY PLAN for each prepared statement and exits with status 1
+if a user-scoped statement needs a full table scan, or if the database has not
+been migrated to ``schema.SCHEMA_VERSION`` yet. The ``all`` variants have
+no user filter, so their scans are shown but not counted as failures.
+"""
+import re
+import sqlite3
+import sys
+
+from finance_engine import queries, schema
+
+
+def explain(conn, sql):
+    """Return the plan detail lines for ``sql``, binding NULL to every parameter."""
+    params = {name: None for name in re.findall(r':(\w+)', sql)}
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def is_full_scan(detail):
+    """True for a plan step that visits every row of a table or index."""
+    return detail.startswith('SCAN ') and not detail.startswith('SCAN CONSTANT ROW')
+
+
+def check(conn):
+    """Explain every prepared statement; return ``(name, variant, details, failed)`` rows."""
+    results = []
+    for name, variant, sql in queries.QueryRegistry(conn).variants():
+        details = explain(conn, sql)
+        failed = variant == 'user' and any(is_full_scan(detail) for detail in details)
+        results.append((name, variant, details, failed))
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        conn = sqlite3.connect(f'file:{argv[0]}?mode=ro', uri=True)
+        version = schema.get_version(conn)
+        if version < schema.SCHEMA_VERSION:
+            # The catalogue queries need tables the missing migrations create
+            print(f"{argv[0]} is at schema version {version}, the app expects {schema.SCHEMA_VERSION}; "
+                  f"run the migrations first (open it with the app once)", file=sys.stderr)
+            conn.close()
+            return 1
+    else:
+        conn = sqlite3.connect(':memory:')
+        schema.migrate(conn)
+
+    failures = 0
+    for name, variant, details, failed in check(conn):
+        status = 'FAIL' if failed else 'ok'
+        print(f"[{status}] {name} ({variant})")
+        for detail in details:
+            print(f"    {detail}")
+        failures += failed
+
+    if failures:
+        print(f"{failures} user-scoped queries need a full table scan")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
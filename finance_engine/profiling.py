@@ -0,0 +1,328 @@
+"""Per-call timings for the app's data and page functions.
+
+Inside a ``session()``, every call to a function wrapped with ``profiled``
+records its wall time, the SQL statements run on pooled connections, the
+rows it returned and the cache hits it got. Figures are inclusive: a page's
+record covers the data functions it called, which get records of their own.
+Outside a session the wrapper costs one context variable lookup, and
+connections run without a trace callback.
+
+Memory mode (``FINANCE_PROFILE_MEMORY`` or ``session(memory=True)``) also
+runs tracemalloc for the session. Each call then records its peak memory
+above the level it started at. It also records the memory it retained,
+that is, still allocated when it returned, including the value returned.
+A DataFrame result records its own footprint as well. The session keeps
+the top allocation sites of the memory it retained. tracemalloc is
+process-wide, so these figures are exact only while one session is
+running. Python allocations run several times slower under tracemalloc.
+
+The app opens a session per script run when ``FINANCE_PROFILE`` is set or
+the user turns on the Performance panel. Finished sessions are appended as
+JSON lines to ``FINANCE_METRICS_PATH`` (default ``metrics.jsonl``; empty to
+disable). ``python -m finance_engine.profiling`` summarizes that file.
+"""
+import argparse
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+
+ENABLED = os.environ.get('FINANCE_PROFILE', '').lower() in ('1', 'true', 'yes')
+METRICS_PATH = os.environ.get('FINANCE_METRICS_PATH', 'metrics.jsonl')
+MEMORY = os.environ.get('FINANCE_PROFILE_MEMORY', '').lower() in ('1', 'true', 'yes')
+TOP_SITES = 10
+
+
+class Session:
+    """The call records and running counters of one profiled script run."""
+
+    def __init__(self, memory=False, **fields):
+        self.fields = fields
+        self.records = []
+        self.statements = 0
+        self.cache_hits = 0
+        self.depth = 0
+        self.started = time.perf_counter()
+        self.elapsed_ms = None
+        self.memory = memory
+        # Highest traced memory seen by each open call, outermost (the session) first
+        self.peaks = []
+        self.peak_kib = None
+        self.retained_kib = None
+        self.top_sites = []
+
+    def as_dict(self):
+        summary = {
+            **self.fields,
+            'elapsed_ms': self.elapsed_ms,
+            'statements': self.statements,
+            'cache_hits': self.cache_hits,
+            'calls': self.records,
+        }
+        if self.memory:
+            summary.update(peak_kib=self.peak_kib, retained_kib=self.retained_kib, top_sites=self.top_sites)
+        return summary
+
+
+_session = contextvars.ContextVar('finance_profiling_session', default=None)
+_sink_lock = threading.Lock()
+_tracing_lock = threading.Lock()
+_tracing_sessions = 0
+_started_tracing = False
+
+
+def active():
+    """Whether the current context is inside a profiling session."""
+    return _session.get() is not None
+
+
+def current():
+    """Return the current ``Session``, or None."""
+    return _session.get()
+
+
+def annotate(**fields):
+    """Attach ``fields`` (page, user, ...) to the current session, if any."""
+    session = _session.get()
+    if session is not None:
+        session.fields.update(fields)
+
+
+def count_statement(statement):
+    """Trace callback for pooled connections: count one SQL statement."""
+    session = _session.get()
+    if session is not None:
+        session.statements += 1
+
+
+def cache_hit():
+    """Count a read answered by the query cache or the request scope."""
+    session = _session.get()
+    if session is not None:
+        session.cache_hits += 1
+
+
+def _rows(value):
+    if value is None or isinstance(value, (str, bytes)):
+        return None
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+def frame_footprint(values):
+    """Return the deep size in bytes of the DataFrames and Series among ``values``."""
+    total = 0
+    for value in values:
+        if hasattr(value, 'memory_usage') and hasattr(value, 'ndim'):
+            usage = value.memory_usage(deep=True)
+            total += int(usage.sum() if hasattr(usage, 'sum') else usage)
+    return total
+
+
+def _start_tracing():
+    global _tracing_sessions, _started_tracing
+    with _tracing_lock:
+        if _tracing_sessions == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _tracing_sessions += 1
+
+
+def _stop_tracing():
+    global _tracing_sessions, _started_tracing
+    with _tracing_lock:
+        _tracing_sessions -= 1
+        if _tracing_sessions == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def _enter_memory(session):
+    """Start measuring a call's memory; return the traced size it starts at."""
+    current, peak = tracemalloc.get_traced_memory()
+    if session.peaks:
+        session.peaks[-1] = max(session.peaks[-1], peak)
+    session.peaks.append(current)
+    tracemalloc.reset_peak()
+    return current
+
+
+def _exit_memory(session, start):
+    """Finish measuring a call; return ``(peak, retained)`` in KiB above ``start``."""
+    current, peak = tracemalloc.get_traced_memory()
+    peak = max(session.peaks.pop(), peak)
+    if session.peaks:
+        session.peaks[-1] = max(session.peaks[-1], peak)
+    return round((peak - start) / 1024, 1), round((current - start) / 1024, 1)
+
+
+def _top_sites(before, after, limit=TOP_SITES):
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    growth = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), 'lineno')
+    return [
+        {'site': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+         'size_kib': round(stat.size_diff / 1024, 1), 'count': stat.count_diff}
+        for stat in growth[:limit] if stat.size_diff > 0
+    ]
+
+
+@contextlib.contextmanager
+def record(name):
+    """Record the block as a call named ``name`` in the current session."""
+    session = _session.get()
+    if session is None:
+        yield None
+        return
+    entry = {'name': name, 'depth': session.depth, 'elapsed_ms': None, 'statements': None, 'rows': None,
+             'cache_hits': None, 'error': None}
+    if session.memory:
+        entry.update(peak_kib=None, retained_kib=None, frame_kib=None)
+        memory = _enter_memory(session)
+    session.records.append(entry)
+    statements, hits = session.statements, session.cache_hits
+    session.depth += 1
+    start = time.perf_counter()
+    try:
+        yield entry
+    except BaseException as e:
+        entry['error'] = type(e).__name__
+        raise
+    finally:
+        entry['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        entry['statements'] = session.statements - statements
+        entry['cache_hits'] = session.cache_hits - hits
+        session.depth -= 1
+        if session.memory:
+            entry['peak_kib'], entry['retained_kib'] = _exit_memory(session, memory)
+
+
+def profiled(func):
+    """Record each call of ``func`` made inside a session."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _session.get() is None:
+            return func(*args, **kwargs)
+        with record(func.__name__) as entry:
+            value = func(*args, **kwargs)
+            entry['rows'] = _rows(value)
+            if 'frame_kib' in entry:
+                frames = frame_footprint([value])
+                entry['frame_kib'] = round(frames / 1024, 1) if frames else None
+            return value
+
+    return wrapper
+
+
+def _append(session, path):
+    line = json.dumps({'timestamp': datetime.now().isoformat(timespec='seconds'), **session.as_dict()},
+                      default=str)
+    with _sink_lock, open(path, 'a', encoding='utf-8') as f:
+        f.write(line + '\n')
+
+
+@contextlib.contextmanager
+def session(enabled=True, path=None, memory=None, **fields):
+    """Profile the calls made inside the block; yield the ``Session`` or None.
+
+    ``memory`` turns memory mode on or off; it defaults to ``MEMORY``. The
+    finished session is appended to ``path`` (default ``METRICS_PATH``)
+    unless that is empty. A failing sink never breaks the block.
+    """
+    if not enabled:
+        yield None
+        return
+    current_session = Session(memory=MEMORY if memory is None else memory, **fields)
+    if current_session.memory:
+        _start_tracing()
+        before = tracemalloc.take_snapshot()
+        start = _enter_memory(current_session)
+    token = _session.set(current_session)
+    try:
+        yield current_session
+    finally:
+        _session.reset(token)
+        current_session.elapsed_ms = round((time.perf_counter() - current_session.started) * 1000, 3)
+        if current_session.memory:
+            current_session.peak_kib, current_session.retained_kib = _exit_memory(current_session, start)
+            current_session.top_sites = _top_sites(before, tracemalloc.take_snapshot())
+            _stop_tracing()
+        path = METRICS_PATH if path is None else path
+        if path:
+            try:
+                _append(current_session, path)
+            except OSError:
+                pass
+
+
+def read_sessions(path):
+    """Yield the sessions recorded in a metrics file, skipping damaged lines."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def summarize(sessions):
+    """Aggregate call records by name: count, median/max time, statements, rows and peak memory."""
+    calls = defaultdict(list)
+    for recorded in sessions:
+        for call in recorded.get('calls', []):
+            calls[call['name']].append(call)
+    summary = []
+    for name, records in calls.items():
+        times = [r['elapsed_ms'] for r in records]
+        summary.append({
+            'name': name,
+            'calls': len(records),
+            'median_ms': statistics.median(times),
+            'max_ms': max(times),
+            'statements': statistics.median(r['statements'] for r in records),
+            'cache_hits': sum(r['cache_hits'] for r in records),
+            'rows': max((r['rows'] for r in records if r['rows'] is not None), default=None),
+            'peak_kib': max((r['peak_kib'] for r in records if r.get('peak_kib') is not None), default=None),
+        })
+    return sorted(summary, key=lambda s: s['median_ms'] * s['calls'], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize recorded profiling sessions.")
+    parser.add_argument('path', nargs='?', default=METRICS_PATH or 'metrics.jsonl')
+    parser.add_argument('--page', help="only sessions of this page")
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    sessions = [s for s in read_sessions(args.path) if args.page is None or s.get('page') == args.page]
+    print(f"{len(sessions)} sessions")
+    print(f"{'function':<32} {'calls':>6} {'median ms':>10} {'max ms':>10} {'sql':>5} {'hits':>6} {'rows':>8} "
+          f"{'peak KiB':>10}")
+    for s in summarize(sessions)[:args.limit]:
+        rows = '' if s['rows'] is None else s['rows']
+        peak = '' if s['peak_kib'] is None else s['peak_kib']
+        print(f"{s['name']:<32} {s['calls']:>6} {s['median_ms']:>10.2f} {s['max_ms']:>10.2f} "
+              f"{s['statements']:>5g} {s['cache_hits']:>6} {rows:>8} {peak:>10}")
+
+    sites = defaultdict(float)
+    for recorded in sessions:
+        for site in recorded.get('top_sites', []):
+            sites[site['site']] += site['size_kib']
+    if sites:
+        print("\nretained allocation sites (KiB, summed over sessions)")
+        for site, size in sorted(sites.items(), key=lambda item: item[1], reverse=True)[:args.limit]:
+            print(f"{size:>12.1f}  {site}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
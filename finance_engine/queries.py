@@ -0,0 +1,314 @@
+"""Prepared read queries resolved once against the live schema.
+
+Every query the app runs against user data is catalogued here with a
+``{user_filter}`` slot. The registry fills that slot once, right after
+migrations, producing two variants per query:
+
+* ``user`` - ``user_id = :user_id``, which the composite indexes can serve;
+* ``all``  - no user restriction, used when no user is given or when the
+  table predates the ``user_id`` column.
+
+The old ``(user_id = ? OR ? IS NULL)`` form looked equivalent but forced
+SQLite to scan the whole table. All variants of a query take the same named
+parameters.
+
+Date filters are half-open ranges (``date >= :start AND date < :end``) on the
+raw column so the ``(user_id, date)`` indexes can seek to them; use
+``date_bounds()`` and ``year_bounds()`` to build the parameters.
+"""
+import threading
+from datetime import datetime, timedelta
+
+from finance_engine import db
+
+USER_FILTER = 'user_id = :user_id'
+NO_FILTER = 'TRUE'
+
+QUERIES = {
+    'accounts': {
+        'table': 'accounts',
+        'sql': '''
+            SELECT id, name, type, balance, currency, institution, account_number
+            FROM accounts
+            WHERE {user_filter}
+            ORDER BY name
+        ''',
+    },
+    'savings_goals': {
+        'table': 'savings_goals',
+        'sql': '''
+            SELECT id, name, target_amount, current_amount, target_date, notes, priority
+            FROM savings_goals
+            WHERE {user_filter}
+            ORDER BY priority, target_date
+        ''',
+    },
+    'investments': {
+        'table': 'investment_portfolio',
+        'sql': '''
+            SELECT id, name, type, amount, purchase_date, current_value, symbol, quantity, purchase_price, notes
+            FROM investment_portfolio
+            WHERE {user_filter}
+            ORDER BY name
+        ''',
+    },
+    'budgets': {
+        'table': 'budgets',
+        'sql': '''
+            SELECT id, category, amount, month_year, notifications
+            FROM budgets
+            WHERE month_year = :month_year AND {user_filter}
+            ORDER BY category
+        ''',
+    },
+    'categories': {
+        'table': 'categories',
+        'sql': '''
+            SELECT name, type
+            FROM categories
+            WHERE {user_filter}
+            ORDER BY name
+        ''',
+    },
+    'categories_by_type': {
+        'table': 'categories',
+        'sql': '''
+            SELECT name, type
+            FROM categories
+            WHERE {user_filter} AND type = :type
+            ORDER BY name
+        ''',
+    },
+    'tags': {
+        'table': 'tags',
+        'sql': '''
+            SELECT name
+            FROM tags
+            WHERE {user_filter}
+            ORDER BY name
+        ''',
+    },
+    'transaction_templates': {
+        'table': 'transaction_templates',
+        'sql': '''
+            SELECT id, name, description, amount, category, type, account
+            FROM transaction_templates
+            WHERE {user_filter}
+            ORDER BY name
+        ''',
+    },
+    'transactions': {
+        'table': 'transactions',
+        'sql': '''
+            SELECT id, date, description, amount, category, type, account, recurring, recurring_frequency, recurring_end_date, notes, tags
+            FROM transactions
+            WHERE {user_filter}
+            ORDER BY date DESC
+        ''',
+    },
+    'transactions_in_range': {
+        'table': 'transactions',
+        'sql': '''
+            SELECT id, date, description, amount, category, type, account, recurring, recurring_frequency, recurring_end_date, notes, tags
+            FROM transactions
+            WHERE {user_filter} AND date >= :start AND date < :end
+            ORDER BY date DESC
+        ''',
+    },
+    'transactions_export_page': {
+        'table': 'transactions',
+        'sql': '''
+            SELECT id, date, description, amount, category, type, account, recurring, recurring_frequency, recurring_end_date, notes, tags
+            FROM transactions
+            WHERE {user_filter} AND date >= :start AND date < :end
+            AND (date, id) > (:after_date, :after_id)
+            ORDER BY date, id
+            LIMIT :limit
+        ''',
+    },
+    'recurring_transactions': {
+        'table': 'transactions',
+        'sql': '''
+            SELECT id, date, description, amount, category, type, account, recurring, recurring_frequency, recurring_end_date, notes, tags
+            FROM transactions
+            WHERE {user_filter} AND recurring = 1
+            ORDER BY date DESC
+        ''',
+    },
+    'unadopted_recurring': {
+        'table': 'transactions',
+        'sql': '''
+            SELECT id, user_id, date, recurring_frequency
+            FROM transactions
+            WHERE {user_filter} AND recurring = 1
+            AND NOT EXISTS (SELECT 1 FROM recurring_rules r WHERE r.source_transaction_id = transactions.id)
+        ''',
+    },
+    'due_recurring_rules': {
+        'table': 'recurring_rules',
+        'sql': '''
+            SELECT r.id, r.source_transaction_id, r.next_due, t.date, t.recurring_frequency, t.recurring_end_date
+            FROM (
+                SELECT id, source_transaction_id, next_due
+                FROM recurring_rules
+                WHERE {user_filter} AND active = 1 AND next_due <= :today
+            ) r
+            JOIN transactions t ON t.id = r.source_transaction_id
+            WHERE t.recurring = 1
+        ''',
+    },
+    'transaction_by_id': {
+        'table': 'transactions',
+        'sql': '''
+            SELECT id, date, description, amount, category, type, account, recurring, recurring_frequency, recurring_end_date, notes, tags, receipt
+            FROM transactions
+            WHERE id = :id AND {user_filter}
+        ''',
+    },
+    'financial_summary': {
+        'table': 'daily_rollups',
+        'sql': '''
+            SELECT type, SUM(total) AS total
+            FROM daily_rollups
+            WHERE {user_filter} AND type IN ('Income', 'Expense')
+            AND day >= :start AND day < :end
+            GROUP BY type
+        ''',
+    },
+    'monthly_summary': {
+        'table': 'daily_rollups',
+        'sql': '''
+            SELECT
+                substr(day, 6, 2) as month,
+                SUM(CASE WHEN type = 'Income' THEN total ELSE 0 END) as income,
+                SUM(CASE WHEN type = 'Expense' THEN total ELSE 0 END) as expense
+            FROM daily_rollups
+            WHERE {user_filter} AND type IN ('Income', 'Expense')
+            AND day >= :start AND day < :end
+            GROUP BY month
+            ORDER BY month
+        ''',
+    },
+    'category_spending': {
+        'table': 'daily_rollups',
+        'sql': '''
+            SELECT category, SUM(total) as total
+            FROM daily_rollups
+            WHERE {user_filter} AND type = 'Expense'
+            AND day >= :start AND day < :end
+            GROUP BY category
+            ORDER BY total DESC
+        ''',
+    },
+    'daily_spending': {
+        'table': 'daily_rollups',
+        'sql': '''
+            SELECT day AS date, SUM(total) AS amount
+            FROM daily_rollups
+            WHERE {user_filter} AND type = 'Expense'
+            AND day >= :start AND day < :end
+            GROUP BY day
+            ORDER BY day
+        ''',
+    },
+    'export_summary': {
+        'table': 'daily_rollups',
+        'sql': '''
+            SELECT type, category, account, SUM(total) AS total
+            FROM daily_rollups
+            WHERE {user_filter} AND day >= :start AND day < :end
+            GROUP BY type, category, account
+            ORDER BY type, category, account
+        ''',
+    },
+    'delete_all_transactions': {
+        'table': 'transactions',
+        'sql': '''
+            DELETE FROM transactions
+            WHERE {user_filter}
+        ''',
+    },
+}
+
+
+def date_bounds(start, end):
+    """Turn an inclusive ``(start, end)`` date range into half-open ``start``/``end`` params."""
+    end_day = datetime.strptime(str(end)[:10], '%Y-%m-%d') + timedelta(days=1)
+    return {'start': str(start)[:10], 'end': end_day.strftime('%Y-%m-%d')}
+
+
+def open_bounds():
+    """Return ``start``/``end`` params that admit every stored date."""
+    return {'start': '', 'end': '\uffff'}
+
+
+def year_bounds(year):
+    """Return half-open ``start``/``end`` params covering a calendar year."""
+    year = int(year)
+    return {'start': f'{year:04d}-01-01', 'end': f'{year + 1:04d}-01-01'}
+
+
+class QueryRegistry:
+    """Schema capabilities and the query variants they select."""
+
+    def __init__(self, conn):
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        self.columns = {
+            table: {col[1] for col in conn.execute(f"PRAGMA table_info({table})")}
+            for table in tables
+        }
+        self._sql = {}
+        for name, spec in QUERIES.items():
+            unscoped = spec['sql'].format(user_filter=NO_FILTER)
+            if self.has_column(spec['table'], 'user_id'):
+                scoped = spec['sql'].format(user_filter=USER_FILTER)
+            else:
+                scoped = unscoped
+            self._sql[name] = {'user': scoped, 'all': unscoped}
+
+    def has_column(self, table, column):
+        """Return True if ``table`` exists and has ``column``."""
+        return column in self.columns.get(table, ())
+
+    def sql(self, name, user_id=None):
+        """Return the SQL for the named query, scoped to ``user_id`` if given."""
+        return self._sql[name]['all' if user_id is None else 'user']
+
+    def variants(self):
+        """Yield ``(name, variant, sql)`` for every prepared statement."""
+        for name, variants in self._sql.items():
+            for variant, sql in variants.items():
+                yield name, variant, sql
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def build(conn):
+    """Inspect the schema on ``conn`` and install the resulting registry."""
+    global _registry
+    registry = QueryRegistry(conn)
+    with _registry_lock:
+        _registry = registry
+    return registry
+
+
+def registry():
+    """Return the current registry, building it on first use."""
+    if _registry is None:
+        with db.connection() as conn:
+            build(conn)
+    return _registry
+
+
+def sql(name, user_id=None):
+    """Shortcut for ``registry().sql(name, user_id)``."""
+    return registry().sql(name, user_id)
+
+
+def reset():
+    """Drop the registry so it is rebuilt against the current schema."""
+    global _registry
+    with _registry_lock:
+        _registry = None
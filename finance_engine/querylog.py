@@ -0,0 +1,386 @@
+"""Slow-query log and per-statement latency histograms.
+
+When enabled, the pool opens ``TracedConnection`` objects. Their cursors
+time each statement from ``execute`` through its last fetch. The trace
+callback captures the SQL that SQLite actually ran, with the parameters
+bound. The progress handler counts the virtual machine instructions the
+statement took, a measure of work that does not vary with machine load.
+
+Statements are grouped by their SQL text. Queries are parameterized, so
+each catalog query is one group. Every group keeps a latency histogram.
+A statement is recorded once its rows run out, or once its cursor runs the
+next statement, is closed or is dropped. A statement slower than the
+threshold is appended as a JSON line to the slow-query log, with its
+parameters and ``EXPLAIN QUERY PLAN`` output.
+
+Set ``FINANCE_SLOW_QUERY_MS`` to enable tracing with that threshold.
+``FINANCE_SLOW_QUERY_LOG`` sets the log path (default ``slow_queries.jsonl``).
+``python -m finance_engine.querylog`` summarizes the log; with ``--check``
+it verifies on a scratch connection that every kind of read is recorded.
+"""
+import argparse
+import bisect
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from finance_engine import profiling
+
+PROGRESS_STEPS = 1000  # VM instructions between progress handler calls
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_threshold_ms = None
+_log_path = os.environ.get('FINANCE_SLOW_QUERY_LOG', 'slow_queries.jsonl')
+if os.environ.get('FINANCE_SLOW_QUERY_MS'):
+    _threshold_ms = float(os.environ['FINANCE_SLOW_QUERY_MS'])
+
+
+class Histogram:
+    """Latencies of one statement, counted in ``BUCKETS_MS`` buckets."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.steps = 0
+        self.slow = 0
+
+    def add(self, elapsed_ms, steps, slow):
+        self.buckets[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.steps += steps
+        self.slow += slow
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the ``fraction`` quantile (``max_ms`` for the last one)."""
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'slow': self.slow,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.5), 3),
+            'p95_ms': round(self.percentile(0.95), 3),
+            'max_ms': round(self.max_ms, 3),
+            'mean_steps': self.steps * PROGRESS_STEPS // self.count if self.count else 0,
+            'buckets': dict(zip([f'<={b}' for b in BUCKETS_MS] + ['>'], self.buckets)),
+        }
+
+
+_histograms = defaultdict(Histogram)
+_lock = threading.Lock()
+
+
+def enable(threshold_ms=100.0, log_path=None):
+    """Trace connections opened from now on; log statements slower than ``threshold_ms``.
+
+    Existing pooled connections are not traced; call ``db.use()`` or
+    ``db.close_all()`` to reopen them.
+    """
+    global _threshold_ms, _log_path
+    _threshold_ms = threshold_ms
+    if log_path is not None:
+        _log_path = log_path
+
+
+def disable():
+    """Open untraced connections from now on."""
+    global _threshold_ms
+    _threshold_ms = None
+
+
+def enabled():
+    """Whether new connections are traced."""
+    return _threshold_ms is not None
+
+
+def connection_factory():
+    """The ``sqlite3.connect`` factory the pool should use."""
+    return TracedConnection if enabled() else sqlite3.Connection
+
+
+def is_traced(conn):
+    """Whether ``conn`` times its own statements."""
+    return isinstance(conn, TracedConnection)
+
+
+def _normalize(sql):
+    return ' '.join(sql.split())
+
+
+def explain(conn, sql, parameters):
+    """Return the query plan lines for ``sql``, or None if it cannot be explained."""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    conn._explaining = True
+    try:
+        cursor = sqlite3.Cursor(conn)
+        rows = cursor.execute(f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+        return [row[-1] for row in rows]
+    except (sqlite3.Error, ValueError):
+        return None
+    finally:
+        conn._explaining = False
+
+
+def _append(entry):
+    line = json.dumps(entry, default=str)
+    with _lock, open(_log_path, 'a', encoding='utf-8') as f:
+        f.write(line + '\n')
+
+
+def observe(conn, sql, parameters, expanded, elapsed_ms, steps, rows):
+    """Add a finished statement to its histogram and log it if it was slow."""
+    key = _normalize(sql)
+    slow = _threshold_ms is not None and elapsed_ms >= _threshold_ms
+    with _lock:
+        _histograms[key].add(elapsed_ms, steps, slow)
+    if not slow or not _log_path:
+        return
+    entry = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'sql': key,
+        'parameters': parameters,
+        'expanded': expanded,
+        'elapsed_ms': round(elapsed_ms, 3),
+        'steps': steps * PROGRESS_STEPS,
+        'rows': rows,
+        'plan': explain(conn, sql, parameters if parameters is not None else ()),
+    }
+    try:
+        _append(entry)
+    except OSError:
+        pass
+
+
+def stats(limit=None):
+    """Return per-statement latency summaries, by total time spent, slowest first."""
+    with _lock:
+        summary = [{'sql': sql, **histogram.as_dict()} for sql, histogram in _histograms.items()]
+    summary.sort(key=lambda s: s['total_ms'], reverse=True)
+    return summary[:limit] if limit else summary
+
+
+def reset():
+    """Forget the recorded histograms."""
+    with _lock:
+        _histograms.clear()
+
+
+class TracedCursor(sqlite3.Cursor):
+    """A cursor that times each statement from execute to its last row."""
+
+    _statement = None
+
+    def _start(self, sql, parameters):
+        self._finish()
+        self._statement = {'sql': sql, 'parameters': parameters, 'expanded': None, 'elapsed': 0.0, 'steps': 0,
+                           'rows': 0}
+
+    def _timed(self, method, *args):
+        statement = self._statement
+        conn = self.connection
+        steps = conn._steps
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if statement is not None:
+                statement['elapsed'] += time.perf_counter() - start
+                statement['steps'] += conn._steps - steps
+
+    def _finish(self):
+        statement, self._statement = self._statement, None
+        if statement is not None:
+            observe(self.connection, statement['sql'], statement['parameters'], statement['expanded'],
+                    statement['elapsed'] * 1000, statement['steps'], statement['rows'])
+
+    def _executed(self):
+        self._statement['expanded'] = self.connection._expanded
+        if self.description is None:
+            # Nothing to fetch: the statement is done
+            self._statement['rows'] = self.rowcount
+            self._finish()
+        return self
+
+    def _run(self, method, sql, parameters):
+        try:
+            self._timed(method, sql, parameters)
+        except BaseException:
+            self._statement = None
+            raise
+        return self._executed()
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, None)
+        return self._run(super().executemany, sql, seq_of_parameters)
+
+    def _fetched(self, rows, done):
+        if self._statement is not None:
+            self._statement['rows'] += rows
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        self._fetched(row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        self._fetched(len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._fetched(len(rows), True)
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._fetched(0, True)
+            raise
+        self._fetched(1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # A statement read with a single fetchone() on a throwaway cursor
+        # ends when the cursor is dropped
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TracedConnection(sqlite3.Connection):
+    """A connection whose statements are timed by ``TracedCursor``."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._steps = 0
+        self._expanded = None
+        self._explaining = False
+        self.set_trace_callback(self._trace)
+        self.set_progress_handler(self._progress, PROGRESS_STEPS)
+
+    def _trace(self, statement):
+        if self._explaining:
+            return
+        profiling.count_statement(statement)
+        # Statements run by triggers arrive as "-- TRIGGER ..." lines
+        if not statement.startswith('--'):
+            self._expanded = statement
+
+    def _progress(self):
+        self._steps += 1
+        return 0
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or TracedCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def read_log(path):
+    """Yield the entries of a slow-query log, skipping damaged lines."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def check():
+    """Run each way of reading a statement on a scratch connection; return the ones not recorded."""
+    reads = {
+        'fetchone': lambda conn: conn.execute("SELECT 'fetchone'").fetchone(),
+        'fetchall': lambda conn: conn.execute("SELECT 'fetchall'").fetchall(),
+        'fetchmany': lambda conn: conn.execute("SELECT 'fetchmany'").fetchmany(1),
+        'iterate': lambda conn: next(iter(conn.execute("SELECT 'iterate'"))),
+        'unread': lambda conn: conn.execute("SELECT 'unread'"),
+    }
+    global _threshold_ms, _log_path
+    saved = _threshold_ms, _log_path, dict(_histograms)
+    _threshold_ms, _log_path = 0.0, None
+    reset()
+    try:
+        conn = sqlite3.connect(':memory:', factory=TracedConnection)
+        try:
+            for read in reads.values():
+                read(conn)
+        finally:
+            conn.close()
+        recorded = {s['sql'] for s in stats()}
+        return [name for name in reads if f"SELECT '{name}'" not in recorded]
+    finally:
+        _threshold_ms, _log_path = saved[0], saved[1]
+        reset()
+        _histograms.update(saved[2])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the slow-query log.")
+    parser.add_argument('path', nargs='?', default=_log_path)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--plans', action='store_true', help="print each statement's latest query plan")
+    parser.add_argument('--check', action='store_true', help="check that every kind of read is recorded")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        missing = check()
+        for name in missing:
+            print(f"[FAIL] a statement read with {name} was not recorded")
+        print("every read was recorded" if not missing else f"{len(missing)} kinds of read were not recorded")
+        return 1 if missing else 0
+
+    entries = defaultdict(list)
+    for entry in read_log(args.path):
+        entries[entry['sql']].append(entry)
+    ranked = sorted(entries.items(), key=lambda item: sum(e['elapsed_ms'] for e in item[1]), reverse=True)
+    for sql, logged in ranked[:args.limit]:
+        times = [e['elapsed_ms'] for e in logged]
+        print(f"{len(logged):>5} slow  median {statistics.median(times):>9.1f} ms  max {max(times):>9.1f} ms  "
+              f"rows {logged[-1]['rows']}")
+        print(f"      {sql[:160]}")
+        if args.plans and logged[-1]['plan']:
+            for line in logged[-1]['plan']:
+                print(f"        {line}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""Recurring transaction rules.
+
+A transaction saved with ``recurring = 1`` is the *source* of a rule in
+``recurring_rules``. The rule keeps a ``next_due`` watermark. Each
+occurrence it generates is an ordinary transaction (``recurring = 0``)
+tagged with ``rule_id`` and ``occurrence_date``. A unique index on that pair
+makes generating the same occurrence twice impossible.
+
+Occurrences are counted from the source's date, so a monthly rule anchored on
+the 31st lands on the last day of shorter months and returns to the 31st
+afterwards. Description, amount, category, type, account, tags, frequency and
+end date are read from the source when an occurrence is generated, so edits
+to the source apply from the next occurrence on. A rule whose source is
+deleted or no longer marked recurring is deactivated.
+
+``run_due()`` adopts new sources, then catches every due rule up to today
+in one transaction. Its cost follows the number of due rules, not the size
+of the transaction history. ``scheduler`` decides when it runs.
+"""
+import calendar
+from datetime import date, datetime, timedelta
+
+from finance_engine import db, queries
+
+TABLE = '''
+    CREATE TABLE IF NOT EXISTS recurring_rules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source_transaction_id INTEGER NOT NULL UNIQUE,
+        user_id INTEGER,
+        next_due DATE NOT NULL,
+        active BOOLEAN NOT NULL DEFAULT 1,
+        FOREIGN KEY (source_transaction_id) REFERENCES transactions(id),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+'''
+
+INDEXES = {
+    'idx_recurring_rules_due': 'ON recurring_rules(user_id, next_due) WHERE active = 1',
+    'idx_transactions_rule_occurrence': 'ON transactions(rule_id, occurrence_date) WHERE rule_id IS NOT NULL',
+}
+
+FREQUENCIES = ('Daily', 'Weekly', 'Monthly', 'Yearly')
+
+# Shortest span of one period, used to estimate an occurrence index from a date
+_MIN_PERIOD_DAYS = {'Daily': 1, 'Weekly': 7, 'Monthly': 28, 'Yearly': 365}
+
+_GENERATE_SQL = '''
+    INSERT OR IGNORE INTO transactions (date, description, amount, category, type, account, recurring, tags, user_id, rule_id, occurrence_date)
+    SELECT :occurrence, description, amount, category, type, account, 0, tags, user_id, :rule_id, :occurrence
+    FROM transactions
+    WHERE id = :source_id
+'''
+
+
+def create(conn):
+    """Create the rules table, the occurrence columns and their indexes."""
+    conn.execute(TABLE)
+    columns = {col[1] for col in conn.execute("PRAGMA table_info(transactions)")}
+    if 'rule_id' not in columns:
+        conn.execute('ALTER TABLE transactions ADD COLUMN rule_id INTEGER REFERENCES recurring_rules(id)')
+    if 'occurrence_date' not in columns:
+        conn.execute('ALTER TABLE transactions ADD COLUMN occurrence_date DATE')
+    for name, definition in INDEXES.items():
+        unique = 'UNIQUE ' if name == 'idx_transactions_rule_occurrence' else ''
+        conn.execute(f'CREATE {unique}INDEX IF NOT EXISTS {name} {definition}')
+
+
+def parse_date(value):
+    """Parse a stored ``YYYY-MM-DD[...]`` date, or return None."""
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def nth_occurrence(anchor, frequency, n):
+    """Return the ``n``-th occurrence after ``anchor`` (``n = 0`` is the anchor itself)."""
+    if frequency == 'Daily':
+        return anchor + timedelta(days=n)
+    if frequency == 'Weekly':
+        return anchor + timedelta(weeks=n)
+    if frequency == 'Monthly':
+        years, month = divmod(anchor.month - 1 + n, 12)
+        year = anchor.year + years
+        return anchor.replace(year=year, month=month + 1, day=min(anchor.day, calendar.monthrange(year, month + 1)[1]))
+    if frequency == 'Yearly':
+        year = anchor.year + n
+        return anchor.replace(year=year, day=min(anchor.day, calendar.monthrange(year, anchor.month)[1]))
+    raise ValueError(f"unknown frequency {frequency!r}")
+
+
+def first_index_after(anchor, frequency, after):
+    """Smallest ``n >= 1`` whose occurrence falls after ``after``."""
+    n = max(1, (after - anchor).days // _MIN_PERIOD_DAYS[frequency] - 1)
+    while n > 1 and nth_occurrence(anchor, frequency, n - 1) > after:
+        n -= 1
+    while nth_occurrence(anchor, frequency, n) <= after:
+        n += 1
+    return n
+
+
+def next_after(anchor, frequency, after):
+    """The first occurrence strictly after ``after``."""
+    return nth_occurrence(anchor, frequency, first_index_after(anchor, frequency, after))
+
+
+def occurrences(anchor, frequency, start, until):
+    """Occurrence dates from ``start`` (itself an occurrence or later) through ``until``."""
+    n = first_index_after(anchor, frequency, start - timedelta(days=1))
+    while True:
+        when = nth_occurrence(anchor, frequency, n)
+        if when > until:
+            return
+        yield when
+        n += 1
+
+
+def period_index(anchor, frequency, when):
+    """Index of the occurrence whose period holds ``when``, or None if there is none.
+
+    Monthly and yearly periods are calendar months and years, so a copy the old
+    processing moved from the 31st to the 28th still counts for its month.
+    Daily and weekly copies must fall on an occurrence exactly.
+    """
+    if frequency == 'Monthly':
+        n = (when.year - anchor.year) * 12 + when.month - anchor.month
+    elif frequency == 'Yearly':
+        n = when.year - anchor.year
+    else:
+        n, rest = divmod((when - anchor).days, _MIN_PERIOD_DAYS[frequency])
+        if rest:
+            return None
+    return n if n >= 0 else None
+
+
+def _split_series(members, frequency):
+    """Split rows with the same fields into series that each fit one anchor.
+
+    Returns ``(series, duplicate ids)``. Each series is a dict with the
+    ``source`` row, its ``anchor`` date and the ``copies`` by occurrence index.
+    A row joins the series, among those with no copy for its period yet, whose
+    date in that period is nearest. A row that fits no series starts a new
+    one, so the same rent started on two dates stays two series. A row
+    repeating a date already taken is a duplicate.
+    """
+    series, duplicates = [], []
+    for row in members:
+        when = parse_date(row[2])
+        if when is None:
+            continue
+        if any(when in chain['dates'] for chain in series):
+            duplicates.append(row[0])
+            continue
+        candidates = [(chain, period_index(chain['anchor'], frequency, when)) for chain in series]
+        candidates = [(chain, n) for chain, n in candidates if n is not None and n not in chain['copies']]
+        if candidates:
+            chain, n = min(candidates, key=lambda c: abs((nth_occurrence(c[0]['anchor'], frequency, c[1]) - when).days))
+            chain['copies'][n] = row[0]
+            chain['dates'].add(when)
+        else:
+            series.append({'source': row, 'anchor': when, 'copies': {0: row[0]}, 'dates': {when}})
+    return series, duplicates
+
+
+def consolidate_legacy(conn):
+    """Fold copies made by the old per-run processing into one rule per series.
+
+    The old code re-inserted each generated copy with ``recurring = 1``, so
+    every copy became a source in turn and the same dates were generated
+    again on every run. Recurring rows are grouped by user, description,
+    amount, category, type, account and frequency, and each group is split
+    into series that fit one anchor (see ``_split_series``). The earliest row
+    of a series stays the source and the others become its occurrences,
+    dated by the period they cover, so the rule does not book a period a
+    copy already covers. Repeated dates are deleted. Returns the number of
+    duplicates deleted.
+    """
+    rows = conn.execute('''
+        SELECT id, user_id, date, description, amount, category, type, account, recurring_frequency, recurring_end_date
+        FROM transactions
+        WHERE recurring = 1
+        ORDER BY date, id
+    ''').fetchall()
+    groups = {}
+    for row in rows:
+        groups.setdefault((row[1],) + tuple(row[3:9]), []).append(row)
+
+    deleted = 0
+    for (owner, *_, frequency), members in groups.items():
+        if len(members) == 1 or frequency not in FREQUENCIES:
+            continue
+        series, duplicates = _split_series(members, frequency)
+        for copy_id in duplicates:
+            conn.execute('DELETE FROM transactions WHERE id = ?', (copy_id,))
+        deleted += len(duplicates)
+
+        for chain in series:
+            if len(chain['copies']) == 1:
+                # A lone source is adopted by the next run
+                continue
+            source_id, anchor = chain['source'][0], chain['anchor']
+            rule_id = conn.execute('''
+                INSERT INTO recurring_rules (source_transaction_id, user_id, next_due) VALUES (?, ?, ?)
+            ''', (source_id, owner, anchor.isoformat())).lastrowid
+            conn.executemany('''
+                UPDATE transactions
+                SET recurring = 0, recurring_frequency = NULL, recurring_end_date = NULL, rule_id = ?, occurrence_date = ?
+                WHERE id = ?
+            ''', [(rule_id, nth_occurrence(anchor, frequency, n).isoformat(), copy_id)
+                  for n, copy_id in chain['copies'].items() if n > 0])
+
+            end = parse_date(chain['source'][9])
+            next_due = nth_occurrence(anchor, frequency, max(chain['copies']) + 1)
+            conn.execute('UPDATE recurring_rules SET next_due = ?, active = ? WHERE id = ?',
+                         (next_due.isoformat(), int(end is None or next_due <= end), rule_id))
+    return deleted
+
+
+def adopt(conn, user_id=None):
+    """Create rules for recurring sources that have none yet; return how many were created.
+
+    Occurrences of the same series that have no rule, such as those merged in
+    from a user data import, are linked to the new rule, and the rule starts
+    after the latest of them.
+    """
+    rows = conn.execute(queries.sql('unadopted_recurring', user_id), {'user_id': user_id}).fetchall()
+    for source_id, owner, source_date, frequency in rows:
+        anchor = parse_date(source_date)
+        valid = anchor is not None and frequency in FREQUENCIES
+        # Sources with an unusable date or frequency get an inactive rule so they are not retried
+        rule_id = conn.execute('''
+            INSERT INTO recurring_rules (source_transaction_id, user_id, next_due, active)
+            VALUES (?, ?, ?, ?)
+        ''', (source_id, owner, date.min.isoformat(), int(valid))).lastrowid
+        if not valid:
+            continue
+        # OR IGNORE leaves a second copy of the same occurrence date unlinked
+        conn.execute('''
+            UPDATE OR IGNORE transactions SET rule_id = :rule_id
+            WHERE user_id IS :user_id AND rule_id IS NULL AND occurrence_date IS NOT NULL
+              AND (description, amount, category, type, account) IS (
+                  SELECT description, amount, category, type, account FROM transactions WHERE id = :source_id
+              )
+        ''', {'rule_id': rule_id, 'user_id': owner, 'source_id': source_id})
+        last = conn.execute('SELECT MAX(occurrence_date) FROM transactions WHERE rule_id = ?', (rule_id,)).fetchone()[0]
+        next_due = next_after(anchor, frequency, max(anchor, parse_date(last) or anchor))
+        conn.execute('UPDATE recurring_rules SET next_due = ? WHERE id = ?', (next_due.isoformat(), rule_id))
+    return len(rows)
+
+
+def deactivate_orphans(conn):
+    """Deactivate rules whose source was deleted or is no longer recurring."""
+    return conn.execute('''
+        UPDATE recurring_rules SET active = 0
+        WHERE active = 1 AND NOT EXISTS (
+            SELECT 1 FROM transactions t WHERE t.id = recurring_rules.source_transaction_id AND t.recurring = 1
+        )
+    ''').rowcount
+
+
+def catch_up(conn, today=None, user_id=None):
+    """Generate every missed occurrence of the due rules up to ``today``.
+
+    Returns ``(rules processed, transactions generated)``. Runs on the
+    caller's connection; the caller owns the transaction.
+    """
+    today = today or date.today()
+    due = conn.execute(queries.sql('due_recurring_rules', user_id),
+                       {'user_id': user_id, 'today': today.isoformat()}).fetchall()
+    generated = 0
+    for rule_id, source_id, next_due, source_date, frequency, end_date in due:
+        anchor, next_due, end = parse_date(source_date), parse_date(next_due), parse_date(end_date)
+        if anchor is None or next_due is None or frequency not in FREQUENCIES:
+            conn.execute('UPDATE recurring_rules SET active = 0 WHERE id = ?', (rule_id,))
+            continue
+        until = min(today, end) if end else today
+        batch = [{'occurrence': when.isoformat(), 'rule_id': rule_id, 'source_id': source_id}
+                 for when in occurrences(anchor, frequency, next_due, until)]
+        if batch:
+            # rowcount skips occurrences that already exist (OR IGNORE) and trigger writes
+            generated += conn.executemany(_GENERATE_SQL, batch).rowcount
+        following = next_after(anchor, frequency, max(until, next_due - timedelta(days=1)))
+        active = end is None or following <= end
+        conn.execute('UPDATE recurring_rules SET next_due = ?, active = ? WHERE id = ?',
+                     (following.isoformat(), int(active), rule_id))
+    return len(due), generated
+
+
+def run_due(today=None, user_id=None, conn=None):
+    """Adopt new sources and catch up due rules in one transaction.
+
+    Returns ``(rules processed, transactions generated)``. Pass ``conn`` to
+    run inside the caller's transaction instead of a new one.
+    """
+    if conn is None:
+        with db.transaction() as conn:
+            return run_due(today, user_id, conn)
+    adopt(conn, user_id)
+    deactivate_orphans(conn)
+    return catch_up(conn, today, user_id)
@@ -0,0 +1,130 @@
+"""Validated, atomic database restores.
+
+A restore never writes over the live database in place. The upload is
+streamed into a temp file next to the database (gzip snapshots are
+decompressed on the way) and then checked:
+
+* it must be a SQLite database that passes ``PRAGMA integrity_check``;
+* its schema version must not be newer than this app's;
+* it must contain the core tables.
+
+The staged file is migrated to the current schema. Then the live
+database is taken out of WAL mode, which requires that no other
+connection is using it, and the staged file is moved over it with
+``os.replace``. Pooled connections, the query registry, the recurring
+scheduler's memo and all caches are reset afterwards.
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from finance_engine import cache, db, scheduler, schema
+
+REQUIRED_TABLES = ('users', 'transactions')
+SQLITE_HEADER = b'SQLite format 3\x00'
+GZIP_MAGIC = b'\x1f\x8b'
+CHUNK_SIZE = 1 << 20
+
+
+class RestoreError(Exception):
+    """The upload cannot be restored; the live database was not touched."""
+
+
+def stage(upload, directory=None):
+    """Stream a file object into a temp file in ``directory``; return its path."""
+    directory = directory or os.path.dirname(os.path.abspath(db.DB_PATH))
+    if hasattr(upload, 'seek'):
+        upload.seek(0)
+    head = upload.read(2)
+    upload.seek(0)
+    source = gzip.GzipFile(fileobj=upload, mode='rb') if head == GZIP_MAGIC else upload
+
+    fd, path = tempfile.mkstemp(prefix='.restore-', suffix='.db', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(source, f, CHUNK_SIZE)
+    except (OSError, EOFError) as e:
+        os.remove(path)
+        raise RestoreError(f"could not read the upload: {e}")
+    return path
+
+
+def validate(path):
+    """Check a staged database; return its schema version or raise ``RestoreError``."""
+    with open(path, 'rb') as f:
+        if f.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+            raise RestoreError("the file is not a SQLite database")
+
+    conn = sqlite3.connect(path)
+    try:
+        problems = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+        if problems != ['ok']:
+            raise RestoreError(f"integrity check failed: {'; '.join(problems[:3])}")
+        version = schema.get_version(conn)
+        if version > schema.SCHEMA_VERSION:
+            raise RestoreError(f"the backup has schema version {version}, "
+                               f"newer than this app's {schema.SCHEMA_VERSION}")
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        missing = [table for table in REQUIRED_TABLES if table not in tables]
+        if missing:
+            raise RestoreError(f"the backup has no {', '.join(missing)} table")
+    except sqlite3.DatabaseError as e:
+        raise RestoreError(f"the file is not a readable database: {e}")
+    finally:
+        conn.close()
+    return version
+
+
+def prepare(path):
+    """Migrate a staged database in place; return the versions applied."""
+    conn = sqlite3.connect(path)
+    try:
+        # Backups of a WAL database keep the WAL flag; the swap needs one self-contained file
+        conn.execute('PRAGMA journal_mode=DELETE')
+        return schema.migrate(conn)
+    finally:
+        conn.close()
+
+
+def swap(path, target=None):
+    """Atomically replace the live database with the staged file at ``path``."""
+    target = target or db.DB_PATH
+    db.close_all()
+    if os.path.exists(target):
+        conn = sqlite3.connect(target, timeout=db.BUSY_TIMEOUT_MS / 1000)
+        try:
+            # Leaving WAL mode folds the log into the file and deletes -wal/-shm,
+            # and SQLite only allows it once no other connection is reading
+            mode = conn.execute('PRAGMA journal_mode=DELETE').fetchone()[0]
+            if mode != 'delete':
+                raise RestoreError("the database is busy; close other sessions and try again")
+            os.replace(path, target)
+        except sqlite3.OperationalError as e:
+            raise RestoreError(f"the database is busy: {e}")
+        finally:
+            conn.close()
+    else:
+        os.replace(path, target)
+    db.close_all()
+    schema.reset()
+    scheduler.reset()
+    cache.invalidate()
+
+
+def restore_upload(upload):
+    """Stage, validate, migrate and swap in an uploaded backup.
+
+    Returns ``(backup_version, applied_versions)``. Raises ``RestoreError``
+    for uploads that are rejected; the live database is then unchanged.
+    """
+    path = stage(upload)
+    try:
+        version = validate(path)
+        applied = prepare(path)
+        swap(path)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    return version, applied
@@ -0,0 +1,116 @@
+"""Daily rollups of transaction totals.
+
+``daily_rollups`` keeps one row per (user, type, day, category, account) with
+the summed amount and the number of transactions behind it. Triggers on
+``transactions`` keep it current inside the same transaction as every
+insert, update and delete, whichever code path issued it, so dashboard and
+report queries can read the rollups and scale with the number of days in
+range instead of the number of transactions.
+
+Transactions without a user are rolled up under ``user_id = 0``.
+
+Rebuild from scratch with ``python -m finance_engine.rollups [--user ID]``.
+"""
+import argparse
+import sys
+
+from finance_engine import cache, db
+
+TABLE = '''
+    CREATE TABLE IF NOT EXISTS daily_rollups (
+        user_id INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        day TEXT NOT NULL,
+        category TEXT NOT NULL,
+        account TEXT NOT NULL,
+        total REAL NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (user_id, type, day, category, account)
+    ) WITHOUT ROWID
+'''
+
+_ADD = '''
+    INSERT INTO daily_rollups (user_id, type, day, category, account, total, count)
+    VALUES (IFNULL(NEW.user_id, 0), NEW.type, substr(NEW.date, 1, 10), NEW.category, NEW.account, NEW.amount, 1)
+    ON CONFLICT (user_id, type, day, category, account)
+    DO UPDATE SET total = total + excluded.total, count = count + 1;
+'''
+
+_KEY = '''
+    user_id = IFNULL(OLD.user_id, 0) AND type = OLD.type AND day = substr(OLD.date, 1, 10)
+    AND category = OLD.category AND account = OLD.account
+'''
+
+_REMOVE = f'''
+    UPDATE daily_rollups SET total = total - OLD.amount, count = count - 1
+    WHERE {_KEY};
+    DELETE FROM daily_rollups WHERE {_KEY} AND count <= 0;
+'''
+
+TRIGGERS = {
+    'trg_transactions_rollup_insert': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_insert
+        AFTER INSERT ON transactions
+        BEGIN {_ADD} END
+    ''',
+    'trg_transactions_rollup_delete': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_delete
+        AFTER DELETE ON transactions
+        BEGIN {_REMOVE} END
+    ''',
+    'trg_transactions_rollup_update': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_update
+        AFTER UPDATE OF user_id, type, date, category, account, amount ON transactions
+        BEGIN {_REMOVE} {_ADD} END
+    ''',
+}
+
+
+def create(conn):
+    """Create the rollup table and the triggers that maintain it."""
+    conn.execute(TABLE)
+    for ddl in TRIGGERS.values():
+        conn.execute(ddl)
+
+
+def rebuild(conn, user_id=None):
+    """Recompute the rollups from ``transactions``, for one user or for everyone.
+
+    Runs on the caller's connection; the caller owns the transaction.
+    Invalidates the cached reads of the users rebuilt. Returns the number of
+    rollup rows written.
+    """
+    if user_id is None:
+        conn.execute('DELETE FROM daily_rollups')
+        where, params = '', ()
+    else:
+        conn.execute('DELETE FROM daily_rollups WHERE user_id = ?', (user_id,))
+        where, params = 'WHERE IFNULL(user_id, 0) = ?', (user_id,)
+
+    cursor = conn.execute(f'''
+        INSERT INTO daily_rollups (user_id, type, day, category, account, total, count)
+        SELECT IFNULL(user_id, 0), type, substr(date, 1, 10), category, account, SUM(amount), COUNT(*)
+        FROM transactions
+        {where}
+        GROUP BY 1, 2, 3, 4, 5
+    ''', params)
+    cache.invalidate(user_id)
+    return cursor.rowcount
+
+
+def main(argv=None):
+    from finance_engine import schema  # schema imports this module
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily transaction rollups.")
+    parser.add_argument('--user', type=int, help="only rebuild this user's rollups")
+    args = parser.parse_args(argv)
+
+    schema.ensure_schema()
+    with db.transaction() as conn:
+        rows = rebuild(conn, args.user)
+    print(f"Rebuilt {rows} rollup rows")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""Run recurring processing once per user per day, off the render path.
+
+Pages never generate recurring transactions themselves. ``submit()`` is
+called on login and at the top of every rerun. It returns at once, and the
+work runs on a single background worker thread:
+
+* an in-process memo of the day each user was last handled makes the check
+  on every rerun a dict lookup;
+* ``recurring_runs`` holds a per-user ``run_date`` watermark in the database.
+  A run claims the day with a conditional upsert in the same transaction
+  that generates the occurrences. Other processes, a restart or a headless
+  ``run_all()`` therefore never repeat the day's work, and a failed run
+  leaves the day unclaimed so it is retried.
+
+Saving a recurring transaction submits a forced run, so its past
+occurrences appear without waiting for the next day. Results and errors are
+kept per user for the UI to report; the cache is invalidated when rows were
+generated, so the next rerun shows them.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from finance_engine import cache, db, recurring
+
+TABLE = '''
+    CREATE TABLE IF NOT EXISTS recurring_runs (
+        user_id INTEGER PRIMARY KEY,
+        run_date DATE NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+'''
+
+_CLAIM_SQL = '''
+    INSERT INTO recurring_runs (user_id, run_date) VALUES (:user_id, :today)
+    ON CONFLICT(user_id) DO UPDATE SET run_date = excluded.run_date
+    WHERE recurring_runs.run_date < excluded.run_date
+'''
+
+
+class RunResult:
+    """Outcome of one user's recurring run."""
+
+    def __init__(self, user_id, run_date, processed=0, generated=0, elapsed=0.0, error=None):
+        self.user_id = user_id
+        self.run_date = run_date
+        self.processed = processed
+        self.generated = generated
+        self.elapsed = elapsed
+        self.error = error
+
+
+def create(conn):
+    """Create the watermark table."""
+    conn.execute(TABLE)
+
+
+def run_user(user_id, today=None, force=False):
+    """Process ``user_id``'s due rules unless that already happened today.
+
+    Returns a ``RunResult``, or None when the day was already claimed and
+    ``force`` is false. Database errors propagate and leave the day unclaimed.
+    """
+    today = today or date.today()
+    started = time.perf_counter()
+    with db.transaction() as conn:
+        claimed = conn.execute(_CLAIM_SQL, {'user_id': user_id, 'today': today.isoformat()}).rowcount == 1
+        if not (claimed or force):
+            return None
+        processed, generated = recurring.run_due(today, user_id, conn)
+    if generated:
+        cache.invalidate(user_id)
+    return RunResult(user_id, today, processed, generated, time.perf_counter() - started)
+
+
+def run_all(today=None, force=False, workers=1):
+    """Run every user's recurring processing, e.g. from a nightly job; return the results that ran."""
+    with db.connection() as conn:
+        user_ids = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+    if workers <= 1:
+        results = [run_user(user_id, today, force) for user_id in user_ids]
+    else:
+        # SQLite still takes one writer at a time; workers overlap the reads and date arithmetic
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda user_id: run_user(user_id, today, force), user_ids))
+    return [result for result in results if result is not None]
+
+
+_lock = threading.Lock()
+_executor = None
+_handled = {}   # user_id -> date last run or skipped in this process
+_pending = {}   # user_id -> runs queued or running
+_results = {}   # user_id -> latest RunResult
+
+
+def _run(user_id, today, force):
+    try:
+        result = run_user(user_id, today, force)
+    except Exception as e:
+        result = RunResult(user_id, today, error=str(e))
+    with _lock:
+        _pending[user_id] -= 1
+        if not _pending[user_id]:
+            del _pending[user_id]
+        if result is None or result.error is None:
+            _handled[user_id] = today
+        if result is not None:
+            _results[user_id] = result
+    return result
+
+
+def submit(user_id, force=False):
+    """Queue ``user_id``'s run for today unless it was handled or is queued; return the Future or None."""
+    global _executor
+    if user_id is None:
+        return None
+    today = date.today()
+    with _lock:
+        if not force and (_handled.get(user_id) == today or user_id in _pending):
+            return None
+        if _executor is None:
+            # One worker: runs for the same user never overlap
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recurring')
+        _pending[user_id] = _pending.get(user_id, 0) + 1
+        return _executor.submit(_run, user_id, today, force)
+
+
+def pending(user_id):
+    """Whether a run for ``user_id`` is queued or running."""
+    with _lock:
+        return user_id in _pending
+
+
+def last_result(user_id):
+    """The latest ``RunResult`` for ``user_id`` in this process, or None."""
+    with _lock:
+        return _results.get(user_id)
+
+
+def reset():
+    """Forget what was handled in this process, e.g. after the database file changed."""
+    with _lock:
+        _handled.clear()
+        _results.clear()
@@ -0,0 +1,334 @@
+"""Versioned schema migrations.
+
+The schema version lives in SQLite's ``PRAGMA user_version``. Each entry in
+``MIGRATIONS`` moves the database one version forward, so a database is
+brought up to date by running the entries it has not seen yet. The app calls
+``ensure_schema()`` on every rerun; only the first call in a process touches
+the database, after which it also builds the query registry.
+"""
+import threading
+
+from finance_engine import db, queries, recurring, rollups, scheduler
+
+TABLES = {
+    'users': '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            email TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP,
+            preferences TEXT
+        )
+    ''',
+    'transactions': '''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date DATE NOT NULL,
+            description TEXT NOT NULL,
+            amount REAL NOT NULL,
+            category TEXT NOT NULL DEFAULT "Other",
+            type TEXT NOT NULL,
+            account TEXT NOT NULL DEFAULT "Cash",
+            recurring BOOLEAN DEFAULT 0,
+            recurring_frequency TEXT,
+            recurring_end_date DATE,
+            notes TEXT,
+            tags TEXT,
+            receipt BLOB,
+            user_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''',
+    'budgets': '''
+        CREATE TABLE IF NOT EXISTS budgets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            month_year TEXT NOT NULL,
+            user_id INTEGER,
+            notifications BOOLEAN DEFAULT 1,
+            UNIQUE(category, month_year, user_id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''',
+    'savings_goals': '''
+        CREATE TABLE IF NOT EXISTS savings_goals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            target_amount REAL NOT NULL,
+            current_amount REAL NOT NULL,
+            target_date DATE,
+            notes TEXT,
+            priority INTEGER DEFAULT 3,
+            user_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''',
+    'accounts': '''
+        CREATE TABLE IF NOT EXISTS accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            type TEXT NOT NULL,
+            balance REAL NOT NULL,
+            currency TEXT DEFAULT 'IDR',
+            institution TEXT,
+            account_number TEXT,
+            user_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''',
+    'investment_portfolio': '''
+        CREATE TABLE IF NOT EXISTS investment_portfolio (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            symbol TEXT,
+            type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            purchase_date DATE,
+            current_value REAL,
+            quantity REAL,
+            purchase_price REAL,
+            notes TEXT,
+            user_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''',
+    'categories': '''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL,
+            user_id INTEGER,
+            UNIQUE(name, type, user_id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''',
+    'tags': '''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            user_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''',
+    'financial_goals': '''
+        CREATE TABLE IF NOT EXISTS financial_goals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            target_amount REAL NOT NULL,
+            current_amount REAL NOT NULL,
+            target_date DATE,
+            priority INTEGER DEFAULT 3,
+            notes TEXT,
+            user_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''',
+    'transaction_templates': '''
+        CREATE TABLE IF NOT EXISTS transaction_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            amount REAL,
+            category TEXT,
+            type TEXT,
+            account TEXT,
+            user_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''',
+}
+
+# Columns that older databases were created without
+LEGACY_COLUMNS = {
+    'users': {
+        'last_login': 'TIMESTAMP',
+        'preferences': 'TEXT',
+    },
+    'transactions': {
+        'user_id': 'INTEGER',
+        'category': 'TEXT NOT NULL DEFAULT "Other"',
+        'account': 'TEXT NOT NULL DEFAULT "Cash"',
+        'recurring': 'BOOLEAN DEFAULT 0',
+        'notes': 'TEXT',
+        'tags': 'TEXT',
+        'receipt': 'BLOB',
+        'recurring_frequency': 'TEXT',
+        'recurring_end_date': 'DATE',
+    },
+    'budgets': {
+        'user_id': 'INTEGER',
+        'notifications': 'BOOLEAN DEFAULT 1',
+    },
+    'savings_goals': {
+        'user_id': 'INTEGER',
+        'priority': 'INTEGER DEFAULT 3',
+    },
+    'accounts': {
+        'user_id': 'INTEGER',
+        'institution': 'TEXT',
+        'account_number': 'TEXT',
+    },
+    'investment_portfolio': {
+        'user_id': 'INTEGER',
+        'symbol': 'TEXT',
+        'quantity': 'REAL',
+        'purchase_price': 'REAL',
+    },
+    'categories': {'user_id': 'INTEGER'},
+    'tags': {'user_id': 'INTEGER'},
+    'financial_goals': {'user_id': 'INTEGER'},
+    'transaction_templates': {'user_id': 'INTEGER'},
+}
+
+# Indexes the app's queries rely on; see ``python -m finance_engine.plans``
+INDEXES = {
+    'idx_transactions_user_date': 'ON transactions(user_id, date)',
+    'idx_transactions_user_type_date': 'ON transactions(user_id, type, date, amount, category)',
+    'idx_transactions_recurring': 'ON transactions(user_id, date) WHERE recurring = 1',
+    'idx_accounts_user': 'ON accounts(user_id, name)',
+    'idx_budgets_user_month': 'ON budgets(user_id, month_year, category)',
+    'idx_savings_goals_user': 'ON savings_goals(user_id)',
+    'idx_investment_portfolio_user': 'ON investment_portfolio(user_id)',
+    'idx_categories_user': 'ON categories(user_id, name, type)',
+    'idx_tags_user': 'ON tags(user_id)',
+    'idx_transaction_templates_user': 'ON transaction_templates(user_id)',
+}
+
+DEFAULT_CATEGORIES = [
+    ('Salary', 'Income'),
+    ('Bills & Utilities', 'Expense'),
+    ('Shopping', 'Expense'),
+    ('Education', 'Expense'),
+    ('Healthcare', 'Expense'),
+    ('Entertainment', 'Expense'),
+    ('Transportation', 'Expense'),
+]
+
+
+def _table_columns(conn, table):
+    return [col[1] for col in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _baseline(conn):
+    """Create the original tables and backfill columns missing from old databases."""
+    for ddl in TABLES.values():
+        conn.execute(ddl)
+
+    for table, columns in LEGACY_COLUMNS.items():
+        existing_columns = _table_columns(conn, table)
+        for column, definition in columns.items():
+            if column not in existing_columns:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions(user_id)')
+
+    # user_id is NULL for the shared defaults, so UNIQUE() never fires for them
+    for name, trans_type in DEFAULT_CATEGORIES:
+        conn.execute('''
+            INSERT INTO categories (name, type)
+            SELECT ?, ?
+            WHERE NOT EXISTS (
+                SELECT 1 FROM categories WHERE name = ? AND type = ? AND user_id IS NULL
+            )
+        ''', (name, trans_type, name, trans_type))
+
+    conn.execute("INSERT OR IGNORE INTO accounts (name, type, balance, currency) VALUES (?, ?, ?, ?)",
+                 ("Cash", "Cash", 0, "IDR"))
+
+
+def _managed_indexes(conn):
+    """Create the composite and covering indexes behind the hot queries."""
+    # (user_id, date) leads with the same column, so the old index is redundant
+    conn.execute('DROP INDEX IF EXISTS idx_transactions_user_id')
+    for name, definition in INDEXES.items():
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} {definition}')
+    conn.execute('ANALYZE')
+
+
+def _daily_rollups(conn):
+    """Add the trigger-maintained daily rollups and fill them from existing rows."""
+    rollups.create(conn)
+    rollups.rebuild(conn)
+
+
+def _recurring_rules(conn):
+    """Move recurring transactions onto rules and remove the duplicates the old processing made."""
+    recurring.create(conn)
+    recurring.consolidate_legacy(conn)
+
+
+def _recurring_runs(conn):
+    """Add the per-user watermark that limits recurring processing to once a day."""
+    scheduler.create(conn)
+
+
+# Append only: position N in this list upgrades a database to user_version N + 1
+MIGRATIONS = [
+    _baseline,
+    _managed_indexes,
+    _daily_rollups,
+    _recurring_rules,
+    _recurring_runs,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_version(conn):
+    """Return the schema version recorded in the database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending migrations on ``conn``, each in its own transaction.
+
+    Returns the list of versions that were applied.
+    """
+    applied = []
+    while True:
+        if get_version(conn) >= SCHEMA_VERSION:
+            return applied
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-read under the write lock in case another process got here first
+            version = get_version(conn)
+            if version >= SCHEMA_VERSION:
+                conn.rollback()
+                return applied
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(version + 1)
+
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def ensure_schema():
+    """Bring the database up to date and build the query registry, once per process."""
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if _ready:
+            return
+        with db.connection() as conn:
+            migrate(conn)
+            queries.build(conn)
+        _ready = True
+
+
+def reset():
+    """Forget that the schema was checked, e.g. after the database file changed."""
+    global _ready
+    with _ready_lock:
+        _ready = False
+    queries.reset()
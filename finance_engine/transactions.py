@@ -0,0 +1,162 @@
+"""Transactions and the categories, tags and templates used to enter them.
+
+Writes invalidate the user's cached reads before returning. Reads come
+from the query catalog through ``frames.read_frame``.
+"""
+from finance_engine import cache, db, queries
+from finance_engine.errors import NotFoundError, storage_errors
+from finance_engine.frames import read_frame
+
+COLUMNS = ['id', 'date', 'description', 'amount', 'category', 'type', 'account', 'recurring',
+           'recurring_frequency', 'recurring_end_date', 'notes', 'tags', 'receipt']
+DATE_COLUMNS = ['date', 'recurring_end_date']
+
+
+@storage_errors
+def add(date, description, amount, category, trans_type, account="Cash", recurring=False, recurring_frequency=None,
+        recurring_end_date=None, notes=None, tags=None, receipt=None, user_id=None):
+    """Add a transaction; return its id."""
+    with db.transaction() as conn:
+        transaction_id = conn.execute('''
+            INSERT INTO transactions (date, description, amount, category, type, account, recurring, recurring_frequency, recurring_end_date, notes, tags, receipt, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (date, description, amount, category or "Other", trans_type, account, int(recurring), recurring_frequency,
+              recurring_end_date, notes, tags, receipt, user_id)).lastrowid
+    cache.invalidate(user_id)
+    return transaction_id
+
+
+@storage_errors
+def update(transaction_id, date, description, amount, category, trans_type, account, recurring, recurring_frequency,
+           recurring_end_date, notes, tags, receipt, user_id):
+    """Update a transaction; return the number of rows changed."""
+    with db.transaction() as conn:
+        changed = conn.execute('''
+            UPDATE transactions
+            SET date = ?, description = ?, amount = ?, category = ?, type = ?, account = ?, recurring = ?, recurring_frequency = ?, recurring_end_date = ?, notes = ?, tags = ?, receipt = ?
+            WHERE id = ? AND (user_id = ? OR ? IS NULL)
+        ''', (date, description, amount, category or "Other", trans_type, account, int(recurring), recurring_frequency,
+              recurring_end_date, notes, tags, receipt, transaction_id, user_id, user_id)).rowcount
+    cache.invalidate(user_id)
+    return changed
+
+
+@storage_errors
+def delete(transaction_id, user_id=None):
+    """Delete a transaction; return the number of rows deleted."""
+    return delete_many([transaction_id], user_id)
+
+
+@storage_errors
+def delete_many(transaction_ids, user_id=None):
+    """Delete the given transactions; return the number of rows deleted."""
+    transaction_ids = list(transaction_ids)
+    if not transaction_ids:
+        return 0
+    placeholders = ','.join(['?'] * len(transaction_ids))
+    with db.transaction() as conn:
+        deleted = conn.execute(f'''
+            DELETE FROM transactions
+            WHERE id IN ({placeholders}) AND (user_id = ? OR ? IS NULL)
+        ''', transaction_ids + [user_id, user_id]).rowcount
+    cache.invalidate(user_id)
+    return deleted
+
+
+@storage_errors
+def delete_all(user_id=None):
+    """Delete every transaction of the user; return the number of rows deleted."""
+    with db.transaction() as conn:
+        deleted = conn.execute(queries.sql('delete_all_transactions', user_id), {'user_id': user_id}).rowcount
+    cache.invalidate(user_id)
+    return deleted
+
+
+def fetch(date_range=None, user_id=None):
+    """Return the user's transactions, within the inclusive ``date_range`` if one is given."""
+    if date_range and date_range[0] and date_range[1]:
+        name, params = 'transactions_in_range', queries.date_bounds(date_range[0], date_range[1])
+    else:
+        name, params = 'transactions', None
+    return read_frame(name, params, user_id, parse_dates=DATE_COLUMNS)
+
+
+def recurring_sources(user_id=None):
+    """Return the user's recurring transactions."""
+    return read_frame('recurring_transactions', user_id=user_id, parse_dates=DATE_COLUMNS)
+
+
+@storage_errors
+def get(transaction_id, user_id=None):
+    """Return one transaction as a dict; raise ``NotFoundError`` if the user has no such row."""
+    with db.connection() as conn:
+        result = conn.execute(queries.sql('transaction_by_id', user_id),
+                              {'id': transaction_id, 'user_id': user_id}).fetchone()
+    if result is None:
+        raise NotFoundError(f"transaction {transaction_id} not found")
+    return dict(zip(COLUMNS, result))
+
+
+@storage_errors
+def add_template(name, description, amount, category, trans_type, account, user_id=None):
+    """Save a transaction template for quick entry; return its id."""
+    with db.transaction() as conn:
+        template_id = conn.execute('''
+            INSERT INTO transaction_templates (name, description, amount, category, type, account, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (name, description, amount, category, trans_type, account, user_id)).lastrowid
+    cache.invalidate(user_id)
+    return template_id
+
+
+def templates(user_id=None):
+    """Return the user's transaction templates."""
+    return read_frame('transaction_templates', user_id=user_id)
+
+
+@storage_errors
+def delete_template(template_id, user_id=None):
+    """Delete a transaction template; return the number of rows deleted."""
+    with db.transaction() as conn:
+        deleted = conn.execute('''
+            DELETE FROM transaction_templates
+            WHERE id = ? AND (user_id = ? OR ? IS NULL)
+        ''', (template_id, user_id, user_id)).rowcount
+    cache.invalidate(user_id)
+    return deleted
+
+
+def categories(trans_type=None, user_id=None):
+    """Return the categories, optionally only those of one transaction type."""
+    if trans_type:
+        return read_frame('categories_by_type', {'type': trans_type}, user_id)
+    return read_frame('categories', user_id=user_id)
+
+
+@storage_errors
+def add_category(name, trans_type, user_id=None):
+    """Add a category; return its id."""
+    with db.transaction() as conn:
+        category_id = conn.execute('''
+            INSERT INTO categories (name, type, user_id)
+            VALUES (?, ?, ?)
+        ''', (name, trans_type, user_id)).lastrowid
+    cache.invalidate(user_id)
+    return category_id
+
+
+def tags(user_id=None):
+    """Return the tags."""
+    return read_frame('tags', user_id=user_id)
+
+
+@storage_errors
+def add_tag(name, user_id=None):
+    """Add a tag; return its id."""
+    with db.transaction() as conn:
+        tag_id = conn.execute('''
+            INSERT INTO tags (name, user_id)
+            VALUES (?, ?)
+        ''', (name, user_id)).lastrowid
+    cache.invalidate(user_id)
+    return tag_id
@@ -0,0 +1,222 @@
+"""Per-user logical export and merge-restore.
+
+An export is a zip holding one JSON Lines file per user-scoped table and a
+``manifest.json``. Rows are read in keyset-paginated chunks of the user's
+own rows, so the cost follows that user's data rather than the size of the
+database. Row ids, ``user_id`` and recurring ``rule_id`` links are not
+exported; importing a recurring source links its occurrences to a new rule.
+BLOBs are base64 text.
+
+Importing merges the file into the target user's data in one transaction.
+Each table is loaded into a temp staging table and then applied with
+set-based statements keyed on its natural key (``TABLES``):
+
+* most tables are upserted: rows whose key already exists for the user are
+  updated, new keys are inserted;
+* transactions have no natural key, so they are merged as a multiset: a row
+  is inserted only for each copy beyond those the user already has, which
+  makes re-importing the same file a no-op.
+
+Other users' data is never read or written, so one user can be restored
+while everyone else keeps working.
+"""
+import base64
+import io
+import json
+import zipfile
+from datetime import datetime
+
+from finance_engine import cache, db, schema
+
+FORMAT_VERSION = 1
+CHUNK_SIZE = 5000
+MANIFEST = 'manifest.json'
+
+# Table -> the columns that identify a row within one user's data
+TABLES = {
+    'accounts': ('name',),
+    'categories': ('name', 'type'),
+    'tags': ('name',),
+    'budgets': ('category', 'month_year'),
+    'savings_goals': ('name',),
+    'investment_portfolio': ('name', 'symbol', 'purchase_date'),
+    'transaction_templates': ('name',),
+    'transactions': ('date', 'description', 'amount', 'category', 'type', 'account'),
+}
+MULTISET_TABLES = {'transactions'}
+# Ids that only mean something inside the database they came from
+LOCAL_COLUMNS = {'id', 'user_id', 'rule_id'}
+BLOB_PREFIX = 'base64:'
+
+
+class UserDataError(ValueError):
+    """The archive is not a user-data export this app can read."""
+
+
+def _columns(conn, table):
+    return [col[1] for col in conn.execute(f"PRAGMA table_info({table})") if col[1] not in LOCAL_COLUMNS]
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return BLOB_PREFIX + base64.b64encode(value).decode('ascii')
+    return value
+
+
+def _decode(value):
+    if isinstance(value, str) and value.startswith(BLOB_PREFIX):
+        return base64.b64decode(value[len(BLOB_PREFIX):])
+    return value
+
+
+def export_user(output, user_id, chunk_size=CHUNK_SIZE):
+    """Write ``user_id``'s rows as a zip to a path or binary file object; return row counts per table."""
+    counts = {}
+    columns = {}
+    with db.connection() as conn, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        conn.execute('BEGIN')
+        try:
+            for table in TABLES:
+                cols = _columns(conn, table)
+                columns[table] = cols
+                sql = f'''
+                    SELECT id, {', '.join(cols)} FROM {table}
+                    WHERE user_id = ? AND id > ?
+                    ORDER BY id LIMIT ?
+                '''
+                count, last_id = 0, 0
+                with archive.open(f'{table}.jsonl', 'w') as raw:
+                    out = io.TextIOWrapper(raw, encoding='utf-8', newline='\n')
+                    while True:
+                        rows = conn.execute(sql, (user_id, last_id, chunk_size)).fetchall()
+                        for row in rows:
+                            out.write(json.dumps(dict(zip(cols, map(_encode, row[1:]))), separators=(',', ':')))
+                            out.write('\n')
+                        count += len(rows)
+                        if len(rows) < chunk_size:
+                            break
+                        last_id = rows[-1][0]
+                    out.flush()
+                    out.detach()
+                counts[table] = count
+            version = schema.get_version(conn)
+        finally:
+            conn.rollback()
+        archive.writestr(MANIFEST, json.dumps({
+            'format': FORMAT_VERSION,
+            'schema_version': version,
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+            'columns': columns,
+            'rows': counts,
+        }, indent=2))
+    return counts
+
+
+def _read_manifest(archive):
+    try:
+        manifest = json.loads(archive.read(MANIFEST))
+    except KeyError:
+        raise UserDataError("the archive has no manifest.json; it is not a user data export")
+    if manifest.get('format') != FORMAT_VERSION:
+        raise UserDataError(f"unsupported export format {manifest.get('format')!r}")
+    return manifest
+
+
+def _iter_chunks(archive, table, columns, chunk_size):
+    with archive.open(f'{table}.jsonl') as raw:
+        chunk = []
+        for line in io.TextIOWrapper(raw, encoding='utf-8'):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            chunk.append(tuple(_decode(record.get(col)) for col in columns))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _match(key, left, right):
+    return ' AND '.join(f'{left}.{col} IS {right}.{col}' for col in key)
+
+
+def _apply_upsert(conn, table, stage, columns, key, user_id):
+    """Update the user's rows that match a staged key, insert the rest; return (inserted, updated)."""
+    # Last staged row wins when the archive repeats a key
+    conn.execute(f'''
+        DELETE FROM {stage} WHERE rowid NOT IN (SELECT MAX(rowid) FROM {stage} GROUP BY {', '.join(key)})
+    ''')
+    values = [col for col in columns if col not in key]
+    updated = 0
+    if values:
+        updated = conn.execute(f'''
+            UPDATE {table} SET ({', '.join(values)}) = (
+                SELECT {', '.join(f's.{col}' for col in values)} FROM {stage} s WHERE {_match(key, 's', table)}
+            )
+            WHERE user_id = :user_id AND EXISTS (SELECT 1 FROM {stage} s WHERE {_match(key, 's', table)})
+        ''', {'user_id': user_id}).rowcount
+    # OR IGNORE: accounts.name and tags.name are unique across all users
+    inserted = conn.execute(f'''
+        INSERT OR IGNORE INTO {table} ({', '.join(columns)}, user_id)
+        SELECT {', '.join(f's.{col}' for col in columns)}, :user_id FROM {stage} s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {table} t WHERE t.user_id = :user_id AND {_match(key, 't', 's')}
+        )
+    ''', {'user_id': user_id}).rowcount
+    return inserted, updated
+
+
+def _apply_multiset(conn, table, stage, columns, key, user_id):
+    """Insert each staged row beyond the copies the user already has; return (inserted, 0)."""
+    inserted = conn.execute(f'''
+        INSERT INTO {table} ({', '.join(columns)}, user_id)
+        SELECT {', '.join(f's.{col}' for col in columns)}, :user_id
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY {', '.join(key)} ORDER BY rowid) AS copy
+            FROM {stage}
+        ) s
+        WHERE s.copy > (
+            SELECT COUNT(*) FROM {table} t WHERE t.user_id = :user_id AND {_match(key, 't', 's')}
+        )
+    ''', {'user_id': user_id}).rowcount
+    return inserted, 0
+
+
+def import_user(source, user_id, chunk_size=CHUNK_SIZE):
+    """Merge a user-data archive (path or file object) into ``user_id``'s data.
+
+    Runs in one transaction; returns ``{table: {'read', 'inserted', 'updated'}}``.
+    """
+    try:
+        archive = zipfile.ZipFile(source)
+    except zipfile.BadZipFile:
+        raise UserDataError("the file is not a zip archive")
+
+    results = {}
+    with archive, db.transaction() as conn:
+        manifest = _read_manifest(archive)
+        names = set(archive.namelist())
+        for table, key in TABLES.items():
+            if f'{table}.jsonl' not in names:
+                continue
+            existing = _columns(conn, table)
+            columns = [col for col in manifest['columns'].get(table, []) if col in existing]
+            if not all(col in columns for col in key):
+                raise UserDataError(f"{table} rows are missing key columns {', '.join(key)}")
+
+            stage = f'temp.stage_{table}'
+            conn.execute(f'DROP TABLE IF EXISTS {stage}')
+            conn.execute(f"CREATE TEMP TABLE stage_{table} AS SELECT {', '.join(columns)} FROM main.{table} LIMIT 0")
+            read = 0
+            insert = f"INSERT INTO {stage} VALUES ({', '.join('?' * len(columns))})"
+            for chunk in _iter_chunks(archive, table, columns, chunk_size):
+                conn.executemany(insert, chunk)
+                read += len(chunk)
+
+            apply = _apply_multiset if table in MULTISET_TABLES else _apply_upsert
+            inserted, updated = apply(conn, table, stage, columns, key, user_id)
+            conn.execute(f'DROP TABLE {stage}')
+            results[table] = {'read': read, 'inserted': inserted, 'updated': updated}
+    cache.invalidate(user_id)
+    return results
@@ -0,0 +1,60 @@
+"""User accounts, credentials and preferences."""
+import ast
+import hashlib
+
+from finance_engine import db
+from finance_engine.errors import storage_errors
+
+PASSWORD_SALT = "finance_tracker_salt"
+
+
+def hash_password(password):
+    """Hash a password for storing."""
+    return hashlib.sha256((password + PASSWORD_SALT).encode()).hexdigest()
+
+
+@storage_errors
+def create(username, password, email=None):
+    """Create a user; return the new id."""
+    with db.transaction() as conn:
+        return conn.execute('''
+            INSERT INTO users (username, password_hash, email)
+            VALUES (?, ?, ?)
+        ''', (username, hash_password(password), email)).lastrowid
+
+
+@storage_errors
+def verify(username, password):
+    """Return the user's id if the credentials match, else None, and record the login."""
+    with db.transaction() as conn:
+        result = conn.execute('''
+            SELECT id, password_hash FROM users WHERE username = ?
+        ''', (username,)).fetchone()
+        if result is None or result[1] != hash_password(password):
+            return None
+        conn.execute('''
+            UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?
+        ''', (result[0],))
+        return result[0]
+
+
+@storage_errors
+def preferences(user_id):
+    """Return the user's saved preferences, or an empty dict."""
+    with db.connection() as conn:
+        result = conn.execute('''
+            SELECT preferences FROM users WHERE id = ?
+        ''', (user_id,)).fetchone()
+    if result and result[0]:
+        # Stored as a dict literal; literal_eval never runs code
+        return ast.literal_eval(result[0])
+    return {}
+
+
+@storage_errors
+def set_preferences(user_id, preferences):
+    """Save the user's preferences; return the number of users updated."""
+    with db.transaction() as conn:
+        return conn.execute('''
+            UPDATE users SET preferences = ? WHERE id = ?
+        ''', (str(preferences), user_id)).rowcount
@@ -3,23 +3,15 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import sqlite3
 from sqlite3 import Error
 import calendar
-import numpy as np
-from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
 import tempfile
 import os
 import base64
 from io import BytesIO
-import hashlib
-from PIL import Image
 import time
-import yfinance as yf
-from forex_python.converter import CurrencyRates
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
-from statsmodels.tsa.seasonal import seasonal_decompose
+from finance_engine import (accounts, analytics, backup, budgets, cache, errors, exports, importer, investments, profiling,
+                            querylog, restore, scheduler, schema, transactions, userdata, users)
 
 # ========== Page Configuration ==========
 st.set_page_config(
@@ -237,1162 +229,406 @@ st.markdown("""
 # ========== Authentication Functions ==========
 def hash_password(password):
     """Hash a password for storing."""
-    salt = "finance_tracker_salt"
-    return hashlib.sha256((password + salt).encode()).hexdigest()
-
-def initialize_auth_db():
-    """Initialize authentication database"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
-            table_exists = cursor.fetchone()
-            
-            if not table_exists:
-                cursor.execute('''
-                    CREATE TABLE users (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        username TEXT UNIQUE NOT NULL,
-                        password_hash TEXT NOT NULL,
-                        email TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        last_login TIMESTAMP,
-                        preferences TEXT
-                    )
-                ''')
-                conn.commit()
-            else:
-                cursor.execute("PRAGMA table_info(users)")
-                columns = [col[1] for col in cursor.fetchall()]
-                required_columns = ['id', 'username', 'password_hash', 'email', 'created_at', 'last_login', 'preferences']
-                
-                for col in required_columns:
-                    if col not in columns:
-                        if col == 'last_login':
-                            cursor.execute('ALTER TABLE users ADD COLUMN last_login TIMESTAMP')
-                        elif col == 'preferences':
-                            cursor.execute('ALTER TABLE users ADD COLUMN preferences TEXT')
-                        conn.commit()
-        except Error as e:
-            st.error(f"Failed to initialize auth database: {e}")
-        finally:
-            conn.close()
+    return users.hash_password(password)
 
+@profiling.profiled
 def create_user(username, password, email=None):
     """Create a new user"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            password_hash = hash_password(password)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO users (username, password_hash, email)
-                VALUES (?, ?, ?)
-            ''', (username, password_hash, email))
-            conn.commit()
-            return True
-        except Error as e:
-            st.error(f"Failed to create user: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        users.create(username, password, email)
+        return True
+    except errors.FinanceError as e:
+        st.error(f"Failed to create user: {e}")
+        return False
 
+@profiling.profiled
 def verify_user(username, password):
     """Verify user credentials"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, password_hash FROM users WHERE username = ?
-            ''', (username,))
-            result = cursor.fetchone()
-            if result:
-                user_id, stored_hash = result
-                if stored_hash == hash_password(password):
-                    cursor.execute('''
-                        UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?
-                    ''', (user_id,))
-                    conn.commit()
-                    return user_id
-        except Error as e:
-            st.error(f"Failed to verify user: {e}")
-        finally:
-            conn.close()
-    return None
+    try:
+        return users.verify(username, password)
+    except errors.FinanceError as e:
+        st.error(f"Failed to verify user: {e}")
+        return None
 
+@profiling.profiled
 def get_user_preferences(user_id):
     """Get user preferences"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT preferences FROM users WHERE id = ?
-            ''', (user_id,))
-            result = cursor.fetchone()
-            if result and result[0]:
-                return eval(result[0])
-        except Error as e:
-            st.error(f"Failed to get user preferences: {e}")
-        finally:
-            conn.close()
-    return {}
+    try:
+        return users.preferences(user_id)
+    except (errors.FinanceError, ValueError, SyntaxError) as e:
+        st.error(f"Failed to get user preferences: {e}")
+        return {}
 
+@profiling.profiled
 def update_user_preferences(user_id, preferences):
     """Update user preferences"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE users SET preferences = ? WHERE id = ?
-            ''', (str(preferences), user_id))
-            conn.commit()
-            return True
-        except Error as e:
-            st.error(f"Failed to update user preferences: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
-
-# ========== Database Functions ==========
-def create_connection():
-    """Create a database connection to the SQLite database"""
-    conn = None
     try:
-        conn = sqlite3.connect('finance.db')
-        return conn
-    except Error as e:
-        st.error(f"Database connection failed: {e}")
-    return conn
-
-def init_db():
-    """Initialize database with required tables"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date DATE NOT NULL,
-                    description TEXT NOT NULL,
-                    amount REAL NOT NULL,
-                    category TEXT NOT NULL DEFAULT "Other",
-                    type TEXT NOT NULL,
-                    account TEXT NOT NULL DEFAULT "Cash",
-                    recurring BOOLEAN DEFAULT 0,
-                    recurring_frequency TEXT,
-                    recurring_end_date DATE,
-                    notes TEXT,
-                    tags TEXT,
-                    receipt BLOB,
-                    user_id INTEGER,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS budgets (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    category TEXT NOT NULL,
-                    amount REAL NOT NULL,
-                    month_year TEXT NOT NULL,
-                    user_id INTEGER,
-                    notifications BOOLEAN DEFAULT 1,
-                    UNIQUE(category, month_year, user_id),
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS savings_goals (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    target_amount REAL NOT NULL,
-                    current_amount REAL NOT NULL,
-                    target_date DATE,
-                    notes TEXT,
-                    priority INTEGER DEFAULT 3,
-                    user_id INTEGER,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS accounts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL UNIQUE,
-                    type TEXT NOT NULL,
-                    balance REAL NOT NULL,
-                    currency TEXT DEFAULT 'IDR',
-                    institution TEXT,
-                    account_number TEXT,
-                    user_id INTEGER,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS investment_portfolio (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    symbol TEXT,
-                    type TEXT NOT NULL,
-                    amount REAL NOT NULL,
-                    purchase_date DATE,
-                    current_value REAL,
-                    quantity REAL,
-                    purchase_price REAL,
-                    notes TEXT,
-                    user_id INTEGER,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS categories (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    type TEXT NOT NULL,
-                    user_id INTEGER,
-                    UNIQUE(name, type, user_id),
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS tags (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL UNIQUE,
-                    user_id INTEGER,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS financial_goals (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    target_amount REAL NOT NULL,
-                    current_amount REAL NOT NULL,
-                    target_date DATE,
-                    priority INTEGER DEFAULT 3,
-                    notes TEXT,
-                    user_id INTEGER,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS transaction_templates (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    amount REAL,
-                    category TEXT,
-                    type TEXT,
-                    account TEXT,
-                    user_id INTEGER,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            # Enhanced default categories (limited to requested categories)
-            default_categories = [
-                # Income Categories (only Salary)
-                ('Salary', 'Income'),
-                
-                # Expense Categories (only the 6 requested)
-                ('Bills & Utilities', 'Expense'),
-                ('Shopping', 'Expense'),
-                ('Education', 'Expense'),
-                ('Healthcare', 'Expense'),
-                ('Entertainment', 'Expense'),
-                ('Transportation', 'Expense')
-            ]
-            
-            for category in default_categories:
-                cursor.execute('''
-                    INSERT OR IGNORE INTO categories (name, type)
-                    VALUES (?, ?)
-                ''', category)
-            
-            cursor.execute("INSERT OR IGNORE INTO accounts (name, type, balance, currency) VALUES (?, ?, ?, ?)",
-                         ("Cash", "Cash", 0, "IDR"))
-            
-            conn.commit()
-        except Error as e:
-            st.error(f"Failed to create tables: {e}")
-        finally:
-            conn.close()
-
-def migrate_database():
-    """Add missing columns to existing database"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            
-            tables = {
-                'transactions': ['user_id', 'category', 'account', 'recurring', 'notes', 'tags', 'receipt', 'recurring_frequency', 'recurring_end_date'],
-                'budgets': ['user_id', 'notifications'],
-                'savings_goals': ['user_id', 'priority'],
-                'accounts': ['user_id'],
-                'investment_portfolio': ['user_id', 'symbol', 'quantity', 'purchase_price'],
-                'categories': ['user_id'],
-                'tags': ['user_id'],
-                'financial_goals': ['user_id'],
-                'transaction_templates': ['user_id']
-            }
-            
-            for table, columns in tables.items():
-                cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table}'")
-                if cursor.fetchone():
-                    cursor.execute(f"PRAGMA table_info({table})")
-                    existing_columns = [col[1] for col in cursor.fetchall()]
-                    
-                    for column in columns:
-                        if column not in existing_columns:
-                            if column == 'user_id':
-                                cursor.execute(f'ALTER TABLE {table} ADD COLUMN user_id INTEGER')
-                                if table == 'transactions':
-                                    cursor.execute('''
-                                        CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions(user_id)
-                                    ''')
-                            elif column == 'category':
-                                cursor.execute(f'ALTER TABLE {table} ADD COLUMN category TEXT NOT NULL DEFAULT "Other"')
-                            elif column == 'notifications':
-                                cursor.execute(f'ALTER TABLE {table} ADD COLUMN notifications BOOLEAN DEFAULT 1')
-                            elif column == 'priority':
-                                cursor.execute(f'ALTER TABLE {table} ADD COLUMN priority INTEGER DEFAULT 3')
-                            else:
-                                if column in ['amount', 'current_value', 'purchase_price']:
-                                    cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} REAL')
-                                elif column in ['recurring', 'notifications']:
-                                    cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} BOOLEAN DEFAULT 0')
-                                elif column in ['date', 'purchase_date', 'target_date', 'recurring_end_date']:
-                                    cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} DATE')
-                                else:
-                                    cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} TEXT')
-            
-            # Enhanced default categories (limited to requested categories)
-            default_categories = [
-                ('Bills & Utilities', 'Expense'),
-                ('Shopping', 'Expense'),
-                ('Education', 'Expense'),
-                ('Healthcare', 'Expense'),
-                ('Entertainment', 'Expense'),
-                ('Transportation', 'Expense')
-            ]
-            
-            for category in default_categories:
-                cursor.execute('''
-                    INSERT OR IGNORE INTO categories (name, type)
-                    VALUES (?, ?)
-                ''', category)
-            
-            cursor.execute("INSERT OR IGNORE INTO accounts (name, type, balance, currency) VALUES (?, ?, ?, ?)",
-                         ("Cash", "Cash", 0, "IDR"))
-            
-            conn.commit()
-        except Error as e:
-            st.error(f"Failed to update database schema: {e}")
-        finally:
-            conn.close()
+        users.set_preferences(user_id, preferences)
+        return True
+    except errors.FinanceError as e:
+        st.error(f"Failed to update user preferences: {e}")
+        return False
 
 # ========== Transaction Functions ==========
+@profiling.profiled
 def add_transaction(date, description, amount, category, trans_type, account="Cash", recurring=False, recurring_frequency=None, recurring_end_date=None, notes=None, tags=None, receipt=None, user_id=None):
     """Add a new transaction to the database."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO transactions (date, description, amount, category, type, account, recurring, recurring_frequency, recurring_end_date, notes, tags, receipt, user_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (date, description, amount, category or "Other", trans_type, account, int(recurring), recurring_frequency, recurring_end_date, notes, tags, receipt, user_id))
-            conn.commit()
-            st.success("Transaction added successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to add transaction: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        transactions.add(date, description, amount, category, trans_type, account, recurring, recurring_frequency, recurring_end_date, notes, tags, receipt, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to add transaction: {e}")
+        return False
+    if recurring:
+        scheduler.submit(user_id, force=True)
+    st.success("Transaction added successfully!")
+    return True
 
+@profiling.profiled
 def update_transaction(transaction_id, date, description, amount, category, trans_type, account, recurring, recurring_frequency, recurring_end_date, notes, tags, receipt, user_id):
     """Update an existing transaction."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE transactions 
-                SET date = ?, description = ?, amount = ?, category = ?, type = ?, account = ?, recurring = ?, recurring_frequency = ?, recurring_end_date = ?, notes = ?, tags = ?, receipt = ?
-                WHERE id = ? AND (user_id = ? OR ? IS NULL)
-            ''', (date, description, amount, category or "Other", trans_type, account, int(recurring), recurring_frequency, recurring_end_date, notes, tags, receipt, transaction_id, user_id, user_id))
-            conn.commit()
-            st.success("Transaction updated successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to update transaction: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        transactions.update(transaction_id, date, description, amount, category, trans_type, account, recurring, recurring_frequency, recurring_end_date, notes, tags, receipt, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to update transaction: {e}")
+        return False
+    if recurring:
+        scheduler.submit(user_id, force=True)
+    st.success("Transaction updated successfully!")
+    return True
 
+@profiling.profiled
 def delete_transaction(transaction_id, user_id=None):
     """Delete a transaction."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                DELETE FROM transactions 
-                WHERE id = ? AND (user_id = ? OR ? IS NULL)
-            ''', (transaction_id, user_id, user_id))
-            conn.commit()
-            st.success("Transaction deleted successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to delete transaction: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        transactions.delete(transaction_id, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to delete transaction: {e}")
+        return False
+    st.success("Transaction deleted successfully!")
+    return True
 
+@profiling.profiled
 def delete_all_transactions(user_id=None):
     """Delete all transactions for a user"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                DELETE FROM transactions 
-                WHERE user_id = ? OR ? IS NULL
-            ''', (user_id, user_id))
-            conn.commit()
-            st.success("All transactions deleted successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to delete transactions: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        transactions.delete_all(user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to delete transactions: {e}")
+        return False
+    st.success("All transactions deleted successfully!")
+    return True
 
+@profiling.profiled
 def delete_selected_transactions(transaction_ids, user_id=None):
     """Delete selected transactions"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            placeholders = ','.join(['?'] * len(transaction_ids))
-            query = f'''
-                DELETE FROM transactions 
-                WHERE id IN ({placeholders}) AND (user_id = ? OR ? IS NULL)
-            '''
-            params = transaction_ids + [user_id, user_id]
-            cursor.execute(query, params)
-            conn.commit()
-            st.success(f"{cursor.rowcount} transactions deleted successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to delete transactions: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        deleted = transactions.delete_many(transaction_ids, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to delete transactions: {e}")
+        return False
+    st.success(f"{deleted} transactions deleted successfully!")
+    return True
 
+@profiling.profiled
+@cache.per_request
 def get_transactions(date_range=None, user_id=None):
     """Get transactions for the given date range and user."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            query = '''
-                SELECT id, date, description, amount, category, type, account, recurring, recurring_frequency, recurring_end_date, notes, tags
-                FROM transactions
-                WHERE (user_id = ? OR ? IS NULL)
-            '''
-            params = [user_id, user_id]
-            
-            if date_range and date_range[0] and date_range[1]:
-                query += " AND date BETWEEN ? AND ?"
-                params.extend([date_range[0], date_range[1]])
-                
-            query += " ORDER BY date DESC"
-            
-            df = pd.read_sql(query, conn, params=params, parse_dates=['date', 'recurring_end_date'])
-            return df
-        except Exception as e:
-            st.error(f"Failed to get transactions: {e}")
-            return pd.DataFrame()
-        finally:
-            conn.close()
-    return pd.DataFrame()
+    try:
+        return transactions.fetch(date_range, user_id)
+    except Exception as e:
+        st.error(f"Failed to get transactions: {e}")
+        return pd.DataFrame()
+
+@profiling.profiled
+@cache.per_request
+def get_recurring_transactions(user_id=None):
+    """Get the recurring transactions for the user."""
+    try:
+        return transactions.recurring_sources(user_id)
+    except Exception as e:
+        st.error(f"Failed to get recurring transactions: {e}")
+        return pd.DataFrame()
 
+@profiling.profiled
 def get_transaction_by_id(transaction_id, user_id=None):
     """Get a single transaction by ID."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            query = '''
-                SELECT id, date, description, amount, category, type, account, recurring, recurring_frequency, recurring_end_date, notes, tags, receipt
-                FROM transactions
-                WHERE id = ? AND (user_id = ? OR ? IS NULL)
-            '''
-            cursor = conn.cursor()
-            cursor.execute(query, (transaction_id, user_id, user_id))
-            result = cursor.fetchone()
-            if result:
-                columns = ['id', 'date', 'description', 'amount', 'category', 'type', 'account', 'recurring', 
-                          'recurring_frequency', 'recurring_end_date', 'notes', 'tags', 'receipt']
-                return dict(zip(columns, result))
-            return None
-        except Exception as e:
-            st.error(f"Failed to get transaction: {e}")
-            return None
-        finally:
-            conn.close()
-    return None
-
-def process_recurring_transactions(user_id=None):
-    """Process recurring transactions and create new ones if needed."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            today = datetime.today().strftime('%Y-%m-%d')
-            
-            cursor.execute('''
-                SELECT id, date, description, amount, category, type, account, recurring_frequency, recurring_end_date
-                FROM transactions
-                WHERE recurring = 1 AND (recurring_end_date IS NULL OR recurring_end_date >= ?)
-                AND (user_id = ? OR ? IS NULL)
-            ''', (today, user_id, user_id))
-            
-            recurring_transactions = cursor.fetchall()
-            
-            for trans in recurring_transactions:
-                trans_id, last_date, description, amount, category, trans_type, account, frequency, end_date = trans
-                last_date = datetime.strptime(last_date, '%Y-%m-%d').date()
-                today_date = datetime.today().date()
-                
-                create_new = False
-                next_date = None
-                
-                if frequency == 'Daily' and today_date > last_date:
-                    create_new = True
-                    next_date = last_date + timedelta(days=1)
-                elif frequency == 'Weekly' and (today_date - last_date).days >= 7:
-                    create_new = True
-                    next_date = last_date + timedelta(weeks=1)
-                elif frequency == 'Monthly':
-                    next_month = last_date.month + 1
-                    next_year = last_date.year
-                    if next_month > 12:
-                        next_month = 1
-                        next_year += 1
-                    
-                    _, last_day = calendar.monthrange(next_year, next_month)
-                    next_date = last_date.replace(year=next_year, month=next_month, day=min(last_date.day, last_day))
-                    
-                    if today_date >= next_date:
-                        create_new = True
-                elif frequency == 'Yearly':
-                    next_date = last_date.replace(year=last_date.year + 1)
-                    if today_date >= next_date:
-                        create_new = True
-                
-                if create_new and next_date:
-                    cursor.execute('''
-                        INSERT INTO transactions (date, description, amount, category, type, account, recurring, recurring_frequency, recurring_end_date, user_id)
-                        VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?, ?)
-                    ''', (next_date.strftime('%Y-%m-%d'), description, amount, category, trans_type, account, frequency, end_date, user_id))
-            
-            conn.commit()
-        except Error as e:
-            st.error(f"Failed to process recurring transactions: {e}")
-        finally:
-            conn.close()
+    try:
+        return transactions.get(transaction_id, user_id)
+    except errors.NotFoundError:
+        return None
+    except Exception as e:
+        st.error(f"Failed to get transaction: {e}")
+        return None
 
+def show_recurring_status(user_id=None):
+    """Report the background recurring run without waiting for it."""
+    if scheduler.pending(user_id):
+        st.caption("⏳ Recurring transactions are being processed in the background; refresh to see new ones.")
+        return
+    result = scheduler.last_result(user_id)
+    if result is None:
+        return
+    if result.error:
+        st.warning(f"Recurring transactions could not be processed: {result.error}")
+    elif result.generated:
+        st.caption(f"🔁 {result.generated} recurring transactions generated from {result.processed} due rules on {result.run_date:%Y-%m-%d}")
+
+@profiling.profiled
 def add_transaction_template(name, description, amount, category, trans_type, account, user_id=None):
     """Add a transaction template for quick entry"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO transaction_templates (name, description, amount, category, type, account, user_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (name, description, amount, category, trans_type, account, user_id))
-            conn.commit()
-            st.success("Template saved successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to save template: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        transactions.add_template(name, description, amount, category, trans_type, account, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to save template: {e}")
+        return False
+    st.success("Template saved successfully!")
+    return True
 
+@profiling.profiled
+@cache.per_request
 def get_transaction_templates(user_id=None):
     """Get all transaction templates for a user"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            query = '''
-                SELECT id, name, description, amount, category, type, account
-                FROM transaction_templates
-                WHERE user_id = ? OR ? IS NULL
-                ORDER BY name
-            '''
-            df = pd.read_sql(query, conn, params=(user_id, user_id))
-            return df
-        except Exception as e:
-            st.error(f"Failed to get templates: {e}")
-            return pd.DataFrame()
-        finally:
-            conn.close()
-    return pd.DataFrame()
+    try:
+        return transactions.templates(user_id)
+    except Exception as e:
+        st.error(f"Failed to get templates: {e}")
+        return pd.DataFrame()
 
+@profiling.profiled
 def delete_transaction_template(template_id, user_id=None):
     """Delete a transaction template"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                DELETE FROM transaction_templates 
-                WHERE id = ? AND (user_id = ? OR ? IS NULL)
-            ''', (template_id, user_id, user_id))
-            conn.commit()
-            st.success("Template deleted successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to delete template: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        transactions.delete_template(template_id, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to delete template: {e}")
+        return False
+    st.success("Template deleted successfully!")
+    return True
 
 # ========== Accounts Functions ==========
+@profiling.profiled
+@cache.per_request
 def get_accounts(user_id=None):
     """Get all accounts for the user."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(accounts)")
-            columns = [col[1] for col in cursor.fetchall()]
-            
-            if 'user_id' in columns:
-                query = '''
-                    SELECT id, name, type, balance, currency, institution, account_number
-                    FROM accounts
-                    WHERE user_id = ? OR ? IS NULL
-                    ORDER BY name
-                '''
-                params = (user_id, user_id)
-            else:
-                query = '''
-                    SELECT id, name, type, balance, currency, institution, account_number
-                    FROM accounts
-                    ORDER BY name
-                '''
-                params = ()
-                
-            df = pd.read_sql(query, conn, params=params)
-            return df
-        except Exception as e:
-            st.error(f"Failed to get accounts: {e}")
-            return pd.DataFrame()
-        finally:
-            conn.close()
-    return pd.DataFrame()
+    try:
+        return accounts.fetch(user_id)
+    except Exception as e:
+        st.error(f"Failed to get accounts: {e}")
+        return pd.DataFrame()
 
+@profiling.profiled
 def add_account(name, account_type, balance, currency='IDR', institution=None, account_number=None, user_id=None):
     """Add a new account."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO accounts (name, type, balance, currency, institution, account_number, user_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (name, account_type, balance, currency, institution, account_number, user_id))
-            conn.commit()
-            st.success("Account added successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to add account: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        accounts.add(name, account_type, balance, currency, institution, account_number, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to add account: {e}")
+        return False
+    st.success("Account added successfully!")
+    return True
 
+@profiling.profiled
 def update_account_balance(account_name, amount, is_debit=False, user_id=None):
     """Update account balance after a transaction."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            if is_debit:
-                cursor.execute('''
-                    UPDATE accounts 
-                    SET balance = balance - ?
-                    WHERE name = ? AND (user_id = ? OR ? IS NULL)
-                ''', (amount, account_name, user_id, user_id))
-            else:
-                cursor.execute('''
-                    UPDATE accounts 
-                    SET balance = balance + ?
-                    WHERE name = ? AND (user_id = ? OR ? IS NULL)
-                ''', (amount, account_name, user_id, user_id))
-            conn.commit()
-            return True
-        except Error as e:
-            st.error(f"Failed to update account balance: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        accounts.adjust_balance(account_name, amount, is_debit, user_id)
+        return True
+    except errors.FinanceError as e:
+        st.error(f"Failed to update account balance: {e}")
+        return False
 
 # ========== Categories and Tags Functions ==========
+@profiling.profiled
+@cache.per_request
 def get_categories(trans_type=None, user_id=None):
     """Get all categories, optionally filtered by transaction type."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            query = '''
-                SELECT name, type 
-                FROM categories
-                WHERE (user_id = ? OR ? IS NULL)
-            '''
-            params = [user_id, user_id]
-            
-            if trans_type:
-                query += " AND type = ?"
-                params.append(trans_type)
-                
-            query += " ORDER BY name"
-            
-            df = pd.read_sql(query, conn, params=params)
-            return df
-        except Exception as e:
-            st.error(f"Failed to get categories: {e}")
-            return pd.DataFrame()
-        finally:
-            conn.close()
-    return pd.DataFrame()
+    try:
+        return transactions.categories(trans_type, user_id)
+    except Exception as e:
+        st.error(f"Failed to get categories: {e}")
+        return pd.DataFrame()
 
+@profiling.profiled
 def add_category(name, trans_type, user_id=None):
     """Add a new category."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO categories (name, type, user_id)
-                VALUES (?, ?, ?)
-            ''', (name, trans_type, user_id))
-            conn.commit()
-            st.success("Category added successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to add category: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        transactions.add_category(name, trans_type, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to add category: {e}")
+        return False
+    st.success("Category added successfully!")
+    return True
 
+@profiling.profiled
+@cache.per_request
 def get_tags(user_id=None):
     """Get all tags."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            query = '''
-                SELECT name 
-                FROM tags
-                WHERE (user_id = ? OR ? IS NULL)
-                ORDER BY name
-            '''
-            df = pd.read_sql(query, conn, params=(user_id, user_id))
-            return df
-        except Exception as e:
-            st.error(f"Failed to get tags: {e}")
-            return pd.DataFrame()
-        finally:
-            conn.close()
-    return pd.DataFrame()
+    try:
+        return transactions.tags(user_id)
+    except Exception as e:
+        st.error(f"Failed to get tags: {e}")
+        return pd.DataFrame()
 
+@profiling.profiled
 def add_tag(name, user_id=None):
     """Add a new tag."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO tags (name, user_id)
-                VALUES (?, ?)
-            ''', (name, user_id))
-            conn.commit()
-            st.success("Tag added successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to add tag: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        transactions.add_tag(name, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to add tag: {e}")
+        return False
+    st.success("Tag added successfully!")
+    return True
 
 # ========== Savings Goals Functions ==========
+@profiling.profiled
+@cache.per_request
 def get_savings_goals(user_id=None):
     """Get all savings goals for the user."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(savings_goals)")
-            columns = [col[1] for col in cursor.fetchall()]
-            
-            if 'user_id' in columns:
-                query = '''
-                    SELECT id, name, target_amount, current_amount, target_date, notes, priority
-                    FROM savings_goals
-                    WHERE user_id = ? OR ? IS NULL
-                    ORDER BY priority, target_date
-                '''
-                params = (user_id, user_id)
-            else:
-                query = '''
-                    SELECT id, name, target_amount, current_amount, target_date, notes, priority
-                    FROM savings_goals
-                    ORDER BY priority, target_date
-                '''
-                params = ()
-                
-            df = pd.read_sql(query, conn, params=params, parse_dates=['target_date'])
-            return df
-        except Exception as e:
-            st.error(f"Failed to get savings goals: {e}")
-            return pd.DataFrame()
-        finally:
-            conn.close()
-    return pd.DataFrame()
+    try:
+        return budgets.goals(user_id)
+    except Exception as e:
+        st.error(f"Failed to get savings goals: {e}")
+        return pd.DataFrame()
 
+@profiling.profiled
 def add_savings_goal(name, target_amount, current_amount=0, target_date=None, notes=None, priority=3, user_id=None):
     """Add a new savings goal."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO savings_goals (name, target_amount, current_amount, target_date, notes, priority, user_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (name, target_amount, current_amount, target_date, notes, priority, user_id))
-            conn.commit()
-            st.success("Savings goal added successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to add savings goal: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        budgets.add_goal(name, target_amount, current_amount, target_date, notes, priority, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to add savings goal: {e}")
+        return False
+    st.success("Savings goal added successfully!")
+    return True
 
+@profiling.profiled
 def update_savings_goal(goal_id, name, target_amount, current_amount, target_date, notes, priority, user_id=None):
     """Update a savings goal."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE savings_goals 
-                SET name = ?, target_amount = ?, current_amount = ?, target_date = ?, notes = ?, priority = ?
-                WHERE id = ? AND (user_id = ? OR ? IS NULL)
-            ''', (name, target_amount, current_amount, target_date, notes, priority, goal_id, user_id, user_id))
-            conn.commit()
-            st.success("Savings goal updated successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to update savings goal: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        budgets.update_goal(goal_id, name, target_amount, current_amount, target_date, notes, priority, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to update savings goal: {e}")
+        return False
+    st.success("Savings goal updated successfully!")
+    return True
 
+@profiling.profiled
 def delete_savings_goal(goal_id, user_id=None):
     """Delete a savings goal."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                DELETE FROM savings_goals 
-                WHERE id = ? AND (user_id = ? OR ? IS NULL)
-            ''', (goal_id, user_id, user_id))
-            conn.commit()
-            st.success("Savings goal deleted successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to delete savings goal: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        budgets.delete_goal(goal_id, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to delete savings goal: {e}")
+        return False
+    st.success("Savings goal deleted successfully!")
+    return True
 
 # ========== Investment Portfolio Functions ==========
+@profiling.profiled
 def add_investment(name, investment_type, amount, purchase_date=None, current_value=None, symbol=None, quantity=None, purchase_price=None, notes=None, user_id=None):
     """Add a new investment to the portfolio"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO investment_portfolio (name, type, amount, purchase_date, current_value, symbol, quantity, purchase_price, notes, user_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (name, investment_type, amount, purchase_date, current_value, symbol, quantity, purchase_price, notes, user_id))
-            conn.commit()
-            st.success("Investment added successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to add investment: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        investments.add(name, investment_type, amount, purchase_date, current_value, symbol, quantity, purchase_price, notes, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to add investment: {e}")
+        return False
+    st.success("Investment added successfully!")
+    return True
 
+@profiling.profiled
 def update_investment(investment_id, name, investment_type, amount, purchase_date, current_value, symbol, quantity, purchase_price, notes, user_id=None):
     """Update an existing investment."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE investment_portfolio 
-                SET name = ?, type = ?, amount = ?, purchase_date = ?, current_value = ?, symbol = ?, quantity = ?, purchase_price = ?, notes = ?
-                WHERE id = ? AND (user_id = ? OR ? IS NULL)
-            ''', (name, investment_type, amount, purchase_date, current_value, symbol, quantity, purchase_price, notes, investment_id, user_id, user_id))
-            conn.commit()
-            st.success("Investment updated successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to update investment: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        investments.update(investment_id, name, investment_type, amount, purchase_date, current_value, symbol, quantity, purchase_price, notes, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to update investment: {e}")
+        return False
+    st.success("Investment updated successfully!")
+    return True
 
+@profiling.profiled
 def delete_investment(investment_id, user_id=None):
     """Delete an investment."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                DELETE FROM investment_portfolio 
-                WHERE id = ? AND (user_id = ? OR ? IS NULL)
-            ''', (investment_id, user_id, user_id))
-            conn.commit()
-            st.success("Investment deleted successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to delete investment: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        investments.delete(investment_id, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to delete investment: {e}")
+        return False
+    st.success("Investment deleted successfully!")
+    return True
 
+@profiling.profiled
+@cache.per_request
 def get_investments(user_id=None):
     """Get all investments"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(investment_portfolio)")
-            columns = [col[1] for col in cursor.fetchall()]
-            
-            if 'user_id' in columns:
-                query = '''
-                    SELECT id, name, type, amount, purchase_date, current_value, symbol, quantity, purchase_price, notes
-                    FROM investment_portfolio
-                    WHERE user_id = ? OR ? IS NULL
-                    ORDER BY name
-                '''
-                params = (user_id, user_id)
-            else:
-                query = '''
-                    SELECT id, name, type, amount, purchase_date, current_value, symbol, quantity, purchase_price, notes
-                    FROM investment_portfolio
-                    ORDER BY name
-                '''
-                params = ()
-                
-            df = pd.read_sql(query, conn, params=params, parse_dates=['purchase_date'])
-            return df
-        except Error as e:
-            st.error(f"Failed to get investments: {e}")
-        finally:
-            conn.close()
-    return pd.DataFrame()
+    try:
+        return investments.fetch(user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to get investments: {e}")
+        return pd.DataFrame()
 
+@profiling.profiled
 def get_investment_performance(symbol, start_date, end_date):
     """Get investment performance data from Yahoo Finance"""
     try:
-        ticker = yf.Ticker(symbol)
-        data = ticker.history(start=start_date, end=end_date)
-        if not data.empty:
-            return data['Close'].reset_index()
-        return None
+        return investments.performance(symbol, start_date, end_date)
     except Exception as e:
         st.error(f"Failed to get investment data: {e}")
         return None
 
 # ========== Budget Functions ==========
+@profiling.profiled
+@cache.per_request
 def get_budgets(month_year=None, user_id=None):
     """Get budgets for the given month/year or current month if not specified."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            if not month_year:
-                today = datetime.today()
-                month_year = today.strftime('%Y-%m')
-            
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(budgets)")
-            columns = [col[1] for col in cursor.fetchall()]
-            
-            if 'user_id' in columns:
-                query = '''
-                    SELECT id, category, amount, month_year, notifications
-                    FROM budgets
-                    WHERE month_year = ? AND (user_id = ? OR ? IS NULL)
-                    ORDER BY category
-                '''
-                params = (month_year, user_id, user_id)
-            else:
-                query = '''
-                    SELECT id, category, amount, month_year, notifications
-                    FROM budgets
-                    WHERE month_year = ?
-                    ORDER BY category
-                '''
-                params = (month_year,)
-                
-            df = pd.read_sql(query, conn, params=params)
-            return df
-        except Exception as e:
-            st.error(f"Failed to get budgets: {e}")
-            return pd.DataFrame()
-        finally:
-            conn.close()
-    return pd.DataFrame()
+    try:
+        return budgets.fetch(month_year, user_id)
+    except Exception as e:
+        st.error(f"Failed to get budgets: {e}")
+        return pd.DataFrame()
 
+@profiling.profiled
 def add_budget(category, amount, month_year=None, notifications=True, user_id=None):
     """Add a new budget."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            if not month_year:
-                today = datetime.today()
-                month_year = today.strftime('%Y-%m')
-            
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO budgets (category, amount, month_year, notifications, user_id)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (category, amount, month_year, int(notifications), user_id))
-            conn.commit()
-            st.success("Budget added successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to add budget: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        budgets.add(category, amount, month_year, notifications, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to add budget: {e}")
+        return False
+    st.success("Budget added successfully!")
+    return True
 
+@profiling.profiled
 def update_budget(budget_id, category, amount, month_year, notifications, user_id=None):
     """Update a budget."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE budgets 
-                SET category = ?, amount = ?, month_year = ?, notifications = ?
-                WHERE id = ? AND (user_id = ? OR ? IS NULL)
-            ''', (category, amount, month_year, int(notifications), budget_id, user_id, user_id))
-            conn.commit()
-            st.success("Budget updated successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to update budget: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        budgets.update(budget_id, category, amount, month_year, notifications, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to update budget: {e}")
+        return False
+    st.success("Budget updated successfully!")
+    return True
 
+@profiling.profiled
 def delete_budget(budget_id, user_id=None):
     """Delete a budget."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                DELETE FROM budgets 
-                WHERE id = ? AND (user_id = ? OR ? IS NULL)
-            ''', (budget_id, user_id, user_id))
-            conn.commit()
-            st.success("Budget deleted successfully!")
-            return True
-        except Error as e:
-            st.error(f"Failed to delete budget: {e}")
-            return False
-        finally:
-            conn.close()
-    return False
+    try:
+        budgets.delete(budget_id, user_id)
+    except errors.FinanceError as e:
+        st.error(f"Failed to delete budget: {e}")
+        return False
+    st.success("Budget deleted successfully!")
+    return True
 
+@profiling.profiled
 def get_budget_vs_actual(month_year=None, user_id=None):
     """Compare budget vs actual spending for each category."""
-    if not month_year:
-        today = datetime.today()
-        month_year = today.strftime('%Y-%m')
-    
-    budgets = get_budgets(month_year, user_id)
-    if budgets.empty:
+    try:
+        return budgets.vs_actual(month_year, user_id)
+    except Exception as e:
+        st.error(f"Failed to compare budgets with spending: {e}")
         return pd.DataFrame()
-    
-    # Get transactions for the month
-    start_date = f"{month_year}-01"
-    end_date = (datetime.strptime(start_date, '%Y-%m-%d') + timedelta(days=31)).strftime('%Y-%m-%d')
-    transactions = get_transactions((start_date, end_date), user_id)
-    
-    # Filter only expenses
-    expenses = transactions[transactions['type'] == 'Expense']
-    
-    # Group by category and sum amounts
-    if not expenses.empty:
-        actual_spending = expenses.groupby('category')['amount'].sum().reset_index()
-        actual_spending.columns = ['category', 'actual']
-    else:
-        actual_spending = pd.DataFrame(columns=['category', 'actual'])
-    
-    # Merge with budgets
-    comparison = pd.merge(budgets, actual_spending, on='category', how='left')
-    comparison['actual'] = comparison['actual'].fillna(0)
-    comparison['difference'] = comparison['amount'] - comparison['actual']
-    comparison['percentage'] = (comparison['actual'] / comparison['amount']) * 100
-    
-    return comparison
 
 # ========== Utility Functions ==========
 def format_currency(amount, currency='IDR'):
@@ -1408,7 +644,7 @@ def format_currency(amount, currency='IDR'):
     else:
         return f"{amount:,.2f} {currency}"
 
-def get_date_range(period="This Month"):
+def get_date_range(period="This Month", key=None):
     """Get date range based on selected period with more options"""
     today = datetime.today()
     
@@ -1456,177 +692,111 @@ def get_date_range(period="This Month"):
     elif period == "Custom":
         col1, col2 = st.columns(2)
         with col1:
-            start_date = st.date_input("Start date", today.replace(day=1))
+            start_date = st.date_input("Start date", today.replace(day=1), key=f"{key}_start" if key else None)
         with col2:
-            end_date = st.date_input("End date", today)
+            end_date = st.date_input("End date", today, key=f"{key}_end" if key else None)
         return (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
     return (None, None)
 
+def lazy_tabs(labels, key, keep=None):
+    """Render ``labels`` as a row of tabs and return the selected one.
+
+    Unlike ``st.tabs``, only the selected tab's code needs to run, so hidden
+    tabs fetch nothing. Streamlit forgets the value of a widget that was not
+    rendered; ``keep`` maps each tab to the widget keys whose values should
+    survive while it is hidden.
+    """
+    selected = st.radio("Section", labels, horizontal=True, key=key, label_visibility="collapsed")
+    for label, widget_keys in (keep or {}).items():
+        if label == selected:
+            continue
+        for widget_key in widget_keys:
+            if widget_key in st.session_state:
+                st.session_state[widget_key] = st.session_state[widget_key]
+    return selected
+
+@profiling.profiled
+@cache.per_request
 def get_financial_summary(date_range, user_id=None):
     """Return total income, expense, and balance for the given date range and user."""
-    conn = create_connection()
-    summary = {"income": 0, "expense": 0, "balance": 0}
-    if conn is not None and date_range and date_range[0] and date_range[1]:
-        try:
-            query = '''
-                SELECT 
-                    SUM(CASE WHEN type = "Income" THEN amount ELSE 0 END) as income,
-                    SUM(CASE WHEN type = "Expense" THEN amount ELSE 0 END) as expense
-                FROM transactions
-                WHERE date BETWEEN ? AND ?
-            '''
-            params = [date_range[0], date_range[1]]
-            if user_id is not None:
-                query += " AND (user_id = ? OR ? IS NULL)"
-                params.extend([user_id, user_id])
-            cur = conn.cursor()
-            cur.execute(query, params)
-            row = cur.fetchone()
-            income = row[0] if row[0] is not None else 0
-            expense = row[1] if row[1] is not None else 0
-            summary = {
-                "income": income,
-                "expense": expense,
-                "balance": income - expense
-            }
-        except Exception as e:
-            st.error(f"Failed to get financial summary: {e}")
-        finally:
-            conn.close()
-    return summary
+    try:
+        return analytics.financial_summary(date_range, user_id)
+    except Exception as e:
+        st.error(f"Failed to get financial summary: {e}")
+        return analytics.FinancialSummary()
 
+@profiling.profiled
+@cache.per_request
 def get_monthly_summary(year, user_id=None):
     """Return a DataFrame with monthly income and expense for the given year and user."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            query = '''
-                SELECT 
-                    strftime('%m', date) as month,
-                    SUM(CASE WHEN type = "Income" THEN amount ELSE 0 END) as income,
-                    SUM(CASE WHEN type = "Expense" THEN amount ELSE 0 END) as expense
-                FROM transactions
-                WHERE strftime('%Y', date) = ?
-            '''
-            params = [str(year)]
-            if user_id is not None:
-                query += " AND (user_id = ? OR ? IS NULL)"
-                params.extend([user_id, user_id])
-            query += " GROUP BY month ORDER BY month"
-            df = pd.read_sql(query, conn, params=params)
-            # Ensure all months are present
-            months = [f"{i:02d}" for i in range(1, 13)]
-            df = df.set_index('month').reindex(months, fill_value=0).reset_index()
-            df['month'] = df['month'].apply(lambda x: calendar.month_abbr[int(x)])
-            return df
-        except Exception as e:
-            st.error(f"Failed to get monthly summary: {e}")
-            return pd.DataFrame()
-        finally:
-            conn.close()
-    return pd.DataFrame()
+    try:
+        return analytics.monthly_summary(year, user_id)
+    except Exception as e:
+        st.error(f"Failed to get monthly summary: {e}")
+        return pd.DataFrame()
 
+@profiling.profiled
+@cache.per_request
 def get_category_spending(date_range, user_id=None):
     """Get spending by category for the given date range."""
-    conn = create_connection()
-    if conn is not None and date_range and date_range[0] and date_range[1]:
-        try:
-            query = '''
-                SELECT category, SUM(amount) as total
-                FROM transactions
-                WHERE type = "Expense" AND date BETWEEN ? AND ?
-            '''
-            params = [date_range[0], date_range[1]]
-            if user_id is not None:
-                query += " AND (user_id = ? OR ? IS NULL)"
-                params.extend([user_id, user_id])
-            query += " GROUP BY category ORDER BY total DESC"
-            df = pd.read_sql(query, conn, params=params)
-            return df
-        except Exception as e:
-            st.error(f"Failed to get category spending: {e}")
-            return pd.DataFrame()
-        finally:
-            conn.close()
-    return pd.DataFrame()
+    try:
+        return analytics.category_spending(date_range, user_id)
+    except Exception as e:
+        st.error(f"Failed to get category spending: {e}")
+        return pd.DataFrame()
+
+@profiling.profiled
+@cache.per_request
+def get_daily_spending(date_range, user_id=None):
+    """Get total expenses per day for the given date range."""
+    try:
+        return analytics.daily_spending(date_range, user_id)
+    except Exception as e:
+        st.error(f"Failed to get daily spending: {e}")
+        return pd.DataFrame()
 
+@profiling.profiled
 def get_account_balances(user_id=None):
     """Get current balances for all accounts."""
-    accounts = get_accounts(user_id)
-    if not accounts.empty:
-        return accounts[['name', 'balance', 'currency']]
-    return pd.DataFrame(columns=['name', 'balance', 'currency'])
+    try:
+        return accounts.balances(user_id)
+    except Exception as e:
+        st.error(f"Failed to get accounts: {e}")
+        return pd.DataFrame(columns=['name', 'balance', 'currency'])
 
+@profiling.profiled
 def get_net_worth(user_id=None):
     """Calculate net worth (assets - liabilities)"""
-    accounts = get_accounts(user_id)
-    if not accounts.empty:
-        return accounts['balance'].sum()
-    return 0
+    try:
+        return accounts.net_worth(user_id)
+    except Exception as e:
+        st.error(f"Failed to get accounts: {e}")
+        return 0
 
+@profiling.profiled
 def convert_currency(amount, from_currency, to_currency):
     """Convert amount from one currency to another"""
     try:
-        c = CurrencyRates()
-        rate = c.get_rate(from_currency, to_currency)
-        return amount * rate
-    except Exception as e:
+        return accounts.convert_currency(amount, from_currency, to_currency)
+    except errors.FinanceError as e:
         st.error(f"Failed to convert currency: {e}")
         return amount
 
+@profiling.profiled
 def forecast_future_balances(transactions, months=6):
     """Forecast future account balances based on historical transactions"""
     try:
-        transactions['date'] = pd.to_datetime(transactions['date'])
-        transactions.set_index('date', inplace=True)
-        
-        monthly = transactions.resample('M')['amount'].sum()
-        
-        X = np.arange(len(monthly)).reshape(-1, 1)
-        y = monthly.values
-        
-        model = LinearRegression()
-        model.fit(X, y)
-        
-        future_X = np.arange(len(monthly), len(monthly) + months).reshape(-1, 1)
-        future_y = model.predict(future_X)
-        
-        last_date = monthly.index[-1]
-        future_dates = pd.date_range(
-            start=last_date + pd.offsets.MonthBegin(1),
-            periods=months,
-            freq='M'
-        )
-        
-        forecast = pd.DataFrame({
-            'date': future_dates,
-            'amount': future_y
-        })
-        
-        return forecast
-    except Exception as e:
+        return analytics.forecast_balances(transactions, months)
+    except errors.FinanceError as e:
         st.error(f"Failed to generate forecast: {e}")
         return pd.DataFrame()
 
+@profiling.profiled
 def analyze_spending_trends(transactions):
     """Analyze spending trends using time series decomposition"""
     try:
-        transactions['date'] = pd.to_datetime(transactions['date'])
-        transactions.set_index('date', inplace=True)
-        
-        monthly = transactions.resample('M')['amount'].sum()
-        
-        all_months = pd.date_range(
-            start=monthly.index.min(),
-            end=monthly.index.max(),
-            freq='M'
-        )
-        monthly = monthly.reindex(all_months, fill_value=0)
-        
-        decomposition = seasonal_decompose(monthly, model='additive', period=12)
-        
-        return decomposition
-    except Exception as e:
+        return analytics.spending_trends(transactions)
+    except errors.FinanceError as e:
         st.error(f"Failed to analyze spending trends: {e}")
         return None
 
@@ -1646,92 +816,171 @@ def calculate_next_occurrence(transaction):
     return "N/A"
 
 # ========== Data Import/Export Functions ==========
+@profiling.profiled
 def export_transactions_to_csv(date_range=None, user_id=None):
-    """Export transactions to CSV file"""
-    transactions = get_transactions(date_range, user_id)
-    if not transactions.empty:
-        csv = transactions.to_csv(index=False)
-        return csv
-    return None
-
-def export_transactions_to_excel(date_range=None, user_id=None):
-    """Export transactions to Excel file"""
-    transactions = get_transactions(date_range, user_id)
-    if not transactions.empty:
-        output = BytesIO()
-        writer = pd.ExcelWriter(output, engine='xlsxwriter')
-        transactions.to_excel(writer, index=False, sheet_name='Transactions')
-        
-        summary = transactions.groupby(['type', 'category', 'account'])['amount'].sum().unstack().fillna(0)
-        summary.to_excel(writer, sheet_name='Summary')
-        
-        writer.close()
-        output.seek(0)
-        return output.getvalue()
-    return None
+    """Export transactions to a CSV temp file, streamed page by page"""
+    output = tempfile.TemporaryFile()
+    try:
+        rows = exports.write_csv(output, date_range, user_id)
+    except Exception as e:
+        output.close()
+        st.error(f"Failed to export transactions: {e}")
+        return None
+    if not rows:
+        output.close()
+        return None
+    output.seek(0)
+    return output
+
+@profiling.profiled
+def export_transactions_to_parquet(date_range=None, user_id=None):
+    """Export transactions to a compressed Parquet temp file, streamed page by page"""
+    output = tempfile.TemporaryFile()
+    try:
+        rows = exports.write_parquet(output, date_range, user_id)
+    except Exception as e:
+        output.close()
+        st.error(f"Failed to export transactions: {e}")
+        return None
+    if not rows:
+        output.close()
+        return None
+    output.seek(0)
+    return output
+
+@profiling.profiled
+def export_transactions_to_excel(date_range=None, user_id=None, sheet_per_year=False):
+    """Export transactions to an Excel temp file, written in constant-memory mode"""
+    output = tempfile.TemporaryFile()
+    try:
+        rows = exports.write_excel(output, date_range, user_id, sheet_per_year=sheet_per_year)
+    except Exception as e:
+        output.close()
+        st.error(f"Failed to export transactions: {e}")
+        return None
+    if not rows:
+        output.close()
+        return None
+    output.seek(0)
+    return output
 
+@profiling.profiled
 def import_transactions_from_csv(file, user_id=None):
     """Import transactions from CSV file"""
+    progress_bar = st.progress(0.0, text="Importing transactions...")
+
+    def show_progress(result):
+        fraction = result.fraction if result.fraction is not None else 0.0
+        progress_bar.progress(fraction, text=f"Imported {result.read:,} rows ({result.rows_per_second:,.0f} rows/sec)")
+
     try:
-        df = pd.read_csv(file)
-        required_columns = ['date', 'description', 'amount', 'category', 'type']
-        
-        if not all(col in df.columns for col in required_columns):
-            st.error(f"CSV file must contain these columns: {', '.join(required_columns)}")
-            return False
-        
-        success_count = 0
-        for _, row in df.iterrows():
-            if add_transaction(
-                row['date'],
-                row['description'],
-                row['amount'],
-                row['category'],
-                row['type'],
-                row.get('account', 'Cash'),
-                row.get('recurring', False),
-                row.get('recurring_frequency'),
-                row.get('recurring_end_date'),
-                row.get('notes'),
-                row.get('tags'),
-                None,
-                user_id
-            ):
-                success_count += 1
-        
-        st.success(f"Successfully imported {success_count} of {len(df)} transactions")
-        return True
+        result = importer.import_csv(file, user_id, progress=show_progress)
+    except importer.ImportFormatError as e:
+        progress_bar.empty()
+        st.error(str(e))
+        return False
     except Exception as e:
-        st.error(f"Failed to import transactions: {e}")
+        progress_bar.empty()
+        st.error(f"Failed to import transactions, nothing was imported: {e}")
         return False
 
-def backup_database():
-    """Create a backup of the database file"""
+    scheduler.submit(user_id, force=True)
+    progress_bar.progress(1.0, text=f"Done in {result.elapsed:.1f}s ({result.rows_per_second:,.0f} rows/sec)")
+    message = f"Successfully imported {result.imported} of {result.read} transactions"
+    if result.skipped:
+        message += f" ({result.skipped} rows skipped: missing or invalid date, amount, description or type)"
+    st.success(message)
+    return True
+
+@profiling.profiled
+def backup_database(snapshot=False):
+    """Offer an online backup of the database for download, optionally keeping a local snapshot
+
+    The backup itself is copied page by page and the snapshot is compressed
+    in a stream, but st.download_button reads the whole backup into memory to
+    serve it, so the download costs one database-sized buffer per session.
+    """
+    progress_bar = st.progress(0.0, text="Backing up database...")
+
+    def show_progress(copied, total):
+        progress_bar.progress(copied / total if total else 1.0, text=f"Copied {copied:,} of {total:,} pages")
+
     try:
-        with open('finance.db', 'rb') as f:
-            db_data = f.read()
-        return db_data
+        with backup.temporary_backup(show_progress) as backup_file:
+            st.download_button(
+                label="Download Backup",
+                data=backup_file,
+                file_name=f"finance_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db",
+                mime="application/octet-stream"
+            )
+            if snapshot:
+                backup_file.seek(0)
+                path = backup.save_snapshot(backup_file)
+                st.success(f"Snapshot saved to {path}")
+        return True
     except Exception as e:
         st.error(f"Failed to create backup: {e}")
-        return None
+        return False
+    finally:
+        progress_bar.empty()
 
+@profiling.profiled
 def restore_database(file):
-    """Restore database from backup"""
+    """Restore database from backup after validating it"""
     try:
-        with open('finance.db', 'wb') as f:
-            f.write(file.getvalue())
-        st.success("Database restored successfully!")
-        return True
+        with st.spinner("Validating and restoring backup..."):
+            version, applied = restore.restore_upload(file)
+    except restore.RestoreError as e:
+        st.error(f"Backup rejected, nothing was changed: {e}")
+        return False
     except Exception as e:
         st.error(f"Failed to restore database: {e}")
         return False
 
+    if applied:
+        st.success(f"Database restored and upgraded from schema version {version} to {applied[-1]}!")
+    else:
+        st.success("Database restored successfully!")
+    return True
+
+@profiling.profiled
+def export_user_data(user_id):
+    """Export the current user's data as a zip of JSON Lines files"""
+    output = tempfile.TemporaryFile()
+    try:
+        userdata.export_user(output, user_id)
+    except Exception as e:
+        output.close()
+        st.error(f"Failed to export your data: {e}")
+        return None
+    output.seek(0)
+    return output
+
+@profiling.profiled
+def import_user_data(file, user_id):
+    """Merge an exported zip into the current user's data"""
+    try:
+        results = userdata.import_user(file, user_id)
+    except userdata.UserDataError as e:
+        st.error(f"Import rejected, nothing was changed: {e}")
+        return False
+    except Exception as e:
+        st.error(f"Failed to import your data, nothing was changed: {e}")
+        return False
+    scheduler.submit(user_id, force=True)
+
+    inserted = sum(r['inserted'] for r in results.values())
+    updated = sum(r['updated'] for r in results.values())
+    st.success(f"Merged your data: {inserted} rows added, {updated} rows updated")
+    return True
+
 # ========== Page Functions ==========
+@profiling.profiled
 def dashboard_page(user_id=None):
     st.title("🏠 Dashboard")
     st.subheader("Welcome to your Finance Tracker Dashboard!")
     
-    process_recurring_transactions(user_id)
+    show_recurring_status(user_id)
     
     col1, col2 = st.columns([3, 1])
     with col1:
@@ -1752,11 +1001,11 @@ def dashboard_page(user_id=None):
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Total Income", format_currency(summary["income"]))
+        st.metric("Total Income", format_currency(summary.income))
     with col2:
-        st.metric("Total Expenses", format_currency(summary["expense"]))
+        st.metric("Total Expenses", format_currency(summary.expense))
     with col3:
-        st.metric("Net Balance", format_currency(summary["balance"]))
+        st.metric("Net Balance", format_currency(summary.balance))
     with col4:
         st.metric("Net Worth", format_currency(get_net_worth(user_id)))
     
@@ -1764,8 +1013,7 @@ def dashboard_page(user_id=None):
     
     # Daily Spending Trend Chart
     st.subheader("Daily Spending Trend")
-    transactions = get_transactions(date_range, user_id)
-    daily_expenses = transactions[transactions['type'] == 'Expense'].groupby('date')['amount'].sum().reset_index()
+    daily_expenses = get_daily_spending(date_range, user_id)
     
     if not daily_expenses.empty:
         fig = px.line(
@@ -1842,13 +1090,18 @@ def dashboard_page(user_id=None):
     else:
         st.info("No account data available")
 
+@profiling.profiled
 def transactions_page(user_id=None):
     st.title("💸 Transactions")
     
     # Add a new tab layout for different transaction views
-    tab1, tab2, tab3 = st.tabs(["Transaction Records", "Recurring Transactions", "Transaction Analysis"])
+    section = lazy_tabs(["Transaction Records", "Recurring Transactions", "Transaction Analysis"], key="transactions_section",
+                        keep={"Transaction Records": ["transactions_period", "transactions_period_start",
+                                                      "transactions_period_end", "transactions_filter_type",
+                                                      "transactions_filter_category", "transactions_filter_account"],
+                              "Transaction Analysis": ["analysis_start_date", "analysis_end_date"]})
     
-    with tab1:
+    if section == "Transaction Records":
         st.subheader("Transaction Records")
         
         col1, col2 = st.columns([3, 1])
@@ -1866,18 +1119,20 @@ def transactions_page(user_id=None):
                 if st.button("🔄 Refresh", key="refresh_transactions"):
                     st.rerun()
         
-        date_range = get_date_range(period)
+        date_range = get_date_range(period, key="transactions_period")
         transactions = get_transactions(date_range, user_id)
         
         # Add quick filters
         with st.expander("🔍 Filter Transactions", expanded=False):
             col1, col2, col3 = st.columns(3)
             with col1:
-                filter_type = st.selectbox("Type", ["All", "Income", "Expense"])
+                filter_type = st.selectbox("Type", ["All", "Income", "Expense"], key="transactions_filter_type")
             with col2:
-                filter_category = st.selectbox("Category", ["All"] + get_categories(user_id=user_id)['name'].unique().tolist())
+                filter_category = st.selectbox("Category", ["All"] + get_categories(user_id=user_id)['name'].unique().tolist(),
+                                               key="transactions_filter_category")
             with col3:
-                filter_account = st.selectbox("Account", ["All"] + get_accounts(user_id=user_id)['name'].unique().tolist())
+                filter_account = st.selectbox("Account", ["All"] + get_accounts(user_id=user_id)['name'].unique().tolist(),
+                                              key="transactions_filter_account")
             
             if filter_type != "All":
                 transactions = transactions[transactions['type'] == filter_type]
@@ -1956,12 +1211,11 @@ def transactions_page(user_id=None):
         else:
             st.info("No transactions found for the selected period")
     
-    with tab2:
+    if section == "Recurring Transactions":
         st.subheader("Recurring Transactions")
         
         # Show existing recurring transactions
-        recurring_trans = get_transactions(user_id=user_id)
-        recurring_trans = recurring_trans[recurring_trans['recurring'] == True]
+        recurring_trans = get_recurring_transactions(user_id=user_id)
         
         if not recurring_trans.empty:
             for _, trans in recurring_trans.iterrows():
@@ -2001,15 +1255,17 @@ def transactions_page(user_id=None):
                         index=["Daily", "Weekly", "Monthly", "Yearly"].index(edit_trans['recurring_frequency']) if edit_trans else 0
                     )
                 with col2:
+                    category_options = get_categories(user_id=user_id)['name'].unique().tolist()
+                    account_options = get_accounts(user_id=user_id)['name'].unique().tolist()
                     category = st.selectbox(
                         "Category",
-                        options=get_categories(user_id=user_id)['name'].unique().tolist(),
-                        index=get_categories(user_id=user_id)['name'].unique().tolist().index(edit_trans['category']) if edit_trans else 0
+                        options=category_options,
+                        index=category_options.index(edit_trans['category']) if edit_trans else 0
                     )
                     account = st.selectbox(
                         "Account",
-                        options=get_accounts(user_id=user_id)['name'].unique().tolist(),
-                        index=get_accounts(user_id=user_id)['name'].unique().tolist().index(edit_trans['account']) if edit_trans else 0
+                        options=account_options,
+                        index=account_options.index(edit_trans['account']) if edit_trans else 0
                     )
                     end_date = st.date_input("End Date (optional)", value=pd.to_datetime(edit_trans['recurring_end_date']) if edit_trans and edit_trans['recurring_end_date'] else None)
                 
@@ -2053,15 +1309,15 @@ def transactions_page(user_id=None):
                         ):
                             st.rerun()
     
-    with tab3:
+    if section == "Transaction Analysis":
         st.subheader("Transaction Analysis")
         
         # Date range selector
         col1, col2 = st.columns(2)
         with col1:
-            start_date = st.date_input("Start Date", datetime.today().replace(day=1))
+            start_date = st.date_input("Start Date", datetime.today().replace(day=1), key="analysis_start_date")
         with col2:
-            end_date = st.date_input("End Date", datetime.today())
+            end_date = st.date_input("End Date", datetime.today(), key="analysis_end_date")
         
         # Get transactions for analysis
         analysis_trans = get_transactions((start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')), user_id)
@@ -2098,6 +1354,7 @@ def transactions_page(user_id=None):
         else:
             st.info("No transactions available for analysis in this period")
 
+@profiling.profiled
 def budgets_page(user_id=None):
     st.title("📅 Budgets")
     
@@ -2130,7 +1387,7 @@ def budgets_page(user_id=None):
             return f'color: {color}'
         
         st.dataframe(
-            comparison.style.applymap(color_status, subset=['status']),
+            comparison.style.map(color_status, subset=['status']),
             use_container_width=True
         )
         
@@ -2181,6 +1438,7 @@ def budgets_page(user_id=None):
             else:
                 st.error("Please select a category and enter an amount")
 
+@profiling.profiled
 def savings_goals_page(user_id=None):
     st.title("🎯 Savings Goals")
     
@@ -2189,7 +1447,7 @@ def savings_goals_page(user_id=None):
     if not goals.empty:
         for _, goal in goals.iterrows():
             progress = (goal['current_amount'] / goal['target_amount']) * 100
-            days_left = (goal['target_date'] - datetime.today().date()).days if goal['target_date'] else None
+            days_left = (goal['target_date'].date() - datetime.today().date()).days if pd.notna(goal['target_date']) else None
             
             with st.container():
                 col1, col2 = st.columns([3, 1])
@@ -2317,7 +1575,10 @@ def savings_goals_page(user_id=None):
                 else:
                     st.error("Please enter a name and target amount")
 
+@profiling.profiled
 def accounts_page(user_id=None):
+    from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
+
     st.title("🏦 Accounts")
     
     accounts = get_accounts(user_id)
@@ -2445,12 +1706,16 @@ def accounts_page(user_id=None):
     else:
         st.info("No accounts found")
 
+@profiling.profiled
 def investments_page(user_id=None):
+    from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
+
     st.title("📈 Investment Portfolio")
     
-    tab1, tab2, tab3 = st.tabs(["View Investments", "Add Investment", "Investment Analysis"])
+    section = lazy_tabs(["View Investments", "Add Investment", "Investment Analysis"], key="investments_section",
+                        keep={"Investment Analysis": ["perf_start_date", "perf_end_date"]})
     
-    with tab1:
+    if section == "View Investments":
         st.subheader("Your Investment Portfolio")
         investments = get_investments(user_id)
         
@@ -2549,7 +1814,7 @@ def investments_page(user_id=None):
         else:
             st.info("You don't have any investments recorded yet")
     
-    with tab2:
+    if section == "Add Investment":
         st.subheader("Add New Investment")
         with st.form(key='investment_form'):
             col1, col2 = st.columns(2)
@@ -2586,7 +1851,7 @@ def investments_page(user_id=None):
                 else:
                     st.error("Please fill all required fields (marked with *)")
     
-    with tab3:
+    if section == "Investment Analysis":
         st.subheader("Investment Analysis")
         investments = get_investments(user_id)
         
@@ -2667,12 +1932,16 @@ def investments_page(user_id=None):
         else:
             st.info("No investments to analyze")
 
+@profiling.profiled
 def reports_page(user_id=None):
     st.title("📊 Financial Reports")
     
-    tab1, tab2, tab3 = st.tabs(["Spending Analysis", "Income Analysis", "Custom Reports"])
+    section = lazy_tabs(["Spending Analysis", "Income Analysis", "Custom Reports"], key="reports_section",
+                        keep={"Spending Analysis": ["spending_period", "spending_period_start", "spending_period_end"],
+                              "Income Analysis": ["income_period", "income_period_start", "income_period_end"],
+                              "Custom Reports": ["custom_report_start", "custom_report_end", "custom_report_type"]})
     
-    with tab1:
+    if section == "Spending Analysis":
         st.subheader("Spending Analysis")
         
         period = st.selectbox(
@@ -2681,7 +1950,7 @@ def reports_page(user_id=None):
             index=0,
             key="spending_period"
         )
-        date_range = get_date_range(period)
+        date_range = get_date_range(period, key="spending_period")
         
         spending = get_category_spending(date_range, user_id)
         
@@ -2735,6 +2004,8 @@ def reports_page(user_id=None):
                 st.subheader("Spending Trends Analysis")
                 decomposition = analyze_spending_trends(expenses)
                 if decomposition:
+                    import matplotlib.pyplot as plt
+
                     fig, (ax1, ax2, ax3, ax4) = plt.subplots(4, 1, figsize=(10, 8))
                     
                     decomposition.observed.plot(ax=ax1)
@@ -2754,7 +2025,7 @@ def reports_page(user_id=None):
         else:
             st.info("No spending data available for this period")
     
-    with tab2:
+    if section == "Income Analysis":
         st.subheader("Income Analysis")
         
         period = st.selectbox(
@@ -2763,7 +2034,7 @@ def reports_page(user_id=None):
             index=0,
             key="income_period"
         )
-        date_range = get_date_range(period)
+        date_range = get_date_range(period, key="income_period")
         
         transactions = get_transactions(date_range, user_id)
         income = transactions[transactions['type'] == 'Income']
@@ -2798,20 +2069,21 @@ def reports_page(user_id=None):
         else:
             st.info("No income data available for this period")
     
-    with tab3:
+    if section == "Custom Reports":
         st.subheader("Custom Reports")
         
         col1, col2 = st.columns(2)
         with col1:
-            start_date = st.date_input("Start Date", datetime.today().replace(day=1))
+            start_date = st.date_input("Start Date", datetime.today().replace(day=1), key="custom_report_start")
         with col2:
-            end_date = st.date_input("End Date", datetime.today())
+            end_date = st.date_input("End Date", datetime.today(), key="custom_report_end")
         
         date_range = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
         
         report_type = st.selectbox(
             "Report Type",
-            ["Transaction Summary", "Category Breakdown", "Account Summary", "Net Worth Trend"]
+            ["Transaction Summary", "Category Breakdown", "Account Summary", "Net Worth Trend"],
+            key="custom_report_type"
         )
         
         if st.button("Generate Report"):
@@ -2910,12 +2182,15 @@ def reports_page(user_id=None):
                 else:
                     st.info("Not enough data to calculate net worth trend")
 
+@profiling.profiled
 def data_management_page(user_id=None):
     st.title("🗄️ Data Management")
     
-    tab1, tab2, tab3 = st.tabs(["Import Data", "Export Data", "Backup/Restore"])
+    section = lazy_tabs(["Import Data", "Export Data", "Backup/Restore"], key="data_management_section",
+                        keep={"Export Data": ["export_period", "export_period_start", "export_period_end",
+                                              "export_format", "export_sheet_per_year"]})
     
-    with tab1:
+    if section == "Import Data":
         st.subheader("Import Transactions")
         
         st.info("""
@@ -2934,7 +2209,7 @@ def data_management_page(user_id=None):
                 if import_transactions_from_csv(uploaded_file, user_id):
                     st.rerun()
     
-    with tab2:
+    if section == "Export Data":
         st.subheader("Export Transactions")
         
         period = st.selectbox(
@@ -2947,13 +2222,16 @@ def data_management_page(user_id=None):
         if period == "All":
             date_range = (None, None)
         else:
-            date_range = get_date_range(period)
+            date_range = get_date_range(period, key="export_period")
         
         export_format = st.radio(
             "Export Format",
-            ["CSV", "Excel"],
-            horizontal=True
+            ["CSV", "Excel", "Parquet"],
+            horizontal=True,
+            key="export_format"
         )
+        sheet_per_year = export_format == "Excel" and st.checkbox("One sheet per year", value=False,
+                                                                  key="export_sheet_per_year")
         
         if st.button("Generate Export"):
             if export_format == "CSV":
@@ -2965,8 +2243,17 @@ def data_management_page(user_id=None):
                         file_name="transactions_export.csv",
                         mime="text/csv"
                     )
+            elif export_format == "Parquet":
+                parquet_data = export_transactions_to_parquet(date_range, user_id)
+                if parquet_data:
+                    st.download_button(
+                        label="Download Parquet",
+                        data=parquet_data,
+                        file_name="transactions_export.parquet",
+                        mime="application/vnd.apache.parquet"
+                    )
             else:
-                excel_data = export_transactions_to_excel(date_range, user_id)
+                excel_data = export_transactions_to_excel(date_range, user_id, sheet_per_year)
                 if excel_data:
                     st.download_button(
                         label="Download Excel",
@@ -2975,7 +2262,7 @@ def data_management_page(user_id=None):
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                     )
     
-    with tab3:
+    if section == "Backup/Restore":
         st.subheader("Backup and Restore")
         
         col1, col2 = st.columns(2)
@@ -2983,23 +2270,40 @@ def data_management_page(user_id=None):
         with col1:
             st.subheader("Backup Database")
             st.info("Create a backup of your entire finance database")
+            keep_snapshot = st.checkbox(f"Also keep a compressed snapshot in {backup.BACKUP_DIR}/",
+                                        help=f"The newest {backup.SNAPSHOT_RETENTION} snapshots are kept")
             if st.button("Create Backup"):
-                backup_data = backup_database()
-                if backup_data:
-                    st.download_button(
-                        label="Download Backup",
-                        data=backup_data,
-                        file_name="finance_backup.db",
-                        mime="application/octet-stream"
-                    )
+                backup_database(keep_snapshot)
         
         with col2:
             st.subheader("Restore Database")
             st.warning("This will overwrite your current database!")
-            restore_file = st.file_uploader("Choose a backup file", type="db")
+            restore_file = st.file_uploader("Choose a backup file", type=["db", "gz"])
             if restore_file and st.button("Restore Database"):
                 if restore_database(restore_file):
                     st.rerun()
+        
+        st.subheader("Your Data Only")
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.info("Export only your own records, without other users' data")
+            if st.button("Export My Data"):
+                user_export = export_user_data(user_id)
+                if user_export:
+                    st.download_button(
+                        label="Download My Data",
+                        data=user_export,
+                        file_name=f"finance_user_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                        mime="application/zip"
+                    )
+        
+        with col2:
+            st.info("Merge an export into your data: matching records are updated, new ones added")
+            user_file = st.file_uploader("Choose a data export", type="zip")
+            if user_file and st.button("Merge My Data"):
+                if import_user_data(user_file, user_id):
+                    st.rerun()
 
 # ========== Authentication Pages ==========
 def login_page():
@@ -3017,6 +2321,7 @@ def login_page():
             else:
                 user_id = verify_user(username, password)
                 if user_id:
+                    scheduler.submit(user_id)
                     st.session_state['authenticated'] = True
                     st.session_state['user_id'] = user_id
                     st.session_state['username'] = username
@@ -3067,10 +2372,44 @@ def register_page():
         st.rerun()
 
 # ========== Main App ==========
+def show_performance_panel():
+    """Show the profiled calls of this run in the sidebar, when profiling is on."""
+    run = profiling.current()
+    if run is None:
+        return
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        elapsed = (time.perf_counter() - run.started) * 1000
+        st.caption(f"{len(run.records)} calls • {run.statements} SQL statements • "
+                   f"{run.cache_hits} cache hits • {elapsed:.0f} ms")
+        if run.records:
+            calls = pd.DataFrame(run.records)
+            calls['name'] = ['· ' * depth + name for depth, name in zip(calls['depth'], calls['name'])]
+            columns = ['name', 'elapsed_ms', 'statements', 'rows', 'cache_hits']
+            if run.memory:
+                columns += ['peak_kib', 'retained_kib', 'frame_kib']
+            st.dataframe(calls[columns], hide_index=True, use_container_width=True)
+        if run.memory:
+            session_kib = profiling.frame_footprint(st.session_state.values()) / 1024
+            cached = cache.footprint()
+            st.caption(f"DataFrames held: {session_kib:,.0f} KiB in this session • "
+                       f"{cached.get(st.session_state.get('user_id'), 0) / 1024:,.0f} KiB cached for you • "
+                       f"{sum(cached.values()) / 1024:,.0f} KiB cached for everyone")
+            if st.session_state.get('last_top_sites'):
+                st.caption("Top allocation sites still held after the previous run")
+                st.dataframe(pd.DataFrame(st.session_state['last_top_sites']), hide_index=True,
+                             use_container_width=True)
+        if querylog.enabled():
+            st.caption("Statements by total time since the app started")
+            statements = pd.DataFrame(querylog.stats(limit=10))
+            if not statements.empty:
+                st.dataframe(statements[['sql', 'count', 'slow', 'p50_ms', 'p95_ms', 'max_ms']], hide_index=True,
+                             use_container_width=True)
+
 def main_app():
     """Main application after authentication"""
     user_id = st.session_state.get('user_id')
     username = st.session_state.get('username')
+    scheduler.submit(user_id)
     
     with st.sidebar:
         st.title(f"💰 Finance Tracker Pro+")
@@ -3086,6 +2425,8 @@ def main_app():
             
             profile_pic = st.file_uploader("Upload Profile Picture", type=['jpg', 'png', 'jpeg'])
             if profile_pic:
+                from PIL import Image
+
                 try:
                     image = Image.open(profile_pic)
                     st.image(image, width=100)
@@ -3107,6 +2448,11 @@ def main_app():
                 }
                 if update_user_preferences(user_id, preferences):
                     st.success("Preferences saved!")
+
+            st.checkbox("Show performance panel", key="performance_panel",
+                        help="Time each data and page function of this page and log it to the metrics file")
+            st.checkbox("Track memory in the panel", key="performance_memory",
+                        help="Measure peak and retained memory per function with tracemalloc; pages render slower")
         
         st.markdown("---")
         st.header("Navigation")
@@ -3115,6 +2461,7 @@ def main_app():
             ["Dashboard", "Transactions", "Budgets", "Savings Goals", "Accounts", "Investments", "Reports", "Data Management"],
             label_visibility="collapsed"
         )
+        profiling.annotate(page=page, user_id=user_id)
         
         st.markdown("---")
         st.header("Quick Actions")
@@ -3189,10 +2536,13 @@ def main_app():
     elif page == "Data Management":
         data_management_page(user_id)
 
+    show_performance_panel()
+
 # ========== Initialize Databases ==========
-initialize_auth_db()
-init_db()
-migrate_database()
+try:
+    schema.ensure_schema()
+except Error as e:
+    st.error(f"Failed to initialize database: {e}")
 
 # ========== App Initialization ==========
 if 'authenticated' not in st.session_state:
@@ -3205,7 +2555,13 @@ if not st.session_state['authenticated']:
     else:
         login_page()
 else:
-    main_app()
+    # One memo scope per rerun: repeated data lookups within it are served once
+    memory = profiling.MEMORY or st.session_state.get('performance_memory', False)
+    profile = profiling.ENABLED or memory or st.session_state.get('performance_panel', False)
+    with cache.request_scope(), profiling.session(profile, memory=memory) as run:
+        main_app()
+    if run is not None and run.memory:
+        st.session_state['last_top_sites'] = run.top_sites
 
 # ========== Footer ==========
 st.markdown("""